@@ -0,0 +1,78 @@
+"""Keeping system-raised alerts in line with the conditions that raise them.
+
+Service-due (service_alerts.py), fuel efficiency (fuel_analytics.py) and low-stock
+(inventory.py) alerts are all reconciled the same way: the caller works out which
+subjects should have an Active alert and what it should say, and reconcile() creates,
+refreshes or resolves alerts to match in a single bulk write, then updates the
+dashboard counters and pushes the changes to subscribed clients. A partial unique index
+per type (indexes.py) keeps two concurrent evaluations from both raising the same
+alert; the one that loses drops its insert.
+"""
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timezone
+import uuid
+from models import Alert
+import counters
+import events
+
+
+async def reconcile(alerts, type: str, active: dict, desired: dict):
+    """Make the Active alerts of type match desired.
+
+    active maps a key to the Active alert already raised for it; desired maps a key to
+    (priority, message, fields) for every key that should have one, where fields identify
+    the new alert's subject (vehicle_id, part_id, ...). Active alerts whose key isn't
+    desired are resolved.
+    """
+    now = datetime.now(timezone.utc)
+    operations = []
+    changes = []
+    inserted = resolved = 0
+    for key, (priority, message, fields) in desired.items():
+        existing = active.get(key)
+        if existing:
+            if (existing["priority"], existing["message"]) != (priority, message):
+                update = {"priority": priority, "message": message}
+                operations.append(UpdateOne({"alert_id": existing["alert_id"]}, {"$set": update}))
+                changes.append(("alert.updated", {**existing, **update}))
+            continue
+
+        alert_doc = {
+            "alert_id": f"alt_{uuid.uuid4().hex[:12]}",
+            "type": type,
+            "vehicle_id": None,
+            "driver_id": None,
+            **fields,
+            "message": message,
+            "status": "Active",
+            "priority": priority,
+            "created_at": now,
+            "resolved_at": None,
+        }
+        operations.append(InsertOne(alert_doc))
+        changes.append(("alert.created", alert_doc))
+        inserted += 1
+
+    for key, existing in active.items():
+        if key in desired:
+            continue
+        update = {"status": "Resolved", "resolved_at": now}
+        operations.append(UpdateOne({"alert_id": existing["alert_id"], "status": "Active"}, {"$set": update}))
+        changes.append(("alert.updated", {**existing, **update}))
+        resolved += 1
+
+    if operations:
+        try:
+            await alerts.bulk_write(operations, ordered=False)
+        except BulkWriteError as error:
+            # Only inserts can collide, and only with an alert raised concurrently
+            errors = error.details["writeErrors"]
+            duplicates = {item["index"] for item in errors if item["code"] == 11000}
+            if len(duplicates) < len(errors):
+                raise
+            changes = [change for position, change in enumerate(changes) if position not in duplicates]
+            inserted -= len(duplicates)
+        await counters.adjust("alerts", total=inserted, by_status={"Active": inserted - resolved, "Resolved": resolved})
+        for change, alert in changes:
+            events.publish("alerts", change, Alert(**alert))
@@ -1,49 +1,80 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, Depends, Request, Header
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timezone
-import uuid
-from typing import List
+from typing import List, Optional
 from models import Alert, AlertCreate, User
-from auth import get_current_user
+from auth import get_current_user, require_admin
+import counters
+import events
+import service_alerts
+from pagination import PageParams, page_params, page_response, match_fields
+from repository import Repository
 
 
 alerts_router = APIRouter(prefix="/alerts", tags=["Alerts"])
 
-# Database will be injected from server.py
-db = None
+alerts = Repository("alerts", "alert_id", "alt", "Alert")
 
 @alerts_router.get("", response_model=List[Alert])
-async def get_alerts(current_user: User = Depends(get_current_user)):
-    """Get all alerts"""
-    alerts = await db.alerts.find({}, {"_id": 0}).to_list(1000)
-    return alerts
+async def get_alerts(
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    priority: Optional[str] = None,
+    vehicle_id: Optional[str] = None,
+    driver_id: Optional[str] = None,
+    page: PageParams = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    """Get alerts, one page at a time"""
+    query = match_fields(status=status, type=type, priority=priority, vehicle_id=vehicle_id, driver_id=driver_id)
+    return await page_response(alerts.collection, query, "alert_id", page, Alert)
 
 @alerts_router.post("", response_model=Alert)
 async def create_alert(alert: AlertCreate, current_user: User = Depends(get_current_user)):
     """Create a new alert"""
-    alert_id = f"alt_{uuid.uuid4().hex[:12]}"
-    alert_doc = alert.dict()
-    alert_doc["alert_id"] = alert_id
-    alert_doc["created_at"] = datetime.now(timezone.utc)
+    alert_doc = alerts.new_doc(alert.dict())
     alert_doc["resolved_at"] = None
     
-    await db.alerts.insert_one(alert_doc)
+    await alerts.insert(alert_doc)
+    await counters.record_insert("alerts", alert_doc["status"])
     
-    return Alert(**alert_doc)
+    created_alert = Alert(**alert_doc)
+    events.publish("alerts", "alert.created", created_alert)
+    return created_alert
+
+@alerts_router.get("/stream")
+async def stream_alerts(
+    request: Request,
+    last_event_id: Optional[int] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
+    """Push alert changes as Server-Sent Events"""
+    subscription = events.broker.subscribe({"alerts"}, last_event_id)
+    return StreamingResponse(
+        events.sse_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@alerts_router.get("/stream/stats")
+async def get_stream_stats(current_user: User = Depends(require_admin)):
+    """Get push channel statistics"""
+    return events.broker.stats()
 
 @alerts_router.put("/{alert_id}")
 async def update_alert(alert_id: str, status: str, current_user: User = Depends(get_current_user)):
     """Update/dismiss alert"""
-    alert = await db.alerts.find_one({"alert_id": alert_id})
-    if not alert:
-        raise HTTPException(status_code=404, detail="Alert not found")
-    
     update_data = {"status": status}
     if status in ["Dismissed", "Resolved"]:
         update_data["resolved_at"] = datetime.now(timezone.utc)
     
-    await db.alerts.update_one(
-        {"alert_id": alert_id},
-        {"$set": update_data}
-    )
+    previous, updated = await alerts.update_with_previous(alert_id, update_data)
+    await counters.record_status_change("alerts", previous.get("status"), status)
+    events.publish("alerts", "alert.updated", Alert(**updated))
     
     return {"message": "Alert updated successfully"}
+
+@alerts_router.post("/service-due/rebuild")
+async def rebuild_service_due_alerts(current_user: User = Depends(require_admin)):
+    """Rebuild last-service state from maintenance records and re-evaluate every vehicle"""
+    return await service_alerts.rebuild()
@@ -1,8 +1,14 @@
 from fastapi import APIRouter, HTTPException, Response, Request, Depends
 from datetime import datetime, timezone, timedelta
+from pymongo import ReturnDocument
 import uuid
 import httpx
+import logging
 import os
+import time
+import auth_stub
+import outbound
+from cache import TTLCache
 from models import User, UserSession, SessionRequest, SessionResponse
 
 auth_router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -10,8 +16,26 @@ auth_router = APIRouter(prefix="/auth", tags=["Authentication"])
 # Database will be injected from server.py
 db = None
 
-# Helper function to get user from session
-async def get_current_user(request: Request) -> User:
+logger = logging.getLogger(__name__)
+
+AUTH_SESSION_URL = os.environ.get('AUTH_SESSION_URL', "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data")
+# "stub" answers AUTH_SESSION_URL in-process (auth_stub.py) - tests and benchmarks only
+AUTH_PROVIDER = os.environ.get('AUTH_PROVIDER', 'emergent')
+
+if AUTH_PROVIDER == "stub":
+    outbound.mount(AUTH_SESSION_URL, auth_stub.transport())
+    logger.warning("AUTH_PROVIDER=stub: any session_id logs in, do not use in production")
+
+# Resolved sessions, keyed by session token. Entries never outlive the session itself,
+# and SESSION_CACHE_TTL bounds how long a logout on another worker can go unnoticed.
+session_cache = TTLCache(
+    maxsize=int(os.environ.get('SESSION_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('SESSION_CACHE_TTL', 60))
+)
+_db_lookups = 0
+_db_lookup_seconds = 0.0
+
+def get_session_token(request: Request):
     # Try to get session_token from cookie first, then Authorization header
     session_token = request.cookies.get('session_token')
     
@@ -20,9 +44,26 @@ async def get_current_user(request: Request) -> User:
         if auth_header and auth_header.startswith('Bearer '):
             session_token = auth_header.replace('Bearer ', '')
     
+    return session_token
+
+def invalidate_user_sessions(user_id: str) -> int:
+    """Drop every cached session belonging to user_id"""
+    return session_cache.pop_where(lambda token, user: user.user_id == user_id)
+
+# Helper function to get user from session
+async def get_current_user(request: Request) -> User:
+    global _db_lookups, _db_lookup_seconds
+    
+    session_token = get_session_token(request)
     if not session_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
+    cached_user = session_cache.get(session_token)
+    if cached_user is not None:
+        return cached_user
+    
+    started = time.perf_counter()
+    
     # Find session in database
     session_doc = await db.user_sessions.find_one(
         {"session_token": session_token},
@@ -51,63 +92,61 @@ async def get_current_user(request: Request) -> User:
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return User(**user_doc)
+    user = User(**user_doc)
+    remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+    session_cache.set(session_token, user, ttl=remaining)
+    _db_lookups += 1
+    _db_lookup_seconds += time.perf_counter() - started
+    
+    return user
+
+async def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Allow only Admin users through"""
+    if current_user.role != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
 
 @auth_router.post("/session", response_model=SessionResponse)
 async def process_session(session_request: SessionRequest, response: Response):
     """Process session_id from OAuth and create user session"""
     try:
-        # Call Emergent Auth API to get session data
-        async with httpx.AsyncClient() as http_client:
-            auth_response = await http_client.get(
-                "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-                headers={"X-Session-ID": session_request.session_id},
-                timeout=10.0
-            )
+        # Call Emergent Auth API to get session data, over the app's pooled connections
+        auth_response = await outbound.client().get(
+            AUTH_SESSION_URL,
+            headers={"X-Session-ID": session_request.session_id}
+        )
         
         if auth_response.status_code != 200:
             raise HTTPException(status_code=400, detail="Invalid session ID")
         
         session_data = auth_response.json()
-        
-        # Generate user_id and session_token
-        user_id = f"user_{uuid.uuid4().hex[:12]}"
         session_token = session_data.get("session_token")
+        now = datetime.now(timezone.utc)
         
-        # Check if user already exists by email
-        existing_user = await db.users.find_one(
+        # Update the user's profile, creating the user on first login, in one round trip
+        user_doc = await db.users.find_one_and_update(
             {"email": session_data["email"]},
-            {"_id": 0}
+            {
+                "$set": {"name": session_data["name"], "picture": session_data.get("picture")},
+                "$setOnInsert": {
+                    "user_id": f"user_{uuid.uuid4().hex[:12]}",
+                    "role": "Admin",  # Default role
+                    "created_at": now
+                }
+            },
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
-        
-        if existing_user:
-            user_id = existing_user["user_id"]
-            # Update user info
-            await db.users.update_one(
-                {"user_id": user_id},
-                {"$set": {
-                    "name": session_data["name"],
-                    "picture": session_data.get("picture")
-                }}
-            )
-        else:
-            # Create new user
-            user_doc = {
-                "user_id": user_id,
-                "email": session_data["email"],
-                "name": session_data["name"],
-                "picture": session_data.get("picture"),
-                "role": "Admin",  # Default role
-                "created_at": datetime.now(timezone.utc)
-            }
-            await db.users.insert_one(user_doc)
+        # Other sessions of the user still cache the old name and picture
+        invalidate_user_sessions(user_doc["user_id"])
         
         # Create session
         session_doc = {
-            "user_id": user_id,
+            "user_id": user_doc["user_id"],
             "session_token": session_token,
-            "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
-            "created_at": datetime.now(timezone.utc)
+            "expires_at": now + timedelta(days=7),
+            "created_at": now
         }
         await db.user_sessions.insert_one(session_doc)
         
@@ -122,16 +161,14 @@ async def process_session(session_request: SessionRequest, response: Response):
             max_age=7*24*60*60
         )
         
-        # Get user data
-        user_doc = await db.users.find_one(
-            {"user_id": user_id},
-            {"_id": 0}
-        )
-        
         return SessionResponse(user=User(**user_doc))
     
+    except HTTPException:
+        raise
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Authentication service timeout")
+    except httpx.TransportError:
+        raise HTTPException(status_code=502, detail="Authentication service unavailable")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -143,11 +180,22 @@ async def get_me(current_user: User = Depends(get_current_user)):
 @auth_router.post("/logout")
 async def logout(request: Request, response: Response, current_user: User = Depends(get_current_user)):
     """Logout user and delete session"""
-    session_token = request.cookies.get('session_token')
+    session_token = get_session_token(request)
     
     if session_token:
+        # Session first: a lookup missing the cache in between would otherwise re-cache it
         await db.user_sessions.delete_one({"session_token": session_token})
+        session_cache.pop(session_token)
     
     response.delete_cookie(key="session_token", path="/")
     
     return {"message": "Logged out successfully"}
+
+@auth_router.get("/session-cache/stats")
+async def get_session_cache_stats(current_user: User = Depends(require_admin)):
+    """Get session cache hit/miss counters and the estimated latency saved"""
+    stats = session_cache.stats()
+    avg_lookup_ms = (_db_lookup_seconds * 1000 / _db_lookups) if _db_lookups else 0.0
+    stats["avg_db_lookup_ms"] = round(avg_lookup_ms, 3)
+    stats["estimated_saved_ms"] = round(avg_lookup_ms * stats["hits"], 1)
+    return stats
@@ -0,0 +1,31 @@
+"""A local stand-in for the OAuth session-data endpoint, for tests and benchmarks.
+
+With AUTH_PROVIDER=stub, auth.py mounts this on the outbound client in place of the
+real provider, so POST /auth/session runs its whole path (pooled client, user upsert,
+session insert) without network access. Any session_id logs in: an email address
+logs in as that address, anything else as <session_id>@stub.local, and ids starting
+with "invalid" are rejected like an unknown session. Never enable it in production -
+it lets anyone log in as anyone.
+"""
+import httpx
+import uuid
+
+
+def _session_data(request: httpx.Request) -> httpx.Response:
+    session_id = request.headers.get("X-Session-ID", "")
+    if not session_id or session_id.startswith("invalid"):
+        return httpx.Response(404, json={"detail": "Session not found"})
+
+    email = session_id if "@" in session_id else f"{session_id}@stub.local"
+    name = email.split("@")[0].replace(".", " ").replace("-", " ").title()
+    return httpx.Response(200, json={
+        "id": f"stub_{uuid.uuid5(uuid.NAMESPACE_URL, email).hex[:12]}",
+        "email": email,
+        "name": name,
+        "picture": None,
+        "session_token": f"stub_{uuid.uuid4().hex}"
+    })
+
+
+def transport() -> httpx.MockTransport:
+    return httpx.MockTransport(_session_data)
@@ -0,0 +1,279 @@
+"""End-to-end API benchmark: seed a synthetic fleet, then drive the real app in-process.
+
+Requests go through httpx.ASGITransport straight into the FastAPI app, so the numbers
+cover routing, auth, handlers, serialization and the database, but no network. Run from
+the backend directory, against a throwaway database on a local mongod:
+
+    python -m benchmarks.api_bench --mongo-url mongodb://localhost:27017 --db-name fleet_bench
+
+against the embedded SQLite store (a file, or ":memory:"):
+
+    python -m benchmarks.api_bench --sqlite :memory:
+
+or against the in-memory stand-in (needs mongomock-motor installed):
+
+    python -m benchmarks.api_bench --in-memory --vehicles 20 --years 0.5
+
+Results are JSON (per scenario: throughput, p50, p99). Save one run with --output and
+pass it to a later run with --compare to see the change per scenario; the exit status
+is 1 when any p99 got worse than --threshold.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+# Logins go to the in-process stub provider (auth_stub.py), never to the real one; set
+# before anything imports auth
+os.environ["AUTH_PROVIDER"] = "stub"
+
+from benchmarks import fleet
+
+TOKEN = "bench_session_token"
+SAMPLE_IDS = 100
+
+# (name, method, path, body) - path placeholders come from ids sampled after seeding;
+# body is a function of the request number so writes don't collide
+SCENARIOS = [
+    ("auth.me", "GET", "/auth/me", None),
+    ("auth.session", "POST", "/auth/session", lambda n: {"session_id": f"bench.user{n % 200}"}),
+    ("vehicles.list", "GET", "/vehicles", None),
+    ("vehicles.get", "GET", "/vehicles/{vehicle_id}", None),
+    ("vehicles.overview", "GET", "/vehicles/{vehicle_id}/overview", None),
+    ("vehicles.driver", "GET", "/vehicles/{vehicle_id}/driver", None),
+    ("vehicles.available", "GET", "/vehicles/available?start=2025-12-01T00:00:00Z&end=2025-12-02T00:00:00Z", None),
+    ("vehicles.patch", "PATCH", "/vehicles/{vehicle_id}", lambda n: {"color": f"Color {n % 7}"}),
+    ("drivers.list", "GET", "/drivers", None),
+    ("search", "GET", "/search?q=ab%201", None),
+    ("drivers.get", "GET", "/drivers/{driver_id}", None),
+    ("drivers.assignments", "GET", "/drivers/{driver_id}/assignments", None),
+    ("maintenance.list", "GET", "/maintenance", None),
+    ("maintenance.get", "GET", "/maintenance/{record_id}", None),
+    ("work_orders.list", "GET", "/work-orders", None),
+    ("work_orders.get", "GET", "/work-orders/{order_id}", None),
+    ("fuel.list", "GET", "/fuel", None),
+    ("fuel.list_vehicle", "GET", "/fuel?vehicle_id={vehicle_id}", None),
+    ("fuel.get", "GET", "/fuel/{log_id}", None),
+    ("fuel.efficiency", "GET", "/fuel/efficiency", None),
+    ("parts.list", "GET", "/parts", None),
+    ("parts.get", "GET", "/parts/{part_id}", None),
+    ("tires.list", "GET", "/tires", None),
+    ("tires.get", "GET", "/tires/{tire_id}", None),
+    ("inspections.list", "GET", "/inspections", None),
+    ("inspections.get", "GET", "/inspections/{inspection_id}", None),
+    ("alerts.list", "GET", "/alerts?status=Active", None),
+    ("alerts.create", "POST", "/alerts", lambda n: {"type": "Custom", "message": f"Benchmark {n}", "priority": "Low"}),
+    ("trips.list", "GET", "/trips", None),
+    ("trips.get", "GET", "/trips/{trip_id}", None),
+    ("trips.distance", "GET", "/trips/distance?vehicle_id={vehicle_id}&group_by=day", None),
+    ("reports.vehicles", "GET", "/reports/vehicles", None),
+    ("reports.monthly", "GET", "/reports/monthly", None),
+    ("exports.vehicles", "GET", "/export/vehicles?format=ndjson", None),
+    ("dashboard.stats", "GET", "/dashboard/stats", None),
+]
+
+ID_SOURCES = {
+    "vehicle_id": "vehicles",
+    "driver_id": "drivers",
+    "record_id": "maintenance_records",
+    "order_id": "work_orders",
+    "log_id": "fuel_logs",
+    "part_id": "parts_inventory",
+    "tire_id": "tires",
+    "inspection_id": "inspections",
+    "trip_id": "trips",
+}
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def _sample_ids(db) -> dict:
+    ids = {}
+    for field, collection_name in ID_SOURCES.items():
+        docs = await db[collection_name].find({}, {"_id": 0, field: 1}).limit(SAMPLE_IDS).to_list(None)
+        ids[field] = [doc[field] for doc in docs] or ["missing"]
+    return ids
+
+
+async def _authenticate(db):
+    now = datetime.now(timezone.utc)
+    await db.users.update_one(
+        {"user_id": "user_bench"},
+        {"$set": {"email": "bench@example.com", "name": "Benchmark", "role": "Admin", "created_at": now}},
+        upsert=True
+    )
+    await db.user_sessions.insert_one({
+        "user_id": "user_bench", "session_token": TOKEN, "expires_at": now + timedelta(days=1), "created_at": now
+    })
+
+
+async def run_scenario(client, scenario, ids: dict, requests: int, concurrency: int, warmup: int) -> dict:
+    name, method, path, body = scenario
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+
+    def request(n: int):
+        url = path.format(**{field: values[n % len(values)] for field, values in ids.items()})
+        return client.request(method, url, json=body(n) if body else None)
+
+    for n in range(warmup):
+        await request(n)
+
+    async def worker():
+        nonlocal errors
+        while True:
+            n = next(counter)
+            if n >= requests:
+                return
+            start = time.perf_counter()
+            response = await request(warmup + n)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def compare(previous: dict, current: dict, threshold: float) -> bool:
+    """Print per-scenario changes against a previous run; True if any p99 regressed past threshold"""
+    regressed = False
+    print(f"{'scenario':<24}{'p50 ms':>24}{'p99 ms':>24}{'req/s':>26}", file=sys.stderr)
+    for name, now in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if not before:
+            continue
+
+        def change(field):
+            old, new = before[field], now[field]
+            delta = (new - old) / old * 100 if old else 0.0
+            return f"{old:.2f}->{new:.2f} ({delta:+.0f}%)", delta
+
+        p50, _ = change("p50_ms")
+        p99, p99_delta = change("p99_ms")
+        throughput, _ = change("throughput_rps")
+        flag = ""
+        if p99_delta > threshold * 100:
+            regressed = True
+            flag = "  REGRESSION"
+        print(f"{name:<24}{p50:>24}{p99:>24}{throughput:>26}{flag}", file=sys.stderr)
+    return regressed
+
+
+async def main(args) -> dict:
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.db_name
+    import server
+    import command_monitor
+    import response_cache
+    # One INFO line per request would drown the progress output
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.in_memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--in-memory needs mongomock-motor (pip install mongomock-motor)")
+        server.use_database(AsyncMongoMockClient()[args.db_name])
+        storage = "in-memory"
+    elif args.sqlite:
+        from sqlite_store import SQLiteClient
+        sqlite_client = SQLiteClient(args.sqlite, listener=command_monitor.listener)
+        await sqlite_client.drop_database(args.db_name)
+        server.use_database(sqlite_client[args.db_name])
+        storage = "sqlite"
+    else:
+        await server.client.drop_database(args.db_name)
+        storage = "mongod"
+    db = server.db
+    response_cache.enabled = not args.no_response_cache
+
+    for handler in server.app.router.on_startup:
+        # mongomock ignores partialFilterExpression, so the one-open-trip-per-vehicle index
+        # would reject every completed trip; in memory, run without indexes
+        if args.in_memory and handler is server.create_indexes:
+            continue
+        await handler()
+    seed_started = time.perf_counter()
+    seeded = await fleet.seed(db, vehicles=args.vehicles, drivers=args.drivers, years=args.years, seed=args.seed)
+    seed_seconds = time.perf_counter() - seed_started
+    await _authenticate(db)
+    ids = await _sample_ids(db)
+
+    selected = [scenario for scenario in SCENARIOS if not args.only or any(scenario[0].startswith(prefix) for prefix in args.only)]
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench/api", headers={"Authorization": f"Bearer {TOKEN}"}) as client:
+        for scenario in selected:
+            results[scenario[0]] = await run_scenario(client, scenario, ids, args.requests, args.concurrency, args.warmup)
+            print(f"{scenario[0]:<24} p50 {results[scenario[0]]['p50_ms']:>9.3f} ms  p99 {results[scenario[0]]['p99_ms']:>9.3f} ms", file=sys.stderr)
+    await server.app.router.shutdown()
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "storage": storage},
+        "config": {
+            "vehicles": args.vehicles, "drivers": args.drivers, "years": args.years, "seed": args.seed,
+            "requests": args.requests, "concurrency": args.concurrency, "warmup": args.warmup,
+            "response_cache": not args.no_response_cache,
+        },
+        "seeded": {**seeded, "seconds": round(seed_seconds, 2)},
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the API against a synthetic fleet")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="fleet_bench", help="dropped and re-seeded on every run")
+    parser.add_argument("--in-memory", action="store_true", help="use mongomock-motor instead of a mongod")
+    parser.add_argument("--sqlite", metavar="PATH", help="use the embedded SQLite store at PATH (dropped and re-seeded) instead of a mongod")
+    parser.add_argument("--vehicles", type=int, default=50)
+    parser.add_argument("--drivers", type=int, default=80)
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--only", nargs="*", help="scenario name prefixes, e.g. vehicles dashboard")
+    parser.add_argument("--no-response-cache", action="store_true")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p99 regression that fails --compare (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text)
+    if args.compare:
+        with open(args.compare) as handle:
+            if compare(json.load(handle), report, args.threshold):
+                sys.exit(1)
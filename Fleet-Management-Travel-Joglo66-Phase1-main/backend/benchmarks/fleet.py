@@ -0,0 +1,252 @@
+"""Synthetic fleet generator for the benchmarks.
+
+Seeds vehicles, drivers, parts, tires, driver assignments and, for every vehicle, years
+of fuel logs, maintenance records, work orders, inspections and completed trips. Writes
+go out as insert_many batches, then the derived state the API reads (status counters,
+monthly rollups, trip buckets, service-due state, fuel efficiency) is built with the
+same rebuild functions production uses. A given seed always produces the same fleet.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import counters
+import fuel_analytics
+import rollups
+import service_alerts
+import trips
+
+BATCH_SIZE = 1000
+
+VEHICLE_TYPES = ["Car", "Van", "Bus", "Truck"]
+BRANDS = {"Car": ["Toyota", "Honda"], "Van": ["Toyota", "Isuzu"], "Bus": ["Mercedes-Benz", "Hino"], "Truck": ["Mitsubishi", "Hino"]}
+# Typical km/L per vehicle type, before per-fill noise
+EFFICIENCY = {"Car": 12.0, "Van": 9.0, "Bus": 4.5, "Truck": 5.0}
+SERVICE_TYPES = ["Oil Change", "Brake Check", "Air Filter / Tune Up", "Major Service", "Tire Rotation"]
+TIRE_POSITIONS = ["Front Left", "Front Right", "Rear Left", "Rear Right", "Spare"]
+FUEL_PRICE = 10000  # per litre
+
+
+class _Writer:
+    """Buffers documents per collection and flushes them in insert_many batches"""
+
+    def __init__(self, db):
+        self.db = db
+        self.buffers = {}
+        self.counts = {}
+
+    async def add(self, collection_name: str, doc: dict):
+        buffer = self.buffers.setdefault(collection_name, [])
+        buffer.append(doc)
+        if len(buffer) >= BATCH_SIZE:
+            await self.flush(collection_name)
+
+    async def flush(self, collection_name: str = None):
+        for name in [collection_name] if collection_name else list(self.buffers):
+            buffer = self.buffers.get(name)
+            if buffer:
+                await self.db[name].insert_many(buffer, ordered=False)
+                self.counts[name] = self.counts.get(name, 0) + len(buffer)
+                self.buffers[name] = []
+
+
+def _id(prefix: str, rng: random.Random) -> str:
+    return f"{prefix}_{rng.getrandbits(48):012x}"
+
+
+async def seed(db, vehicles: int = 50, drivers: int = 80, years: float = 1.0, seed: int = 42, now: datetime = None) -> dict:
+    """Fill db with a synthetic fleet; returns the number of documents per collection"""
+    rng = random.Random(seed)
+    now = now or datetime(2026, 1, 1, tzinfo=timezone.utc)
+    start = now - timedelta(days=int(365 * years))
+    writer = _Writer(db)
+    trip_docs = []
+
+    driver_ids = []
+    for i in range(drivers):
+        driver_id = _id("drv", rng)
+        driver_ids.append(driver_id)
+        await writer.add("drivers", {
+            "driver_id": driver_id,
+            "name": f"Driver {i + 1}",
+            "license_number": f"SIM-{100000 + i}",
+            "license_expiry": f"{now.year + rng.randint(0, 4)}-{rng.randint(1, 12):02d}-28",
+            "phone": f"08{rng.randint(10**9, 10**10 - 1)}",
+            "email": None,
+            "status": "Active" if rng.random() < 0.9 else "Inactive",
+            "documents": [],
+            "performance_notes": [],
+            "created_at": start,
+        })
+
+    part_ids = []
+    for i in range(max(20, vehicles // 2)):
+        part_id = _id("prt", rng)
+        part_ids.append(part_id)
+        await writer.add("parts_inventory", {
+            "part_id": part_id,
+            "name": f"Part {i + 1}",
+            "part_number": f"PN-{1000 + i}",
+            "quantity": rng.randint(0, 60),
+            "min_stock": rng.randint(2, 10),
+            "cost": float(rng.randint(5, 400) * 10000),
+            "supplier": rng.choice(["Astra Otoparts", "Denso", "Bosch"]),
+            "location": f"Rack {rng.randint(1, 12)}",
+            "created_at": start,
+            "updated_at": start,
+        })
+
+    for i in range(vehicles):
+        vehicle_id = _id("veh", rng)
+        vehicle_type = rng.choice(VEHICLE_TYPES)
+        daily_km = rng.randint(60, 250)
+        tank = {"Car": 45, "Van": 70, "Bus": 200, "Truck": 150}[vehicle_type]
+        odometer = rng.randint(5000, 120000)
+
+        for position in TIRE_POSITIONS:
+            await writer.add("tires", {
+                "tire_id": _id("tir", rng),
+                "vehicle_id": vehicle_id,
+                "position": position,
+                "brand": rng.choice(["Bridgestone", "GT Radial", "Michelin"]),
+                "size": "205/65R16",
+                "installation_date": start.strftime("%Y-%m-%d"),
+                "mileage_installed": odometer,
+                "cost": float(rng.randint(80, 250) * 10000),
+                "status": "Active",
+                "created_at": start,
+            })
+        await writer.add("driver_assignments", {
+            "assignment_id": _id("asn", rng),
+            "vehicle_id": vehicle_id,
+            "driver_id": rng.choice(driver_ids),
+            "start_date": start,
+            "end_date": None,
+            "notes": None,
+            "created_at": start,
+        })
+
+        day = start
+        next_service = day + timedelta(days=rng.randint(30, 90))
+        next_inspection = day + timedelta(days=rng.randint(1, 30))
+        while day < now:
+            # Drive until roughly a tank is used, then fill up
+            days = max(1, int(tank * EFFICIENCY[vehicle_type] * rng.uniform(0.5, 0.9) / daily_km))
+            trip_start = odometer
+            odometer += int(daily_km * days * rng.uniform(0.8, 1.2))
+            day += timedelta(days=days)
+            driver_id = rng.choice(driver_ids)
+            litres = round((odometer - trip_start) / (EFFICIENCY[vehicle_type] * rng.uniform(0.85, 1.15)), 2)
+            await writer.add("fuel_logs", {
+                "log_id": _id("fuel", rng),
+                "vehicle_id": vehicle_id,
+                "driver_id": driver_id,
+                "date": day,
+                "quantity": litres,
+                "cost": round(litres * FUEL_PRICE, 2),
+                "odometer": odometer,
+                "fuel_type": "Diesel",
+                "receipt_url": None,
+                "cost_per_km": 0,
+                "created_at": day,
+            })
+            trip_docs.append({
+                "trip_id": _id("trip", rng),
+                "vehicle_id": vehicle_id,
+                "driver_id": driver_id,
+                "start_odometer": trip_start,
+                "end_odometer": odometer,
+                "distance": odometer - trip_start,
+                "purpose": None,
+                "status": "Completed",
+                "start_time": day - timedelta(days=days),
+                "end_time": day,
+                "created_by": None,
+                "created_at": day,
+            })
+
+            if day >= next_inspection:
+                next_inspection = day + timedelta(days=30)
+                await writer.add("inspections", {
+                    "inspection_id": _id("insp", rng),
+                    "vehicle_id": vehicle_id,
+                    "driver_id": driver_id,
+                    "type": "Monthly",
+                    "date": day,
+                    "checklist": [{"item": item, "ok": rng.random() < 0.95} for item in ("Lights", "Brakes", "Tires", "Horn")],
+                    "photos": [],
+                    "status": rng.choice(["Approved", "Approved", "Pending", "Failed"]),
+                    "approved_by": None,
+                    "notes": None,
+                    "created_at": day,
+                })
+
+            if day >= next_service:
+                next_service = day + timedelta(days=rng.randint(60, 120))
+                order_id = _id("wo", rng)
+                labor = float(rng.randint(10, 100) * 10000)
+                lines = [{"part_id": rng.choice(part_ids), "quantity": rng.randint(1, 4), "cost": 0} for _ in range(rng.randint(0, 3))]
+                completed = day + timedelta(days=rng.randint(0, 3))
+                await writer.add("work_orders", {
+                    "order_id": order_id,
+                    "vehicle_id": vehicle_id,
+                    "assigned_to": None,
+                    "status": "Completed" if completed < now else "In Progress",
+                    "priority": rng.choice(["Low", "Medium", "High"]),
+                    "description": "Scheduled service",
+                    "parts": lines,
+                    "labor_cost": labor,
+                    "parts_cost": 0,
+                    "total_cost": labor,
+                    "parts_consumed_at": None,
+                    "scheduled_date": day,
+                    "completed_date": completed if completed < now else None,
+                    "created_at": day,
+                })
+                await writer.add("maintenance_records", {
+                    "record_id": _id("mnt", rng),
+                    "vehicle_id": vehicle_id,
+                    "service_type": rng.choice(SERVICE_TYPES),
+                    "date": day,
+                    "mileage": odometer,
+                    "cost": labor,
+                    "parts": [],
+                    "technician": None,
+                    "work_order_id": order_id,
+                    "warranty_expiry": None,
+                    "notes": None,
+                    "created_at": day,
+                })
+
+        await writer.add("vehicles", {
+            "vehicle_id": vehicle_id,
+            "plate": f"AB {1000 + i} {rng.choice('KLMNOPQRST')}{rng.choice('ABCDEFGH')}",
+            "brand": rng.choice(BRANDS[vehicle_type]),
+            "model": "Fleet",
+            "type": vehicle_type,
+            "year": rng.randint(2012, now.year),
+            "vin": None,
+            "color": "White",
+            "registration_expiry": f"{now.year + 1}-06-30",
+            "mileage": odometer,
+            "fuel_type": "Diesel",
+            "ownership_status": rng.choice(["Owned", "Leased"]),
+            "status": rng.choice(["Active"] * 8 + ["Maintenance", "Inactive"]),
+            "total_value": float(rng.randint(150, 900) * 1000000),
+            "photos": [],
+            "documents": [],
+            "created_by": "user_bench",
+            "created_at": start,
+        })
+
+    for trip in trip_docs:
+        await writer.add("trips", trip)
+    await writer.flush()
+
+    # Derived state, built the way the rebuild commands build it
+    for i in range(0, len(trip_docs), BATCH_SIZE):
+        await trips.record_completed(trip_docs[i:i + BATCH_SIZE])
+    await counters.rebuild()
+    await rollups.rebuild()
+    await service_alerts.rebuild()
+    await fuel_analytics.rebuild()
+    return writer.counts
@@ -0,0 +1,108 @@
+"""Compare list-response rendering: FastAPI response_model vs serialization.dump().
+
+Pure CPU, no database needed. Run from the backend directory:
+
+    python -m benchmarks.serialization_bench --rows 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+import serialization
+from models import Vehicle, FuelLog
+
+
+def vehicle_doc(i: int) -> dict:
+    return {
+        "vehicle_id": f"veh_{uuid.uuid4().hex[:12]}",
+        "plate": f"AB {1000 + i} XY",
+        "brand": random.choice(["Toyota", "Isuzu", "Mitsubishi"]),
+        "model": "Hiace",
+        "type": random.choice(["Car", "Van", "Bus", "Truck"]),
+        "year": random.randint(2010, 2024),
+        "vin": uuid.uuid4().hex[:17].upper(),
+        "color": "White",
+        "registration_expiry": "2026-12-31",
+        "mileage": random.randint(0, 300000),
+        "fuel_type": "Diesel",
+        "ownership_status": "Owned",
+        "status": "Active",
+        "total_value": float(random.randint(100, 900)) * 1e6,
+        "photos": [],
+        "documents": [],
+        "created_by": "user_bench",
+        "created_at": datetime(2025, 1, 1) + timedelta(minutes=i),
+    }
+
+
+def fuel_doc(i: int) -> dict:
+    quantity = round(random.uniform(20, 80), 2)
+    return {
+        "log_id": f"fuel_{uuid.uuid4().hex[:12]}",
+        "vehicle_id": f"veh_{i % 50:012d}",
+        "driver_id": f"drv_{i % 80:012d}",
+        "date": datetime(2025, 1, 1) + timedelta(hours=i),
+        "quantity": quantity,
+        "cost": round(quantity * 10000, 2),
+        "odometer": 10000 + i * 37,
+        "fuel_type": "Diesel",
+        "receipt_url": None,
+        "cost_per_km": 10000.0,
+        "created_at": datetime(2025, 1, 1) + timedelta(hours=i),
+    }
+
+
+async def response_model_path(field, docs) -> bytes:
+    # What a response_model endpoint does with a list of documents
+    content = await serialize_response(field=field, response_content=docs)
+    return JSONResponse(content).body
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(rows: int, repeat: int) -> dict:
+    loop = asyncio.new_event_loop()
+    results = {}
+    for name, model, make in (("vehicles", Vehicle, vehicle_doc), ("fuel", FuelLog, fuel_doc)):
+        docs = [make(i) for i in range(rows)]
+        field = create_response_field(name=f"Response_{name}", type_=List[model], mode="serialization")
+
+        def validated():
+            serialization.trusted = False
+            serialization.dump(List[model], docs)
+
+        def trusted():
+            serialization.trusted = True
+            serialization.dump(List[model], docs)
+
+        baseline = timed(lambda: loop.run_until_complete(response_model_path(field, docs)), repeat)
+        timings = {"response_model_ms": baseline, "type_adapter_ms": timed(validated, repeat), "trusted_ms": timed(trusted, repeat)}
+        results[name] = {
+            **{key: round(value, 3) for key, value in timings.items()},
+            "type_adapter_speedup": round(baseline / timings["type_adapter_ms"], 2),
+            "trusted_speedup": round(baseline / timings["trusted_ms"], 2),
+        }
+    loop.close()
+    return {"rows": rows, "repeat": repeat, "orjson": serialization.orjson is not None, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark list response serialization")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.repeat), indent=2))
@@ -0,0 +1,228 @@
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from typing import Optional
+import csv
+import json
+import os
+from models import FuelLogCreate, MaintenanceRecordCreate, TripRecord, User
+from auth import get_current_user
+from fuel import build_fuel_log_doc
+from maintenance import build_maintenance_record_doc
+from trips import build_completed_trip_doc, record_completed
+import fuel_analytics
+import rollups
+import service_alerts
+
+
+bulk_import_router = APIRouter(prefix="/import", tags=["Bulk Import"])
+
+# Database will be injected from server.py
+db = None
+
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+IMPORT_MAX_LINE_BYTES = int(os.environ.get('IMPORT_MAX_LINE_BYTES', 1024 * 1024))
+# Rows beyond this many failures are still counted, just not itemised
+IMPORT_MAX_REPORTED_ERRORS = int(os.environ.get('IMPORT_MAX_REPORTED_ERRORS', 1000))
+
+def _decode(line: bytes):
+    try:
+        return line.decode("utf-8").rstrip("\r")
+    except UnicodeDecodeError as e:
+        return e
+
+async def _iter_lines(request: Request):
+    """Yield decoded lines from the request body as it streams in.
+
+    A line that isn't valid UTF-8 is yielded as its UnicodeDecodeError, so it is
+    reported as a failed row rather than aborting the import.
+    """
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            raise HTTPException(status_code=413, detail="Import line too long")
+        for line in lines:
+            yield _decode(line)
+    if buffer:
+        yield _decode(buffer)
+
+def _csv_value(value: str):
+    # List and object fields (e.g. maintenance parts) travel as JSON inside the cell
+    if value[:1] in ("[", "{"):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+async def _iter_csv_rows(lines):
+    header = None
+    pending = ""
+    async for line in lines:
+        if isinstance(line, UnicodeDecodeError):
+            # The row it belongs to can't be read; drop any quoted cell it was continuing
+            pending = ""
+            yield line
+            continue
+        pending = f"{pending}\n{line}" if pending else line
+        # A quoted cell may span several physical lines
+        if pending.count('"') % 2:
+            continue
+        record = next(csv.reader([pending]), [])
+        pending = ""
+        if not any(cell.strip() for cell in record):
+            continue
+        if header is None:
+            header = [cell.strip().lstrip("\ufeff") for cell in record]
+            continue
+        yield {key: _csv_value(value) for key, value in zip(header, record) if value != ""}
+    if pending:
+        raise HTTPException(status_code=400, detail="Unterminated quoted field in CSV")
+
+async def _iter_ndjson_rows(lines):
+    async for line in lines:
+        if isinstance(line, UnicodeDecodeError):
+            yield line
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+def _detect_format(request: Request, format: Optional[str]) -> str:
+    if format:
+        return format
+    content_type = request.headers.get("content-type", "")
+    return "csv" if "csv" in content_type else "ndjson"
+
+class ImportReport:
+    def __init__(self, format: str):
+        self.format = format
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row: int, errors):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "errors": errors})
+
+    def as_dict(self) -> dict:
+        return {
+            "format": self.format,
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+async def _flush(collection_name: str, batch: list, report: ImportReport, on_inserted):
+    rows = [row for row, _ in batch]
+    docs = [doc for _, doc in batch]
+    failed_indexes = set()
+    try:
+        await db[collection_name].insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            failed_indexes.add(write_error["index"])
+            report.add_error(rows[write_error["index"]], [write_error.get("errmsg", "Write failed")])
+
+    inserted = [doc for i, doc in enumerate(docs) if i not in failed_indexes]
+    report.inserted += len(inserted)
+    if inserted:
+        await on_inserted(inserted)
+
+async def ingest(request: Request, format: str, model, build_doc, collection_name: str, on_inserted) -> dict:
+    """Validate a streamed CSV/NDJSON body row by row and insert it in bounded batches.
+
+    Rows that fail validation or insertion are reported by their 1-based position
+    in the upload; every other row is written. At most one batch is held in memory.
+    on_inserted receives each batch's successfully inserted documents.
+    """
+    report = ImportReport(format)
+    lines = _iter_lines(request)
+    rows = _iter_csv_rows(lines) if format == "csv" else _iter_ndjson_rows(lines)
+
+    batch = []
+    async for row in rows:
+        report.received += 1
+        if isinstance(row, UnicodeDecodeError):
+            report.add_error(report.received, [f"Invalid UTF-8: {row.reason} at byte {row.start}"])
+            continue
+        if isinstance(row, Exception):
+            report.add_error(report.received, [f"Invalid JSON: {row}"])
+            continue
+        if not isinstance(row, dict):
+            report.add_error(report.received, ["Row must be a JSON object"])
+            continue
+        try:
+            doc = build_doc(model(**row))
+        except ValidationError as e:
+            report.add_error(report.received, e.errors(include_url=False, include_context=False, include_input=False))
+            continue
+
+        batch.append((report.received, doc))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await _flush(collection_name, batch, report, on_inserted)
+            batch = []
+
+    if batch:
+        await _flush(collection_name, batch, report, on_inserted)
+
+    return report.as_dict()
+
+@bulk_import_router.post("/fuel")
+async def import_fuel_logs(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """Bulk import fuel logs from an NDJSON or CSV stream"""
+    imported_vehicles = set()
+    
+    async def on_inserted(docs):
+        await rollups.record("fuel", docs)
+        await service_alerts.on_mileage_readings(service_alerts.mileage_readings(docs, "odometer"))
+        imported_vehicles.update(doc["vehicle_id"] for doc in docs)
+    
+    report = await ingest(
+        request, _detect_format(request, format), FuelLogCreate, build_fuel_log_doc, "fuel_logs",
+        on_inserted
+    )
+    # Efficiency depends on neighbouring fills, so recompute each vehicle once the whole stream is in
+    await fuel_analytics.refresh(imported_vehicles)
+    return report
+
+@bulk_import_router.post("/maintenance")
+async def import_maintenance_records(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """Bulk import maintenance records from an NDJSON or CSV stream"""
+    async def on_inserted(docs):
+        await rollups.record("maintenance", docs)
+        await service_alerts.on_services(docs)
+    
+    return await ingest(
+        request, _detect_format(request, format), MaintenanceRecordCreate, build_maintenance_record_doc, "maintenance_records",
+        on_inserted
+    )
+
+@bulk_import_router.post("/trips")
+async def import_trips(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """Bulk import completed trips from an NDJSON or CSV stream"""
+    return await ingest(
+        request, _detect_format(request, format), TripRecord, build_completed_trip_doc, "trips",
+        record_completed
+    )
@@ -0,0 +1,164 @@
+"""Latency of every MongoDB command, per collection and command name.
+
+listener is registered on the AsyncIOMotorClient in server.py. It keeps one histogram
+per (collection, command) and a ring buffer of the commands slower than SLOW_QUERY_MS,
+each with its filter shape: the filter's keys and operators, with values replaced by
+"?". With SLOW_QUERY_EXPLAIN on, each slow command's query plan is captured as well.
+The explain runs on the event loop afterwards, never inside the listener.
+
+Motor runs pymongo on worker threads, so the listener callbacks run there too. They only
+touch dicts, deques and histograms, which don't need locks for this.
+"""
+from collections import deque
+from datetime import datetime, timezone
+from bson import json_util
+from pymongo import monitoring
+import asyncio
+import json
+import logging
+import os
+from metrics import Histogram
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 200))
+SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'false').lower() in ('1', 'true', 'yes')
+
+# Where each command keeps its filter
+FILTER_FIELDS = {"find": "filter", "count": "query", "distinct": "query", "findAndModify": "query"}
+# Commands explain() accepts
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Command fields that belong to the session or the wire protocol, not to the query
+SESSION_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction"}
+
+logger = logging.getLogger(__name__)
+
+# Database and event loop the explains run against; set by start()
+db = None
+loop = None
+
+
+def filter_shape(value):
+    """value with every literal replaced by "?"; keys, operators and nesting are kept"""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [filter_shape(item) for item in value]  # $and / $or / pipelines
+    return "?"
+
+
+def _collection(command_name: str, command: dict):
+    if command_name == "getMore":
+        return command.get("collection")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else None
+
+
+def _filter(command_name: str, command: dict):
+    if command_name in FILTER_FIELDS:
+        return command.get(FILTER_FIELDS[command_name])
+    if command_name == "aggregate":
+        return [stage for stage in command.get("pipeline", []) if "$match" in stage][:1] or None
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        return statements[0].get("q")
+    return None
+
+
+class CommandMonitor(monitoring.CommandListener):
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, log_size: int = SLOW_QUERY_LOG_SIZE):
+        self.threshold_ms = threshold_ms
+        self.histograms = {}
+        self.failures = {}
+        self.slow = deque(maxlen=log_size)
+        self._started = {}
+
+    def started(self, event):
+        if event.command_name == "explain":
+            return
+        command = event.command
+        self._started[(event.connection_id, event.request_id)] = (
+            _collection(event.command_name, command),
+            command if SLOW_QUERY_EXPLAIN and event.command_name in EXPLAINABLE else None,
+            _filter(event.command_name, command),
+        )
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+    def _finished(self, event, failed: bool):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        collection, command, filter = started
+        self.record(collection, event.command_name, event.duration_micros / 1000, failed, filter, command)
+
+    def record(self, collection, command_name: str, elapsed_ms: float, failed: bool = False, filter=None, command=None):
+        """Count one command; also the entry point for storage backends that don't emit pymongo events"""
+        key = (collection or "-", command_name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms.setdefault(key, Histogram())
+        histogram.observe(elapsed_ms)
+        if failed:
+            self.failures[key] = self.failures.get(key, 0) + 1
+
+        if elapsed_ms >= self.threshold_ms:
+            entry = {
+                "at": datetime.now(timezone.utc),
+                "collection": key[0],
+                "command": key[1],
+                "duration_ms": round(elapsed_ms, 3),
+                "failed": failed,
+                "filter_shape": filter_shape(filter) if filter is not None else None,
+                "explain": None,
+            }
+            self.slow.append(entry)
+            if command is not None and loop is not None:
+                loop.call_soon_threadsafe(_schedule_explain, entry, command)
+
+    def stats(self) -> dict:
+        commands = [
+            {"collection": collection, "command": name, "failures": self.failures.get((collection, name), 0), **histogram.summary()}
+            for (collection, name), histogram in list(self.histograms.items())
+        ]
+        commands.sort(key=lambda row: row["sum"], reverse=True)
+        return {
+            "slow_query_ms": self.threshold_ms,
+            "explain": SLOW_QUERY_EXPLAIN,
+            "commands": commands,
+            "slow": list(reversed(self.slow)),
+        }
+
+    def reset(self):
+        self.histograms.clear()
+        self.failures.clear()
+        self.slow.clear()
+
+
+listener = CommandMonitor()
+
+
+def _schedule_explain(entry: dict, command: dict):
+    asyncio.ensure_future(_explain(entry, command))
+
+
+async def _explain(entry: dict, command: dict):
+    query = {key: value for key, value in command.items() if not key.startswith("$") and key not in SESSION_FIELDS}
+    try:
+        plan = await db.command({"explain": query, "verbosity": "queryPlanner"})
+        # Round-trip through extended JSON so BSON types in the plan serialise like anything else
+        entry["explain"] = json.loads(json_util.dumps(plan.get("queryPlanner", plan)))
+    except Exception as exc:
+        # The plan is a nice-to-have; a command that can't be explained keeps its timing
+        logger.debug("explain failed for %s.%s: %s", entry["collection"], entry["command"], exc)
+        entry["explain"] = {"error": str(exc)}
+
+
+def start(database):
+    """Let the listener run explains on the current event loop against database"""
+    global db, loop
+    db = database
+    loop = asyncio.get_running_loop()
@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+# Database will be injected from server.py
+db = None
+
+# When enabled, per-status counts for these collections are kept in stats_counters
+# by the routers' write paths, so the dashboard reads them with a single query.
+COUNTED_COLLECTIONS = ("vehicles", "drivers", "work_orders", "alerts")
+enabled = os.environ.get('DASHBOARD_COUNTERS', '').lower() in ('1', 'true', 'yes')
+
+
+def _status_key(status) -> str:
+    """status as a by_status field name: "." would nest and a leading "$" is an operator,
+    so both are escaped (with "%" itself) the way URLs escape them"""
+    return str(status).replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def _status(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+async def status_counts(collection_name: str) -> dict:
+    """Count a collection's documents per status in one $group pass.
+
+    total counts every document, with or without a status, as record_insert does.
+    """
+    pipeline = [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+    by_status = {}
+    total = 0
+    async for row in db[collection_name].aggregate(pipeline):
+        total += row["count"]
+        if row["_id"] is not None:
+            by_status[row["_id"]] = row["count"]
+    return {"total": total, "by_status": by_status}
+
+
+async def read_counts() -> dict:
+    """Return {collection: {"total", "by_status"}} from the maintained counters"""
+    counts = {name: {"total": 0, "by_status": {}} for name in COUNTED_COLLECTIONS}
+    cursor = db.stats_counters.find({"_id": {"$in": list(COUNTED_COLLECTIONS)}})
+    async for doc in cursor:
+        by_status = {_status(key): n for key, n in doc.get("by_status", {}).items() if n}
+        counts[doc["_id"]] = {"total": doc.get("total", 0), "by_status": by_status}
+    return counts
+
+
+async def rebuild():
+    """Recompute every counter from the source collections"""
+    results = await asyncio.gather(*(status_counts(name) for name in COUNTED_COLLECTIONS))
+    for name, counts in zip(COUNTED_COLLECTIONS, results):
+        stored = {"total": counts["total"], "by_status": {_status_key(status): n for status, n in counts["by_status"].items()}}
+        await db.stats_counters.replace_one({"_id": name}, stored, upsert=True)
+    return dict(zip(COUNTED_COLLECTIONS, results))
+
+
+async def _apply(collection_name: str, increments: dict):
+    increments = {field: n for field, n in increments.items() if n}
+    if enabled and increments:
+        await db.stats_counters.update_one({"_id": collection_name}, {"$inc": increments}, upsert=True)
+
+
+async def record_insert(collection_name: str, status):
+    increments = {"total": 1}
+    if status is not None:
+        increments[f"by_status.{_status_key(status)}"] = 1
+    await _apply(collection_name, increments)
+
+
+async def record_delete(collection_name: str, status):
+    increments = {"total": -1}
+    if status is not None:
+        increments[f"by_status.{_status_key(status)}"] = -1
+    await _apply(collection_name, increments)
+
+
+async def record_status_change(collection_name: str, old_status, new_status):
+    if old_status == new_status:
+        return
+    increments = {}
+    if old_status is not None:
+        increments[f"by_status.{_status_key(old_status)}"] = -1
+    if new_status is not None:
+        increments[f"by_status.{_status_key(new_status)}"] = 1
+    await _apply(collection_name, increments)
+
+
+async def adjust(collection_name: str, total: int = 0, by_status: dict = None):
+    """Apply net changes from a batch of writes in a single update"""
+    increments = {"total": total}
+    for status, n in (by_status or {}).items():
+        increments[f"by_status.{_status_key(status)}"] = n
+    await _apply(collection_name, increments)
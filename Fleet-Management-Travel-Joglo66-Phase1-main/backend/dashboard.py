@@ -1,7 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends
 from datetime import datetime, timezone, timedelta
+import asyncio
+import os
 from models import DashboardStats, User
-from auth import get_current_user
+from auth import get_current_user, require_admin
+from cache import SingleFlight, TTLCache
+import counters
+import load_shedding
 
 
 dashboard_router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
@@ -9,60 +14,87 @@ dashboard_router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 # Database will be injected from server.py
 db = None
 
-@dashboard_router.get("/stats", response_model=DashboardStats)
-async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
-    """Get dashboard statistics"""
-    
-    # Get counts
-    total_vehicles = await db.vehicles.count_documents({})
-    active_vehicles = await db.vehicles.count_documents({"status": "Active"})
-    maintenance_vehicles = await db.vehicles.count_documents({"status": "Maintenance"})
-    
-    total_drivers = await db.drivers.count_documents({})
-    active_drivers = await db.drivers.count_documents({"status": "Active"})
-    
-    pending_work_orders = await db.work_orders.count_documents({"status": "Pending"})
-    completed_work_orders = await db.work_orders.count_documents({"status": "Completed"})
+# Every user sees the same stats, so a burst at shift start shares one computation and
+# reuses its result for a few seconds; 0 turns the reuse off (requests still coalesce)
+DASHBOARD_STATS_TTL = float(os.environ.get('DASHBOARD_STATS_TTL', 5))
+_stats_cache = TTLCache(maxsize=1, ttl=DASHBOARD_STATS_TTL)
+_stats_builds = SingleFlight()
+
+async def _sum_since(collection_name: str, since: datetime, fields: list, match: dict = None) -> dict:
+    """Sum the given fields over documents dated on or after since, in one $group pass"""
+    group = {"_id": None, "count": {"$sum": 1}}
+    for field in fields:
+        group[field] = {"$sum": {"$ifNull": [f"${field}", 0]}}
     
-    total_alerts = await db.alerts.count_documents({"status": "Active"})
+    rows = await db[collection_name].aggregate([
+        {"$match": {"date": {"$gte": since}, **(match or {})}},
+        {"$group": group}
+    ]).to_list(1)
     
+    if not rows:
+        return {"count": 0, **{field: 0 for field in fields}}
+    return rows[0]
+
+async def _status_counts() -> dict:
+    if counters.enabled:
+        return await counters.read_counts()
+    results = await asyncio.gather(*(counters.status_counts(name) for name in counters.COUNTED_COLLECTIONS))
+    return dict(zip(counters.COUNTED_COLLECTIONS, results))
+
+async def _compute_stats() -> DashboardStats:
     # Calculate monthly costs (last 30 days)
     thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
     
-    fuel_logs = await db.fuel_logs.find({
-        "date": {"$gte": thirty_days_ago}
-    }).to_list(1000)
-    monthly_fuel_cost = sum(log["cost"] for log in fuel_logs)
+    # Status counts and monthly totals come from independent collections, so run them together
+    # Efficiency only counts fills with a distance (see fuel_analytics); the first fill of a
+    # vehicle has litres but no kilometres to set them against
+    with load_shedding.heavy_reads.slot():
+        counts, fuel, driven, maintenance = await asyncio.gather(
+            _status_counts(),
+            _sum_since("fuel_logs", thirty_days_ago, ["cost"]),
+            _sum_since("fuel_logs", thirty_days_ago, ["distance", "quantity"], {"distance": {"$gt": 0}}),
+            _sum_since("maintenance_records", thirty_days_ago, ["cost"])
+        )
     
-    maintenance_records = await db.maintenance_records.find({
-        "date": {"$gte": thirty_days_ago}
-    }).to_list(1000)
-    monthly_maintenance_cost = sum(record["cost"] for record in maintenance_records)
+    vehicles = counts["vehicles"]
+    drivers = counts["drivers"]
+    work_orders = counts["work_orders"]
+    alerts = counts["alerts"]
     
     # Calculate average fuel efficiency
-    if fuel_logs:
-        total_fuel = sum(log["quantity"] for log in fuel_logs)
-        if total_fuel > 0:
-            avg_fuel_efficiency = round(sum(log.get("odometer", 0) for log in fuel_logs) / total_fuel, 2)
-        else:
-            avg_fuel_efficiency = 0
+    if driven["quantity"] > 0:
+        avg_fuel_efficiency = round(driven["distance"] / driven["quantity"], 2)
     else:
         avg_fuel_efficiency = 0
     
-    # Calculate total mileage this month
-    total_mileage = sum(log.get("odometer", 0) for log in fuel_logs)
-    
-    return DashboardStats(
-        totalVehicles=total_vehicles,
-        activeVehicles=active_vehicles,
-        maintenanceVehicles=maintenance_vehicles,
-        totalDrivers=total_drivers,
-        activeDrivers=active_drivers,
-        pendingWorkOrders=pending_work_orders,
-        completedWorkOrders=completed_work_orders,
-        totalAlerts=total_alerts,
-        monthlyFuelCost=monthly_fuel_cost,
-        monthlyMaintenanceCost=monthly_maintenance_cost,
+    stats = DashboardStats(
+        totalVehicles=vehicles["total"],
+        activeVehicles=vehicles["by_status"].get("Active", 0),
+        maintenanceVehicles=vehicles["by_status"].get("Maintenance", 0),
+        totalDrivers=drivers["total"],
+        activeDrivers=drivers["by_status"].get("Active", 0),
+        pendingWorkOrders=work_orders["by_status"].get("Pending", 0),
+        completedWorkOrders=work_orders["by_status"].get("Completed", 0),
+        totalAlerts=alerts["by_status"].get("Active", 0),
+        monthlyFuelCost=fuel["cost"],
+        monthlyMaintenanceCost=maintenance["cost"],
         avgFuelEfficiency=avg_fuel_efficiency,
-        totalMileageThisMonth=int(total_mileage)
+        totalMileageThisMonth=int(driven["distance"])
     )
+    _stats_cache.set("stats", stats)
+    return stats
+
+@dashboard_router.get("/stats", response_model=DashboardStats)
+async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
+    """Get dashboard statistics"""
+    stats = _stats_cache.get("stats")
+    if stats is None:
+        stats = await _stats_builds.run("stats", _compute_stats)
+    return stats
+
+@dashboard_router.post("/counters/rebuild")
+async def rebuild_counters(current_user: User = Depends(require_admin)):
+    """Recompute the incremental status counters from the source collections"""
+    result = await counters.rebuild()
+    _stats_cache.clear()
+    return result
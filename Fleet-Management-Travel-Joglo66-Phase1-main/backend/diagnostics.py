@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import os
+from models import User
+from auth import require_admin
+import command_monitor
+import load_shedding
+import metrics
+import response_cache
+
+
+diagnostics_router = APIRouter(prefix="/diagnostics", tags=["Diagnostics"])
+# Served at the app root (/metrics) where Prometheus expects it, outside /api
+metrics_router = APIRouter(tags=["Diagnostics"])
+
+# When set, scrapers must send "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(authorization: Optional[str] = Header(None)):
+    """Per-route HTTP and per-collection Mongo metrics in Prometheus text format"""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    lines = metrics.render_http()
+    lines += metrics.render_histograms(
+        "mongodb_command_duration_seconds", "MongoDB command round trip, by collection and command.",
+        [({"collection": collection, "command": name}, histogram) for (collection, name), histogram in list(command_monitor.listener.histograms.items())],
+        scale=0.001
+    )
+    lines += ["# HELP load_shed_requests_total Requests answered 503 because their limiter was full.", "# TYPE load_shed_requests_total counter"]
+    lines += [f'load_shed_requests_total{{limiter="{limiter.name}"}} {limiter.shed}' for limiter in load_shedding.limiters]
+    lines += ["# HELP load_shed_in_flight Computations currently holding a limiter slot.", "# TYPE load_shed_in_flight gauge"]
+    lines += [f'load_shed_in_flight{{limiter="{limiter.name}"}} {limiter.in_flight}' for limiter in load_shedding.limiters]
+    lines += ["# HELP response_cache_coalesced_total Requests that awaited an identical in-flight response build.", "# TYPE response_cache_coalesced_total counter"]
+    lines.append(f"response_cache_coalesced_total {response_cache.builds.shared}")
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+@diagnostics_router.get("/db")
+async def get_db_command_stats(current_user: User = Depends(require_admin)):
+    """Latency histograms per collection and command, slowest total first, plus the recent slow commands"""
+    return command_monitor.listener.stats()
+
+@diagnostics_router.post("/db/reset")
+async def reset_db_command_stats(current_user: User = Depends(require_admin)):
+    """Start the command histograms and slow log from scratch"""
+    command_monitor.listener.reset()
+    return {"message": "Command statistics reset"}
+
+@diagnostics_router.get("/load")
+async def get_load_stats(current_user: User = Depends(require_admin)):
+    """Concurrency limiter occupancy and shed counts, and how many requests were coalesced"""
+    return {
+        "limiters": {limiter.name: limiter.stats() for limiter in load_shedding.limiters},
+        "response_builds": response_cache.builds.stats(),
+    }
@@ -1,82 +1,116 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
 from datetime import datetime, timezone
-import uuid
-from typing import List
-from models import Driver, DriverCreate, DriverAssignment, DriverAssignmentCreate, User
+import asyncio
+from typing import List, Optional
+from models import Driver, DriverCreate, DriverUpdate, DriverAssignment, DriverAssignmentCreate, DriverAssignmentEnd, User
 from auth import get_current_user
+import counters
+import load_shedding
+import response_cache
+import schedule
+import search
+import serialization
+from pagination import PageParams, page_params, paginate, match_fields, date_range
+from repository import Repository, patch_fields
+from vehicles import vehicles
 
 
 drivers_router = APIRouter(prefix="/drivers", tags=["Drivers"])
 
-# Database will be injected from server.py
-db = None
+drivers = Repository("drivers", "driver_id", "drv", "Driver")
+assignments = Repository("driver_assignments", "assignment_id", "asn", "Assignment")
+
+async def _apply_update(driver_id: str, fields: dict):
+    previous, updated = await drivers.update_with_previous(driver_id, fields)
+    await counters.record_status_change("drivers", previous.get("status"), updated.get("status"))
+    response_cache.bump("drivers")
+    search.index.put("driver", updated)
+    return serialization.respond(Driver, updated)
 
 @drivers_router.get("", response_model=List[Driver])
-async def get_drivers(current_user: User = Depends(get_current_user)):
-    """Get all drivers"""
-    drivers = await db.drivers.find({}, {"_id": 0}).to_list(1000)
-    return drivers
+async def get_drivers(
+    request: Request,
+    status: Optional[str] = None,
+    page: PageParams = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    """Get drivers, one page at a time"""
+    query = match_fields(status=status)
+    load = lambda response: paginate(drivers.collection, query, "driver_id", page, response)
+    return await response_cache.serve(request, "drivers", List[Driver], load, load_shedding.heavy_reads)
 
 @drivers_router.post("", response_model=Driver)
 async def create_driver(driver: DriverCreate, current_user: User = Depends(get_current_user)):
     """Create a new driver"""
-    driver_id = f"drv_{uuid.uuid4().hex[:12]}"
-    driver_doc = driver.dict()
-    driver_doc["driver_id"] = driver_id
+    driver_doc = drivers.new_doc(driver.dict())
     driver_doc["documents"] = []
     driver_doc["performance_notes"] = []
-    driver_doc["created_at"] = datetime.now(timezone.utc)
     
-    await db.drivers.insert_one(driver_doc)
+    await drivers.insert(driver_doc)
+    await counters.record_insert("drivers", driver_doc["status"])
+    response_cache.bump("drivers")
+    search.index.put("driver", driver_doc)
     
-    return Driver(**driver_doc)
+    return serialization.respond(Driver, driver_doc)
 
 @drivers_router.get("/{driver_id}", response_model=Driver)
-async def get_driver(driver_id: str, current_user: User = Depends(get_current_user)):
+async def get_driver(driver_id: str, request: Request, current_user: User = Depends(get_current_user)):
     """Get driver by ID"""
-    driver = await db.drivers.find_one({"driver_id": driver_id}, {"_id": 0})
-    if not driver:
-        raise HTTPException(status_code=404, detail="Driver not found")
-    return Driver(**driver)
+    return await response_cache.serve(request, "drivers", Driver, lambda response: drivers.get(driver_id))
 
 @drivers_router.put("/{driver_id}", response_model=Driver)
 async def update_driver(driver_id: str, driver: DriverCreate, current_user: User = Depends(get_current_user)):
     """Update driver"""
-    existing = await db.drivers.find_one({"driver_id": driver_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Driver not found")
-    
-    await db.drivers.update_one(
-        {"driver_id": driver_id},
-        {"$set": driver.dict()}
-    )
-    
-    updated_driver = await db.drivers.find_one({"driver_id": driver_id}, {"_id": 0})
-    return Driver(**updated_driver)
+    return await _apply_update(driver_id, driver.dict())
+
+@drivers_router.patch("/{driver_id}", response_model=Driver)
+async def patch_driver(driver_id: str, driver: DriverUpdate, current_user: User = Depends(get_current_user)):
+    """Update only the driver fields that were sent"""
+    return await _apply_update(driver_id, patch_fields(driver))
 
 @drivers_router.delete("/{driver_id}")
 async def delete_driver(driver_id: str, current_user: User = Depends(get_current_user)):
     """Delete driver"""
-    result = await db.drivers.delete_one({"driver_id": driver_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Driver not found")
+    deleted = await drivers.delete(driver_id, projection={"status": 1})
+    await counters.record_delete("drivers", deleted.get("status"))
+    response_cache.bump("drivers")
+    search.index.remove("driver", driver_id)
     return {"message": "Driver deleted successfully"}
 
 # Driver Assignments
 @drivers_router.get("/{driver_id}/assignments", response_model=List[DriverAssignment])
-async def get_driver_assignments(driver_id: str, current_user: User = Depends(get_current_user)):
-    """Get all assignments for a driver"""
-    assignments = await db.driver_assignments.find({"driver_id": driver_id}, {"_id": 0}).to_list(1000)
-    return assignments
+async def get_driver_assignments(
+    driver_id: str,
+    request: Request,
+    vehicle_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    """Get assignments for a driver, one page at a time"""
+    query = match_fields(driver_id=driver_id, vehicle_id=vehicle_id)
+    query.update(date_range("start_date", date_from, date_to))
+    load = lambda response: paginate(assignments.collection, query, "assignment_id", page, response)
+    return await response_cache.serve(request, "driver_assignments", List[DriverAssignment], load, load_shedding.heavy_reads)
 
 @drivers_router.post("/{driver_id}/assignments", response_model=DriverAssignment)
 async def create_driver_assignment(driver_id: str, assignment: DriverAssignmentCreate, current_user: User = Depends(get_current_user)):
-    """Assign driver to vehicle"""
-    assignment_id = f"asn_{uuid.uuid4().hex[:12]}"
-    assignment_doc = assignment.dict()
-    assignment_doc["assignment_id"] = assignment_id
-    assignment_doc["created_at"] = datetime.now(timezone.utc)
+    """Assign driver to vehicle; 409 if either is already assigned in that period"""
+    if assignment.driver_id != driver_id:
+        raise HTTPException(status_code=400, detail="driver_id in the body does not match the path")
+    await asyncio.gather(drivers.get(driver_id, {"_id": 1}), vehicles.get(assignment.vehicle_id, {"_id": 1}))
+    
+    assignment_doc = await schedule.create_assignment(assignments.new_doc(assignment.dict()))
+    response_cache.bump("driver_assignments")
     
-    await db.driver_assignments.insert_one(assignment_doc)
+    return serialization.respond(DriverAssignment, assignment_doc)
+
+@drivers_router.post("/{driver_id}/assignments/{assignment_id}/end", response_model=DriverAssignment)
+async def end_driver_assignment(driver_id: str, assignment_id: str, assignment_end: DriverAssignmentEnd, current_user: User = Depends(get_current_user)):
+    """End an open-ended assignment, freeing the driver and vehicle from end_date (default now)"""
+    end_date = assignment_end.end_date or datetime.now(timezone.utc)
+    assignment_doc = await schedule.end_assignment(driver_id, assignment_id, end_date)
+    response_cache.bump("driver_assignments")
     
-    return DriverAssignment(**assignment_doc)
+    return serialization.respond(DriverAssignment, assignment_doc)
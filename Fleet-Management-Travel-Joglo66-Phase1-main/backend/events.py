@@ -0,0 +1,134 @@
+"""In-process publish/subscribe used to push changes to connected clients.
+
+Every subscriber owns a bounded queue and publish() never waits on it: when a queue
+fills up its pending events are discarded and the client is told to resync (refetch,
+then keep applying deltas), so a slow consumer can neither hold up the request that
+published nor grow memory without bound. The most recent events are kept so a
+reconnecting client can resume from its Last-Event-ID.
+
+The broker lives in the worker process; with several workers each client only sees
+changes made through the worker it is connected to.
+"""
+from collections import deque
+from dataclasses import dataclass
+from fastapi.encoders import jsonable_encoder
+import asyncio
+import itertools
+import json
+import os
+
+EVENT_QUEUE_SIZE = int(os.environ.get('EVENT_QUEUE_SIZE', 256))
+EVENT_HISTORY_SIZE = int(os.environ.get('EVENT_HISTORY_SIZE', 1000))
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get('EVENT_HEARTBEAT_SECONDS', 15))
+
+
+@dataclass
+class Event:
+    id: int
+    topic: str
+    type: str
+    data: str  # JSON, serialised once and shared by every subscriber
+
+    def sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n"
+
+
+class Subscription:
+    def __init__(self, topics: set, queue_size: int):
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        # Set when events were lost; the client must refetch instead of applying deltas
+        self.resync = False
+
+
+class Broker:
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE, history_size: int = EVENT_HISTORY_SIZE):
+        self.queue_size = queue_size
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self.published = 0
+        self.resyncs = 0
+
+    def publish(self, topic: str, type: str, payload) -> Event:
+        """Queue an event for every subscriber of topic without blocking"""
+        self._last_id = next(self._ids)
+        event = Event(self._last_id, topic, type, json.dumps(jsonable_encoder(payload)))
+        self._history.append(event)
+        self.published += 1
+
+        for subscription in list(self._subscribers):
+            if topic not in subscription.topics:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.resync = True
+                self._subscribers.discard(subscription)
+                self.resyncs += 1
+        return event
+
+    def subscribe(self, topics: set, last_event_id: int = None) -> Subscription:
+        """Register a subscriber, replaying events it missed since last_event_id when still held"""
+        subscription = Subscription(topics, self.queue_size)
+        if last_event_id is not None:
+            oldest_id = self._history[0].id if self._history else self._last_id + 1
+            missed = [event for event in self._history if event.id > last_event_id and event.topic in topics]
+            # Gaps in the history, ids from before a restart, or more than fits the queue
+            if last_event_id + 1 < oldest_id or last_event_id > self._last_id or len(missed) > self.queue_size:
+                subscription.resync = True
+            else:
+                for event in missed:
+                    subscription.queue.put_nowait(event)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def restart(self, subscription: Subscription) -> int:
+        """Discard a lagging subscription's backlog and resume it from the latest event"""
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.resync = False
+        self._subscribers.add(subscription)
+        return self._last_id
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "last_event_id": self._last_id,
+            "history": len(self._history),
+            "queue_size": self.queue_size,
+            "resyncs": self.resyncs,
+        }
+
+
+broker = Broker()
+
+
+def publish(topic: str, type: str, payload) -> Event:
+    return broker.publish(topic, type, payload)
+
+
+async def sse_stream(request, subscription: Subscription, heartbeat: float = EVENT_HEARTBEAT_SECONDS):
+    """Render a subscription as a Server-Sent Events stream"""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            if subscription.resync:
+                # The id moves the client's Last-Event-ID past everything it is about to refetch
+                yield f"id: {broker.restart(subscription)}\nevent: resync\ndata: {{}}\n\n"
+                continue
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            yield event.sse()
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,128 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from datetime import datetime, date
+from typing import Optional
+import csv
+import io
+import json
+import zlib
+from models import Vehicle, Driver, FuelLog, MaintenanceRecord, WorkOrder, Part, Tire, Inspection, Alert, User
+from auth import get_current_user
+from pagination import match_fields, date_range
+
+
+exports_router = APIRouter(prefix="/export", tags=["Export"])
+
+# Database will be injected from server.py
+db = None
+
+# Export name -> (collection, model whose fields become the CSV columns, date field used
+# for ranges and ordering, id field breaking ties); indexes.py declares a (date, id) index
+# for each, and a (vehicle_id or driver_id, date, id) index for each filter it takes, so
+# exports stream in index order instead of sorting in memory
+EXPORTS = {
+    "vehicles": ("vehicles", Vehicle, "created_at", "vehicle_id"),
+    "drivers": ("drivers", Driver, "created_at", "driver_id"),
+    "fuel": ("fuel_logs", FuelLog, "date", "log_id"),
+    "maintenance": ("maintenance_records", MaintenanceRecord, "date", "record_id"),
+    "work-orders": ("work_orders", WorkOrder, "scheduled_date", "order_id"),
+    "parts": ("parts_inventory", Part, "created_at", "part_id"),
+    "tires": ("tires", Tire, "created_at", "tire_id"),
+    "inspections": ("inspections", Inspection, "date", "inspection_id"),
+    "alerts": ("alerts", Alert, "created_at", "alert_id"),
+}
+
+# Bytes accumulated before a chunk is handed to the server
+EXPORT_CHUNK_BYTES = 64 * 1024
+EXPORT_CURSOR_BATCH = 1000
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        # Same convention the bulk importer reads back
+        return json.dumps(value, default=_json_default)
+    return value
+
+async def _serialize(cursor, format: str, columns: list):
+    if format == "ndjson":
+        async for doc in cursor:
+            yield json.dumps(doc, default=_json_default) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for doc in cursor:
+        writer.writerow([_csv_cell(doc.get(column)) for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+async def _encode(rows, compress: bool):
+    """Encode rows, gzip them if asked, and coalesce output into EXPORT_CHUNK_BYTES chunks"""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    pending = []
+    pending_size = 0
+    async for text in rows:
+        data = text.encode("utf-8")
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            pending.append(data)
+            pending_size += len(data)
+        if pending_size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(pending)
+            pending = []
+            pending_size = 0
+    if compressor:
+        pending.append(compressor.flush())
+    if pending:
+        yield b"".join(pending)
+
+@exports_router.get("/{name}")
+async def export_collection(
+    name: str,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    vehicle_id: Optional[str] = None,
+    driver_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream a full collection export as CSV or NDJSON"""
+    if name not in EXPORTS:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    collection_name, model, date_field, id_field = EXPORTS[name]
+    columns = list(model.model_fields)
+
+    if vehicle_id is not None and "vehicle_id" not in columns:
+        raise HTTPException(status_code=400, detail=f"{name} cannot be filtered by vehicle_id")
+    if driver_id is not None and "driver_id" not in columns:
+        raise HTTPException(status_code=400, detail=f"{name} cannot be filtered by driver_id")
+
+    query = match_fields(vehicle_id=vehicle_id, driver_id=driver_id)
+    query.update(date_range(date_field, date_from, date_to))
+
+    cursor = db[collection_name].find(query, {"_id": 0}) \
+        .sort([(date_field, 1), (id_field, 1)]) \
+        .batch_size(EXPORT_CURSOR_BATCH)
+
+    filename = f"{collection_name}.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if format == "csv" else "application/x-ndjson")
+
+    return StreamingResponse(
+        _encode(_serialize(cursor, format, columns), gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
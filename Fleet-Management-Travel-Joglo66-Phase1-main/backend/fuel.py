@@ -1,50 +1,81 @@
-from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime, timezone
-import uuid
-from typing import List
-from models import FuelLog, FuelLogCreate, User
-from auth import get_current_user
+from fastapi import APIRouter, Depends, Request
+from datetime import datetime
+from typing import List, Optional
+from models import FuelLog, FuelLogCreate, VehicleFuelEfficiency, User
+from auth import get_current_user, require_admin
+import fuel_analytics
+import load_shedding
+import response_cache
+import rollups
+import service_alerts
+from pagination import PageParams, page_params, page_response, match_fields, date_range
+import serialization
+from repository import Repository
 
 
 fuel_router = APIRouter(prefix="/fuel", tags=["Fuel"])
 
-# Database will be injected from server.py
-db = None
+fuel_logs = Repository("fuel_logs", "log_id", "fuel", "Fuel log")
+
+def build_fuel_log_doc(log: FuelLogCreate) -> dict:
+    """Build the stored document for a new fuel log"""
+    log_doc = fuel_logs.new_doc(log.dict())
+    
+    # distance, km_per_l and cost_per_km depend on the previous fill-up; fuel_analytics fills them in
+    log_doc["cost_per_km"] = 0
+    log_doc["distance"] = None
+    log_doc["km_per_l"] = None
+    
+    return log_doc
 
 @fuel_router.get("", response_model=List[FuelLog])
-async def get_fuel_logs(current_user: User = Depends(get_current_user)):
-    """Get all fuel logs"""
-    logs = await db.fuel_logs.find({}, {"_id": 0}).to_list(1000)
-    return logs
+async def get_fuel_logs(
+    vehicle_id: Optional[str] = None,
+    driver_id: Optional[str] = None,
+    fuel_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    """Get fuel logs, one page at a time"""
+    query = match_fields(vehicle_id=vehicle_id, driver_id=driver_id, fuel_type=fuel_type)
+    query.update(date_range("date", date_from, date_to))
+    return await page_response(fuel_logs.collection, query, "log_id", page, FuelLog)
 
 @fuel_router.post("", response_model=FuelLog)
 async def create_fuel_log(log: FuelLogCreate, current_user: User = Depends(get_current_user)):
     """Create a new fuel log"""
-    log_id = f"fuel_{uuid.uuid4().hex[:12]}"
-    log_doc = log.dict()
-    log_doc["log_id"] = log_id
-    log_doc["created_at"] = datetime.now(timezone.utc)
+    log_doc = build_fuel_log_doc(log)
     
-    # Calculate cost per km if not provided
-    if log_doc["cost_per_km"] == 0 and log_doc["quantity"] > 0:
-        log_doc["cost_per_km"] = round(log_doc["cost"] / log_doc["quantity"], 2)
+    await fuel_logs.insert(log_doc)
+    await rollups.record("fuel", [log_doc])
+    await service_alerts.on_mileage_readings(service_alerts.mileage_readings([log_doc], "odometer"))
+    derived = await fuel_analytics.refresh([log_doc["vehicle_id"]])
+    log_doc.update(derived.get(log_doc["log_id"], {}))
     
-    await db.fuel_logs.insert_one(log_doc)
-    
-    return FuelLog(**log_doc)
+    return serialization.respond(FuelLog, log_doc)
+
+@fuel_router.get("/efficiency", response_model=List[VehicleFuelEfficiency])
+async def get_fuel_efficiency(request: Request, vehicle_id: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """Get km/L and cost/km per vehicle"""
+    load = lambda response: fuel_analytics.vehicle_stats(match_fields(vehicle_id=vehicle_id))
+    return await response_cache.serve(request, fuel_analytics.STATS_COLLECTION, List[VehicleFuelEfficiency], load, load_shedding.heavy_reads)
+
+@fuel_router.post("/efficiency/rebuild")
+async def rebuild_fuel_efficiency(current_user: User = Depends(require_admin)):
+    """Recompute fuel efficiency for every log and vehicle and re-evaluate FuelEfficiency alerts"""
+    return await fuel_analytics.rebuild()
 
 @fuel_router.get("/{log_id}", response_model=FuelLog)
 async def get_fuel_log(log_id: str, current_user: User = Depends(get_current_user)):
     """Get fuel log by ID"""
-    log = await db.fuel_logs.find_one({"log_id": log_id}, {"_id": 0})
-    if not log:
-        raise HTTPException(status_code=404, detail="Fuel log not found")
-    return FuelLog(**log)
+    return serialization.respond(FuelLog, await fuel_logs.get(log_id))
 
 @fuel_router.delete("/{log_id}")
 async def delete_fuel_log(log_id: str, current_user: User = Depends(get_current_user)):
     """Delete fuel log"""
-    result = await db.fuel_logs.delete_one({"log_id": log_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Fuel log not found")
+    deleted = await fuel_logs.delete(log_id, projection={"vehicle_id": 1, "date": 1})
+    await rollups.refresh_for("fuel", deleted)
+    await fuel_analytics.refresh([deleted.get("vehicle_id")])
     return {"message": "Fuel log deleted successfully"}
@@ -0,0 +1,250 @@
+"""Per-fill fuel efficiency, computed with pandas for many vehicles in one pass.
+
+Each vehicle's fuel logs are ordered by odometer (then date). A fill's distance is its
+odometer minus the previous fill's, so km_per_l is that distance over the litres put in
+at this fill and cost_per_km is this fill's cost over the same distance. A vehicle's
+first fill, and any fill that repeats the previous odometer reading, has no distance.
+
+The derived values are written back onto fuel_logs (distance, km_per_l, cost_per_km)
+and summed per vehicle into vehicle_fuel_stats, which serves GET /fuel/efficiency. A new
+or deleted log only recomputes its own vehicle. Fills whose km/L sits far from the
+vehicle's median (robust z-score over the median absolute deviation) raise
+FuelEfficiency alerts. Recompute the whole fleet with:
+
+    python fuel_analytics.py rebuild
+"""
+from pymongo import UpdateOne
+from datetime import datetime, timezone
+import os
+import numpy as np
+import pandas as pd
+import alert_sync
+import counters
+import response_cache
+
+# Database will be injected from server.py
+db = None
+
+STATS_COLLECTION = "vehicle_fuel_stats"
+
+FUEL_OUTLIER_THRESHOLD = float(os.environ.get('FUEL_OUTLIER_THRESHOLD', 3.5))
+FUEL_OUTLIER_MIN_FILLS = int(os.environ.get('FUEL_OUTLIER_MIN_FILLS', 5))
+# Floor on the spread, as a fraction of the median, so a vehicle with near-identical
+# fills doesn't flag every small wobble
+MIN_RELATIVE_SPREAD = 0.05
+
+LOG_FIELDS = ["log_id", "vehicle_id", "date", "odometer", "quantity", "cost"]
+DERIVED_FIELDS = {"distance": 0, "km_per_l": 2, "cost_per_km": 2}  # field -> rounding
+
+
+def analyze(logs: pd.DataFrame) -> pd.DataFrame:
+    """Add distance, km_per_l, cost_per_km, median_km_per_l and outlier columns to logs"""
+    frame = logs.sort_values(["vehicle_id", "odometer", "date"], kind="mergesort").reset_index(drop=True)
+    by_vehicle = frame.groupby("vehicle_id", sort=False)
+
+    distance = by_vehicle["odometer"].diff()
+    distance = distance.where(distance > 0)
+    quantity = frame["quantity"].where(frame["quantity"] > 0)
+    frame["distance"] = distance
+    frame["km_per_l"] = distance / quantity
+    frame["cost_per_km"] = frame["cost"] / distance
+
+    efficiency = frame.groupby("vehicle_id", sort=False)["km_per_l"]
+    median = efficiency.transform("median")
+    deviation = (frame["km_per_l"] - median).abs()
+    spread = deviation.groupby(frame["vehicle_id"], sort=False).transform("median")
+    spread = np.maximum(spread, median * MIN_RELATIVE_SPREAD)
+    # 0.6745 scales the MAD to a standard deviation for normally distributed data
+    score = 0.6745 * (frame["km_per_l"] - median) / spread
+    frame["median_km_per_l"] = median
+    frame["score"] = score
+    frame["outlier"] = (efficiency.transform("count") >= FUEL_OUTLIER_MIN_FILLS) & (score.abs() > FUEL_OUTLIER_THRESHOLD)
+    return frame
+
+
+def summarize(frame: pd.DataFrame) -> pd.DataFrame:
+    """One row per vehicle: totals over the fills that have an efficiency, plus fleet-comparable ratios"""
+    # Both a distance and a quantity, so a zero-litre fill can't add kilometres without litres
+    measured = frame["km_per_l"].notna()
+    totals = pd.DataFrame({
+        "vehicle_id": frame["vehicle_id"],
+        "distance": frame["distance"].where(measured, 0),
+        "quantity": frame["quantity"].where(measured, 0),
+        "cost": frame["cost"].where(measured, 0),
+        "outliers": frame["outlier"].astype(int),
+    }).groupby("vehicle_id").sum()
+    by_vehicle = frame.groupby("vehicle_id")
+    totals["fills"] = by_vehicle.size()
+    totals["last_odometer"] = by_vehicle["odometer"].max()
+    totals["median_km_per_l"] = by_vehicle["median_km_per_l"].first()
+    totals["km_per_l"] = totals["distance"] / totals["quantity"].where(totals["quantity"] > 0)
+    totals["cost_per_km"] = totals["cost"] / totals["distance"].where(totals["distance"] > 0)
+    return totals
+
+
+def _frame(docs: list) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(docs, columns=LOG_FIELDS + list(DERIVED_FIELDS))
+    for field in ("odometer", "quantity", "cost"):
+        frame[field] = pd.to_numeric(frame[field], errors="coerce").fillna(0)
+    return frame
+
+
+def _value(value, digits: int):
+    if pd.isna(value):
+        return None
+    return int(round(value)) if digits == 0 else round(float(value), digits)
+
+
+def _derived_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    derived = pd.DataFrame({field: frame[field].round(digits) for field, digits in DERIVED_FIELDS.items()})
+    # cost_per_km is a required float on FuelLog; a fill without a distance has none
+    derived["cost_per_km"] = derived["cost_per_km"].fillna(0)
+    return derived
+
+
+def _fields(row) -> dict:
+    return {field: _value(getattr(row, field), digits) for field, digits in DERIVED_FIELDS.items()}
+
+
+async def _load(vehicle_ids=None) -> pd.DataFrame:
+    query = {} if vehicle_ids is None else {"vehicle_id": {"$in": list(vehicle_ids)}}
+    projection = {"_id": 0, **{field: 1 for field in LOG_FIELDS + list(DERIVED_FIELDS)}}
+    docs = await db.fuel_logs.find(query, projection).to_list(None)
+    return _frame(docs)
+
+
+async def _write_logs(logs: pd.DataFrame, frame: pd.DataFrame) -> dict:
+    """Write changed derived values back onto fuel_logs; returns log_id -> derived fields"""
+    derived = _derived_columns(frame)
+    stored = logs.set_index("log_id").reindex(frame["log_id"]).reset_index(drop=True)
+    stored = pd.DataFrame({
+        field: pd.to_numeric(stored[field], errors="coerce").round(digits) for field, digits in DERIVED_FIELDS.items()
+    })
+    unchanged = ((derived == stored) | (derived.isna() & stored.isna())).all(axis=1)
+
+    operations = [
+        UpdateOne({"log_id": log_id}, {"$set": _fields(row)})
+        for log_id, row in zip(frame["log_id"][~unchanged], derived[~unchanged].itertuples(index=False))
+    ]
+    if operations:
+        await db.fuel_logs.bulk_write(operations, ordered=False)
+    return dict(zip(frame["log_id"], map(_fields, derived.itertuples(index=False))))
+
+
+async def _write_stats(frame: pd.DataFrame, vehicle_ids=None):
+    """Replace the stats of the given vehicles (or of the whole fleet when vehicle_ids is None)"""
+    now = datetime.now(timezone.utc)
+    summary = summarize(frame)
+    operations = []
+    for vehicle_id, row in summary.iterrows():
+        stats = {
+            "vehicle_id": vehicle_id,
+            "fills": int(row["fills"]),
+            "distance": int(row["distance"]),
+            "quantity": round(float(row["quantity"]), 2),
+            "cost": round(float(row["cost"]), 2),
+            "km_per_l": _value(row["km_per_l"], 2),
+            "cost_per_km": _value(row["cost_per_km"], 2),
+            "median_km_per_l": _value(row["median_km_per_l"], 2),
+            "outliers": int(row["outliers"]),
+            "last_odometer": int(row["last_odometer"]),
+            "updated_at": now,
+        }
+        operations.append(UpdateOne({"_id": vehicle_id}, {"$set": stats}, upsert=True))
+    if operations:
+        await db[STATS_COLLECTION].bulk_write(operations, ordered=False)
+
+    # Vehicles whose last log was deleted no longer have stats
+    remaining = list(summary.index)
+    if vehicle_ids is None:
+        await db[STATS_COLLECTION].delete_many({"_id": {"$nin": remaining}})
+    else:
+        gone = set(vehicle_ids) - set(remaining)
+        if gone:
+            await db[STATS_COLLECTION].delete_many({"_id": {"$in": list(gone)}})
+    response_cache.bump(STATS_COLLECTION)
+
+
+def _desired_alert(row, plate: str):
+    date = row.date.strftime("%Y-%m-%d") if pd.notna(row.date) else "?"
+    if row.score < 0:
+        return "Medium", f"{plate} - {row.km_per_l:.1f} km/L on the {date} fill-up, well below its usual {row.median_km_per_l:.1f} km/L"
+    return "Low", f"{plate} - {row.km_per_l:.1f} km/L on the {date} fill-up, well above its usual {row.median_km_per_l:.1f} km/L (missed fill-up or odometer error?)"
+
+
+async def _evaluate_alerts(frame: pd.DataFrame, vehicle_ids=None):
+    """Create, refresh or resolve FuelEfficiency alerts so they match the outlier fills"""
+    flagged = frame[frame["outlier"]]
+    scope = {"type": "FuelEfficiency", "status": "Active"}
+    if vehicle_ids is not None:
+        scope["vehicle_id"] = {"$in": list(vehicle_ids)}
+    active = {}
+    async for alert in db.alerts.find(scope, {"_id": 0}):
+        active[alert.get("log_id")] = alert
+    if flagged.empty and not active:
+        return
+
+    plates = {}
+    async for vehicle in db.vehicles.find(
+        {"vehicle_id": {"$in": flagged["vehicle_id"].unique().tolist()}},
+        {"_id": 0, "vehicle_id": 1, "plate": 1}
+    ):
+        plates[vehicle["vehicle_id"]] = vehicle.get("plate")
+
+    # Whatever isn't flagged any more (or had its log deleted) is resolved
+    desired = {
+        row.log_id: (*_desired_alert(row, plates.get(row.vehicle_id, row.vehicle_id)), {"vehicle_id": row.vehicle_id, "log_id": row.log_id})
+        for row in flagged.itertuples(index=False)
+    }
+    await alert_sync.reconcile(db.alerts, "FuelEfficiency", active, desired)
+
+
+async def refresh(vehicle_ids) -> dict:
+    """Recompute the given vehicles after their fuel logs changed; returns log_id -> derived fields"""
+    vehicle_ids = list({vehicle_id for vehicle_id in vehicle_ids if vehicle_id})
+    if not vehicle_ids:
+        return {}
+    logs = await _load(vehicle_ids)
+    frame = analyze(logs)
+    derived = await _write_logs(logs, frame)
+    await _write_stats(frame, vehicle_ids)
+    await _evaluate_alerts(frame, vehicle_ids)
+    return derived
+
+
+async def vehicle_stats(query: dict) -> list:
+    return await db[STATS_COLLECTION].find(query, {"_id": 0}).sort("vehicle_id", 1).to_list(None)
+
+
+async def rebuild() -> dict:
+    """Recompute every fuel log, vehicle summary and FuelEfficiency alert in one pass"""
+    logs = await _load()
+    frame = analyze(logs)
+    await _write_logs(logs, frame)
+    await _write_stats(frame)
+    await _evaluate_alerts(frame)
+    return {
+        "fuel_logs": len(frame),
+        "vehicles": int(frame["vehicle_id"].nunique()),
+        "outliers": int(frame["outlier"].sum()),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import json
+    from pathlib import Path
+    from dotenv import load_dotenv
+    import storage
+
+    parser = argparse.ArgumentParser(description="Maintain fuel efficiency figures and alerts")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = storage.connect()
+    db = client[os.environ['DB_NAME']]
+    counters.db = db
+
+    print(json.dumps(asyncio.run(rebuild())))
@@ -0,0 +1,200 @@
+"""Index declarations for every collection, applied at startup by server.py.
+
+Run as a script to inspect a live database:
+
+    python indexes.py report   # unused and missing indexes per collection
+    python indexes.py ensure   # create any missing indexes
+"""
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _unique(field: str) -> IndexModel:
+    return IndexModel([(field, ASCENDING)], name=f"{field}_unique", unique=True)
+
+
+def _active_alert(alert_type: str, *fields) -> IndexModel:
+    # At most one Active alert of a system-raised type per subject (alert_sync.py)
+    keys = [(field, ASCENDING) for field in fields]
+    name = "_".join(fields) + f"_active_{alert_type}_unique"
+    return IndexModel(keys, name=name, unique=True, partialFilterExpression={"type": alert_type, "status": "Active"})
+
+
+def _index(*fields, **kwargs) -> IndexModel:
+    # All-ascending keys serve both sort directions, as long as every key is reversed together
+    keys = [(field, ASCENDING) for field in fields]
+    name = "_".join(fields)
+    return IndexModel(keys, name=name, **kwargs)
+
+
+INDEX_SPECS = {
+    "users": [
+        _unique("user_id"),
+        _unique("email"),
+    ],
+    "user_sessions": [
+        _unique("session_token"),
+        _index("user_id"),
+        # Expired sessions are deleted by the server's TTL monitor
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "vehicles": [
+        _unique("vehicle_id"),
+        _index("status"),
+        _index("created_at", "vehicle_id"),
+    ],
+    "drivers": [
+        _unique("driver_id"),
+        _index("status"),
+        _index("created_at", "driver_id"),
+    ],
+    "driver_assignments": [
+        _unique("assignment_id"),
+        _index("driver_id", "created_at"),
+        _index("vehicle_id", "created_at"),
+        # Interval lookups for assignment conflict checks (schedule.py)
+        _index("vehicle_id", "start_date", "end_date"),
+        _index("driver_id", "start_date", "end_date"),
+    ],
+    "trips": [
+        _unique("trip_id"),
+        _index("vehicle_id", "start_time"),
+        _index("driver_id", "start_time"),
+        _index("created_at", "trip_id"),
+        # At most one in-progress trip per vehicle
+        IndexModel(
+            [("vehicle_id", ASCENDING)],
+            name="vehicle_id_in_progress_unique",
+            unique=True,
+            partialFilterExpression={"status": "In Progress"}
+        ),
+    ],
+    "trip_buckets": [
+        _index("entity", "entity_id", "day"),
+        _index("entity", "day"),
+    ],
+    "fuel_logs": [
+        _unique("log_id"),
+        _index("vehicle_id", "date", "log_id"),
+        _index("driver_id", "date", "log_id"),
+        _index("date", "log_id"),
+        _index("created_at", "log_id"),
+    ],
+    "maintenance_records": [
+        _unique("record_id"),
+        _index("vehicle_id", "date", "record_id"),
+        _index("date", "record_id"),
+        _index("created_at", "record_id"),
+    ],
+    "work_orders": [
+        _unique("order_id"),
+        _index("status"),
+        _index("vehicle_id", "created_at"),
+        _index("created_at", "order_id"),
+        _index("scheduled_date", "order_id"),
+        _index("vehicle_id", "scheduled_date", "order_id"),
+    ],
+    "parts_inventory": [
+        _unique("part_id"),
+        _index("part_number"),
+        _index("created_at", "part_id"),
+    ],
+    "tires": [
+        _unique("tire_id"),
+        _index("vehicle_id", "created_at", "tire_id"),
+        _index("created_at", "tire_id"),
+    ],
+    "inspections": [
+        _unique("inspection_id"),
+        _index("vehicle_id", "date", "inspection_id"),
+        _index("driver_id", "date", "inspection_id"),
+        _index("status"),
+        _index("created_at", "inspection_id"),
+        _index("date", "inspection_id"),
+    ],
+    "vehicle_monthly_rollups": [
+        _index("month", "vehicle_id"),
+        _index("vehicle_id", "month"),
+    ],
+    "alerts": [
+        _unique("alert_id"),
+        _index("status"),
+        _index("vehicle_id", "created_at", "alert_id"),
+        _index("driver_id", "created_at", "alert_id"),
+        _index("vehicle_id", "type", "status"),
+        _index("part_id", "type", "status", sparse=True),
+        _index("created_at", "alert_id"),
+        _active_alert("ServiceDue", "vehicle_id", "service_type"),
+        _active_alert("FuelEfficiency", "log_id"),
+        _active_alert("LowStock", "part_id"),
+    ],
+    "media": [
+        _unique("media_id"),
+        _index("owner_type", "owner_id", "created_at"),
+        # Finding whether any other upload still uses a blob (media.py)
+        _index("sha256"),
+    ],
+}
+
+
+async def ensure_indexes(db) -> dict:
+    """Create every declared index; a failing index is logged and skipped.
+
+    Startup goes on without indexes when the server can't be reached at all.
+    """
+    created = {}
+    for collection_name, models in INDEX_SPECS.items():
+        for model in models:
+            try:
+                await db[collection_name].create_indexes([model])
+                created.setdefault(collection_name, []).append(model.document["name"])
+            except OperationFailure as e:
+                # Typically duplicates blocking a unique index; the app still works without it
+                logger.error(f"Could not create index {collection_name}.{model.document['name']}: {e}")
+            except PyMongoError as e:
+                # Server unreachable or similar: every other index would fail the same way
+                logger.error(f"Could not create indexes, skipping the rest: {e}")
+                return created
+    return created
+
+
+async def index_report(db) -> dict:
+    """Report declared-but-missing indexes and existing indexes with no recorded use"""
+    report = {}
+    for collection_name, models in INDEX_SPECS.items():
+        declared = {model.document["name"] for model in models}
+        usage = {}
+        async for row in db[collection_name].aggregate([{"$indexStats": {}}]):
+            usage[row["name"]] = row["accesses"]["ops"]
+
+        report[collection_name] = {
+            "missing": sorted(declared - set(usage)),
+            "unused": sorted(name for name, ops in usage.items() if ops == 0 and name != "_id_"),
+            "undeclared": sorted(set(usage) - declared - {"_id_"}),
+            "accesses": usage,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import json
+    import os
+    from pathlib import Path
+    from dotenv import load_dotenv
+    import storage
+
+    parser = argparse.ArgumentParser(description="Manage MongoDB indexes")
+    parser.add_argument("command", choices=["report", "ensure"])
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = storage.connect()
+    database = client[os.environ['DB_NAME']]
+
+    command = index_report if args.command == "report" else ensure_indexes
+    print(json.dumps(asyncio.run(command(database)), indent=2))
@@ -1,70 +1,63 @@
-from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime, timezone
-import uuid
-from typing import List
-from models import Inspection, InspectionCreate, User
+from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import List, Optional
+from models import Inspection, InspectionCreate, InspectionUpdate, User
 from auth import get_current_user
+from pagination import PageParams, page_params, page_response, match_fields, date_range
+import serialization
+from repository import Repository, patch_fields
 
 
 inspections_router = APIRouter(prefix="/inspections", tags=["Inspections"])
 
-# Database will be injected from server.py
-db = None
+inspections = Repository("inspections", "inspection_id", "insp", "Inspection")
 
 @inspections_router.get("", response_model=List[Inspection])
-async def get_inspections(current_user: User = Depends(get_current_user)):
-    """Get all inspections"""
-    inspections = await db.inspections.find({}, {"_id": 0}).to_list(1000)
-    return inspections
+async def get_inspections(
+    vehicle_id: Optional[str] = None,
+    driver_id: Optional[str] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    """Get inspections, one page at a time"""
+    query = match_fields(vehicle_id=vehicle_id, driver_id=driver_id, status=status, type=type)
+    query.update(date_range("date", date_from, date_to))
+    return await page_response(inspections.collection, query, "inspection_id", page, Inspection)
 
 @inspections_router.post("", response_model=Inspection)
 async def create_inspection(inspection: InspectionCreate, current_user: User = Depends(get_current_user)):
     """Create a new inspection"""
-    inspection_id = f"insp_{uuid.uuid4().hex[:12]}"
-    inspection_doc = inspection.dict()
-    inspection_doc["inspection_id"] = inspection_id
-    inspection_doc["created_at"] = datetime.now(timezone.utc)
+    inspection_doc = inspections.new_doc(inspection.dict())
     
-    await db.inspections.insert_one(inspection_doc)
+    await inspections.insert(inspection_doc)
     
-    return Inspection(**inspection_doc)
+    return serialization.respond(Inspection, inspection_doc)
 
 @inspections_router.get("/{inspection_id}", response_model=Inspection)
 async def get_inspection(inspection_id: str, current_user: User = Depends(get_current_user)):
     """Get inspection by ID"""
-    inspection = await db.inspections.find_one({"inspection_id": inspection_id}, {"_id": 0})
-    if not inspection:
-        raise HTTPException(status_code=404, detail="Inspection not found")
-    return Inspection(**inspection)
+    return serialization.respond(Inspection, await inspections.get(inspection_id))
 
 @inspections_router.put("/{inspection_id}", response_model=Inspection)
 async def update_inspection(inspection_id: str, inspection: InspectionCreate, current_user: User = Depends(get_current_user)):
     """Update inspection"""
-    existing = await db.inspections.find_one({"inspection_id": inspection_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Inspection not found")
-    
-    await db.inspections.update_one(
-        {"inspection_id": inspection_id},
-        {"$set": inspection.dict()}
-    )
-    
-    updated_inspection = await db.inspections.find_one({"inspection_id": inspection_id}, {"_id": 0})
-    return Inspection(**updated_inspection)
+    return serialization.respond(Inspection, await inspections.update(inspection_id, inspection.dict()))
+
+@inspections_router.patch("/{inspection_id}", response_model=Inspection)
+async def patch_inspection(inspection_id: str, inspection: InspectionUpdate, current_user: User = Depends(get_current_user)):
+    """Update only the inspection fields that were sent"""
+    return serialization.respond(Inspection, await inspections.update(inspection_id, patch_fields(inspection)))
 
 @inspections_router.post("/{inspection_id}/approve")
 async def approve_inspection(inspection_id: str, current_user: User = Depends(get_current_user)):
     """Approve inspection"""
-    inspection = await db.inspections.find_one({"inspection_id": inspection_id})
-    if not inspection:
-        raise HTTPException(status_code=404, detail="Inspection not found")
-    
-    await db.inspections.update_one(
-        {"inspection_id": inspection_id},
-        {"$set": {
-            "status": "Approved",
-            "approved_by": current_user.user_id
-        }}
-    )
+    await inspections.update(inspection_id, {
+        "status": "Approved",
+        "approved_by": current_user.user_id
+    })
     
     return {"message": "Inspection approved successfully"}
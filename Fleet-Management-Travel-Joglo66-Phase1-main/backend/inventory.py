@@ -0,0 +1,276 @@
+"""Parts pricing and stock consumption for work orders.
+
+A work order's parts are priced from parts_inventory with one $in query whenever its
+parts or labour change, so parts_cost and total_cost are always computed server-side.
+Completing the order takes its parts out of stock: every part is decremented by a
+conditional $inc (quantity >= requested) in a single bulk write, and the order write
+only goes through if every decrement did.
+
+On a replica set or sharded cluster the decrements and the order write share a
+transaction. On a standalone server each decremented part is tagged with a token unique
+to this attempt, so a shortfall puts back exactly what this attempt took - never what a
+concurrent completion of the same order took. Moving a completed order back to any
+other status returns its parts to stock, to be consumed again if it completes later.
+Either way, a part that ends at or below min_stock raises a LowStock alert, and
+restocking resolves it.
+"""
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from datetime import datetime, timezone
+import uuid
+import alert_sync
+import response_cache
+
+# Database will be injected from server.py
+db = None
+
+# Work order fields that change what the order costs or consumes
+PRICED_FIELDS = {"parts", "labor_cost", "status"}
+
+_transactions = None
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+async def transactions_supported() -> bool:
+    """Whether the server is a replica set member or mongos; checked once per process"""
+    global _transactions
+    if _transactions is None:
+        try:
+            hello = await db.command("hello")
+            _transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception:
+            # Servers (and test doubles) that don't answer hello don't do transactions either
+            _transactions = False
+    return _transactions
+
+
+def _requested(lines: list) -> dict:
+    """part_id -> total quantity across the order's lines"""
+    requested = {}
+    for line in lines:
+        requested[line["part_id"]] = requested.get(line["part_id"], 0) + line["quantity"]
+    return requested
+
+
+async def price(lines: list):
+    """Price each line from the inventory; returns (priced lines, parts cost, part_id -> part)"""
+    part_ids = list(_requested(lines))
+    stock = {}
+    if part_ids:
+        async for part in db.parts_inventory.find(
+            {"part_id": {"$in": part_ids}},
+            {"_id": 0, "part_id": 1, "name": 1, "cost": 1, "quantity": 1, "min_stock": 1}
+        ):
+            stock[part["part_id"]] = part
+    unknown = [part_id for part_id in part_ids if part_id not in stock]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown parts: {', '.join(unknown)}")
+
+    priced = [{**line, "cost": stock[line["part_id"]].get("cost") or 0} for line in lines]
+    parts_cost = round(sum(line["cost"] * line["quantity"] for line in priced), 2)
+    return priced, parts_cost, stock
+
+
+def _check_stock(requested: dict, stock: dict):
+    short = [
+        f"{stock[part_id].get('name') or part_id} (need {quantity}, have {stock[part_id].get('quantity', 0)})"
+        for part_id, quantity in requested.items()
+        if stock[part_id].get("quantity", 0) < quantity
+    ]
+    if short:
+        raise HTTPException(status_code=409, detail=f"Not enough stock: {'; '.join(short)}")
+
+
+async def _decrement(requested: dict, now: datetime, session=None, tag: str = None):
+    """Take requested quantities out of stock in one bulk write; raises InsufficientStock if any part fell short"""
+    operations = []
+    for part_id, quantity in requested.items():
+        match = {"part_id": part_id, "quantity": {"$gte": quantity}}
+        update = {"$inc": {"quantity": -quantity}, "$set": {"updated_at": now}}
+        if tag:
+            match["consuming"] = {"$ne": tag}
+            update["$addToSet"] = {"consuming": tag}
+        operations.append(UpdateOne(match, update))
+    result = await db.parts_inventory.bulk_write(operations, ordered=False, session=session)
+    if result.matched_count < len(operations):
+        raise InsufficientStock()
+
+
+async def _restock(requested: dict, tag: str):
+    """Put back what _decrement took under tag, and only that"""
+    await db.parts_inventory.bulk_write([
+        UpdateOne({"part_id": part_id, "consuming": tag}, {"$inc": {"quantity": quantity}, "$pull": {"consuming": tag}})
+        for part_id, quantity in requested.items()
+    ], ordered=False)
+
+
+async def consume(requested: dict, write_order):
+    """Take requested parts out of stock and run write_order(session), all or nothing.
+
+    write_order returns the order document it replaced (or wrote) and raises HTTPException
+    when the order can't be written; either failure leaves stock untouched.
+    """
+    now = datetime.now(timezone.utc)
+    if await transactions_supported():
+        async with await db.client.start_session() as session:
+            try:
+                async with session.start_transaction():
+                    await _decrement(requested, now, session=session)
+                    result = await write_order(session)
+            except InsufficientStock:
+                raise HTTPException(status_code=409, detail="Not enough stock for this work order")
+    else:
+        tag = uuid.uuid4().hex
+        try:
+            await _decrement(requested, now, tag=tag)
+            result = await write_order(None)
+        except InsufficientStock:
+            await _restock(requested, tag)
+            raise HTTPException(status_code=409, detail="Not enough stock for this work order")
+        except BaseException:
+            await _restock(requested, tag)
+            raise
+        await db.parts_inventory.update_many({"part_id": {"$in": list(requested)}, "consuming": tag}, {"$pull": {"consuming": tag}})
+
+    await _stock_changed(requested)
+    return result
+
+
+async def release(requested: dict, write_order):
+    """Run write_order(session), then put requested parts back in stock.
+
+    The counterpart of consume() for an order that is no longer Completed; write_order
+    raises HTTPException when the order can't be written, and then nothing is restocked.
+    """
+    now = datetime.now(timezone.utc)
+    operations = [
+        UpdateOne({"part_id": part_id}, {"$inc": {"quantity": quantity}, "$set": {"updated_at": now}})
+        for part_id, quantity in requested.items()
+    ]
+    if await transactions_supported():
+        async with await db.client.start_session() as session:
+            async with session.start_transaction():
+                result = await write_order(session)
+                await db.parts_inventory.bulk_write(operations, ordered=False, session=session)
+    else:
+        result = await write_order(None)
+        await db.parts_inventory.bulk_write(operations, ordered=False)
+
+    await _stock_changed(requested)
+    return result
+
+
+async def _stock_changed(requested: dict):
+    response_cache.bump("parts_inventory")
+    await sync_low_stock(await db.parts_inventory.find(
+        {"part_id": {"$in": list(requested)}},
+        {"_id": 0, "part_id": 1, "name": 1, "quantity": 1, "min_stock": 1}
+    ).to_list(None))
+
+
+async def create_work_order(orders, order_doc: dict) -> dict:
+    """Price and insert a new work order through its Repository, consuming its parts if it is created Completed"""
+    order_doc["parts"], order_doc["parts_cost"], stock = await price(order_doc.get("parts", []))
+    order_doc["total_cost"] = round((order_doc.get("labor_cost") or 0) + order_doc["parts_cost"], 2)
+    order_doc["parts_consumed_at"] = None
+
+    requested = _requested(order_doc["parts"])
+    if order_doc.get("status") != "Completed" or not requested:
+        return await orders.insert(order_doc)
+
+    _check_stock(requested, stock)
+    order_doc["parts_consumed_at"] = datetime.now(timezone.utc)
+
+    async def write_order(session):
+        await orders.insert(order_doc, session=session)
+
+    await consume(requested, write_order)
+    return order_doc
+
+
+async def update_work_order(orders, order_id: str, fields: dict):
+    """Reprice and update a work order through its Repository, consuming its parts when it becomes Completed
+    and returning them when it stops being Completed.
+
+    Returns (previous, updated) like Repository.update_with_previous.
+    """
+    current = await orders.get(order_id)
+
+    if current.get("parts_consumed_at"):
+        # Stock already left the shelf; its pricing is final
+        if "parts" in fields and _requested(fields["parts"]) != _requested(current.get("parts", [])):
+            raise HTTPException(status_code=409, detail="Parts can't change once the work order has consumed them")
+        fields = {name: value for name, value in fields.items() if name != "parts"}
+        if "labor_cost" in fields:
+            fields["total_cost"] = round((fields["labor_cost"] or 0) + current.get("parts_cost", 0), 2)
+        if fields.get("status", "Completed") != "Completed":
+            # Reopened or cancelled: its parts go back on the shelf until it completes again
+            fields["parts_consumed_at"] = None
+
+            async def write_order(session):
+                # Guard on parts_consumed_at so the parts can only go back once
+                try:
+                    previous, _ = await orders.update_with_previous(
+                        order_id, fields, match={"parts_consumed_at": {"$ne": None}}, session=session
+                    )
+                except HTTPException as error:
+                    if error.status_code != 404:
+                        raise
+                    raise HTTPException(status_code=409, detail="Work order was changed concurrently")
+                return previous
+
+            previous = await release(_requested(current.get("parts", [])), write_order)
+            return previous, {**previous, **fields}
+    else:
+        merged = {**current, **fields}
+        fields["parts"], fields["parts_cost"], stock = await price(merged.get("parts", []))
+        fields["total_cost"] = round((merged.get("labor_cost") or 0) + fields["parts_cost"], 2)
+        requested = _requested(fields["parts"])
+        if merged.get("status") == "Completed" and requested:
+            _check_stock(requested, stock)
+            fields["parts_consumed_at"] = datetime.now(timezone.utc)
+
+            async def write_order(session):
+                # Guard on parts_consumed_at so two concurrent completions can't both consume
+                try:
+                    previous, _ = await orders.update_with_previous(
+                        order_id, fields, match={"parts_consumed_at": None}, session=session
+                    )
+                except HTTPException as error:
+                    if error.status_code != 404:
+                        raise
+                    raise HTTPException(status_code=409, detail="Work order was completed concurrently")
+                return previous
+
+            previous = await consume(requested, write_order)
+            return previous, {**previous, **fields}
+
+    return await orders.update_with_previous(order_id, fields)
+
+
+def _low_stock_message(part: dict) -> str:
+    return f"{part.get('name') or part['part_id']} is low on stock ({part.get('quantity', 0)} left, minimum {part.get('min_stock', 0)})"
+
+
+async def sync_low_stock(parts: list, removed_ids: list = ()):
+    """Open, refresh or resolve LowStock alerts so they match the given parts' stock levels"""
+    part_ids = [part["part_id"] for part in parts] + list(removed_ids)
+    if not part_ids:
+        return
+    active = {}
+    async for alert in db.alerts.find(
+        {"part_id": {"$in": part_ids}, "type": "LowStock", "status": "Active"},
+        {"_id": 0}
+    ):
+        active[alert["part_id"]] = alert
+
+    # Restocked and deleted parts are resolved
+    desired = {}
+    for part in parts:
+        if part.get("quantity", 0) <= part.get("min_stock", 0):
+            priority = "High" if part.get("quantity", 0) <= 0 else "Medium"
+            desired[part["part_id"]] = (priority, _low_stock_message(part), {"part_id": part["part_id"]})
+    await alert_sync.reconcile(db.alerts, "LowStock", active, desired)
@@ -0,0 +1,61 @@
+"""Concurrency limits that shed load instead of queueing it.
+
+The heaviest reads (list pages, dashboard stats, reports) each hold one or more pooled
+database connections while they run. Under a burst, queueing them only moves the wait
+into the connection pool, where it delays every other request as well. A Limiter caps
+how many run at once and answers the rest straight away with 503 and a Retry-After the
+client can back off on.
+
+Limits count computations, not requests: callers coalesced onto one in-flight result
+(cache.SingleFlight) share the slot of the call doing the work.
+"""
+from fastapi import HTTPException
+from contextlib import contextmanager
+import os
+
+HEAVY_READ_CONCURRENCY = int(os.environ.get('HEAVY_READ_CONCURRENCY', 16))
+LOAD_SHED_RETRY_AFTER = int(os.environ.get('LOAD_SHED_RETRY_AFTER', 1))
+
+
+class Limiter:
+    """At most limit concurrent slots; limit <= 0 means unlimited"""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self.admitted = 0
+        self.shed = 0
+
+    @contextmanager
+    def slot(self):
+        if 0 < self.limit <= self.in_flight:
+            self.shed += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, retry shortly",
+                headers={"Retry-After": str(LOAD_SHED_RETRY_AFTER)}
+            )
+        self.in_flight += 1
+        self.admitted += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "peak": self.peak,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+# Shared by every heavy read, since they all draw on the same connection pool
+heavy_reads = Limiter("heavy_reads", HEAVY_READ_CONCURRENCY)
+
+limiters = [heavy_reads]
@@ -1,101 +1,131 @@
-from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime, timezone
-import uuid
-from typing import List
-from models import MaintenanceRecord, MaintenanceRecordCreate, WorkOrder, WorkOrderCreate, User
+from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import List, Optional
+from models import MaintenanceRecord, MaintenanceRecordCreate, WorkOrder, WorkOrderCreate, WorkOrderUpdate, User
 from auth import get_current_user
+import counters
+import inventory
+import response_cache
+import rollups
+import service_alerts
+from pagination import PageParams, page_params, page_response, match_fields, date_range
+import serialization
+from repository import Repository, patch_fields
 
 
 maintenance_router = APIRouter(prefix="/maintenance", tags=["Maintenance"])
-
-# Database will be injected from server.py
-db = None
 work_orders_router = APIRouter(prefix="/work-orders", tags=["Work Orders"])
 
-# Database will be injected from server.py
-db = None
+maintenance_records = Repository("maintenance_records", "record_id", "mnt", "Maintenance record")
+work_orders = Repository("work_orders", "order_id", "wo", "Work order")
+
+def build_maintenance_record_doc(record: MaintenanceRecordCreate) -> dict:
+    """Build the stored document for a new maintenance record"""
+    return maintenance_records.new_doc(record.dict())
 
 # Maintenance Records
 @maintenance_router.get("", response_model=List[MaintenanceRecord])
-async def get_maintenance_records(current_user: User = Depends(get_current_user)):
-    """Get all maintenance records"""
-    records = await db.maintenance_records.find({}, {"_id": 0}).to_list(1000)
-    return records
+async def get_maintenance_records(
+    vehicle_id: Optional[str] = None,
+    service_type: Optional[str] = None,
+    work_order_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    """Get maintenance records, one page at a time"""
+    query = match_fields(vehicle_id=vehicle_id, service_type=service_type, work_order_id=work_order_id)
+    query.update(date_range("date", date_from, date_to))
+    return await page_response(maintenance_records.collection, query, "record_id", page, MaintenanceRecord)
 
 @maintenance_router.post("", response_model=MaintenanceRecord)
 async def create_maintenance_record(record: MaintenanceRecordCreate, current_user: User = Depends(get_current_user)):
     """Create a new maintenance record"""
-    record_id = f"mnt_{uuid.uuid4().hex[:12]}"
-    record_doc = record.dict()
-    record_doc["record_id"] = record_id
-    record_doc["created_at"] = datetime.now(timezone.utc)
+    record_doc = build_maintenance_record_doc(record)
     
-    await db.maintenance_records.insert_one(record_doc)
+    await maintenance_records.insert(record_doc)
+    await rollups.record("maintenance", [record_doc])
+    await service_alerts.on_services([record_doc])
     
-    return MaintenanceRecord(**record_doc)
+    return serialization.respond(MaintenanceRecord, record_doc)
 
 @maintenance_router.get("/{record_id}", response_model=MaintenanceRecord)
 async def get_maintenance_record(record_id: str, current_user: User = Depends(get_current_user)):
     """Get maintenance record by ID"""
-    record = await db.maintenance_records.find_one({"record_id": record_id}, {"_id": 0})
-    if not record:
-        raise HTTPException(status_code=404, detail="Maintenance record not found")
-    return MaintenanceRecord(**record)
+    return serialization.respond(MaintenanceRecord, await maintenance_records.get(record_id))
 
 @maintenance_router.delete("/{record_id}")
 async def delete_maintenance_record(record_id: str, current_user: User = Depends(get_current_user)):
     """Delete maintenance record"""
-    result = await db.maintenance_records.delete_one({"record_id": record_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Maintenance record not found")
+    deleted = await maintenance_records.delete(record_id, projection={"vehicle_id": 1, "date": 1, "service_type": 1})
+    await rollups.refresh_for("maintenance", deleted)
+    if deleted.get("service_type") in service_alerts.RECORD_SERVICE_KEYS:
+        await service_alerts.rebuild_state([deleted["vehicle_id"]])
+        await service_alerts.evaluate([deleted["vehicle_id"]])
     return {"message": "Maintenance record deleted successfully"}
 
 # Work Orders
+async def _apply_work_order_update(order_id: str, fields: dict):
+    if fields.keys() & inventory.PRICED_FIELDS:
+        previous, updated = await inventory.update_work_order(work_orders, order_id, fields)
+    else:
+        previous, updated = await work_orders.update_with_previous(order_id, fields)
+    response_cache.bump("work_orders")
+    await counters.record_status_change("work_orders", previous.get("status"), updated.get("status"))
+    await rollups.refresh_for("work_order", previous, updated)
+    return serialization.respond(WorkOrder, updated)
+
 @work_orders_router.get("", response_model=List[WorkOrder])
-async def get_work_orders(current_user: User = Depends(get_current_user)):
-    """Get all work orders"""
-    orders = await db.work_orders.find({}, {"_id": 0}).to_list(1000)
-    return orders
+async def get_work_orders(
+    vehicle_id: Optional[str] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    """Get work orders, one page at a time"""
+    query = match_fields(vehicle_id=vehicle_id, status=status, priority=priority, assigned_to=assigned_to)
+    query.update(date_range("scheduled_date", date_from, date_to))
+    return await page_response(work_orders.collection, query, "order_id", page, WorkOrder)
 
 @work_orders_router.post("", response_model=WorkOrder)
 async def create_work_order(order: WorkOrderCreate, current_user: User = Depends(get_current_user)):
     """Create a new work order"""
-    order_id = f"wo_{uuid.uuid4().hex[:12]}"
-    order_doc = order.dict()
-    order_doc["order_id"] = order_id
-    order_doc["created_at"] = datetime.now(timezone.utc)
+    order_doc = await inventory.create_work_order(work_orders, work_orders.new_doc(order.dict()))
+    response_cache.bump("work_orders")
     
-    await db.work_orders.insert_one(order_doc)
+    await counters.record_insert("work_orders", order_doc["status"])
+    await rollups.record("work_order", [order_doc])
     
-    return WorkOrder(**order_doc)
+    return serialization.respond(WorkOrder, order_doc)
 
 @work_orders_router.get("/{order_id}", response_model=WorkOrder)
 async def get_work_order(order_id: str, current_user: User = Depends(get_current_user)):
     """Get work order by ID"""
-    order = await db.work_orders.find_one({"order_id": order_id}, {"_id": 0})
-    if not order:
-        raise HTTPException(status_code=404, detail="Work order not found")
-    return WorkOrder(**order)
+    return serialization.respond(WorkOrder, await work_orders.get(order_id))
 
 @work_orders_router.put("/{order_id}", response_model=WorkOrder)
 async def update_work_order(order_id: str, order: WorkOrderCreate, current_user: User = Depends(get_current_user)):
     """Update work order"""
-    existing = await db.work_orders.find_one({"order_id": order_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Work order not found")
-    
-    await db.work_orders.update_one(
-        {"order_id": order_id},
-        {"$set": order.dict()}
-    )
-    
-    updated_order = await db.work_orders.find_one({"order_id": order_id}, {"_id": 0})
-    return WorkOrder(**updated_order)
+    return await _apply_work_order_update(order_id, order.dict())
+
+@work_orders_router.patch("/{order_id}", response_model=WorkOrder)
+async def patch_work_order(order_id: str, order: WorkOrderUpdate, current_user: User = Depends(get_current_user)):
+    """Update only the work order fields that were sent"""
+    return await _apply_work_order_update(order_id, patch_fields(order))
 
 @work_orders_router.delete("/{order_id}")
 async def delete_work_order(order_id: str, current_user: User = Depends(get_current_user)):
     """Delete work order"""
-    result = await db.work_orders.delete_one({"order_id": order_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Work order not found")
+    deleted = await work_orders.delete(
+        order_id,
+        projection={"status": 1, "vehicle_id": 1, "scheduled_date": 1, "completed_date": 1}
+    )
+    response_cache.bump("work_orders")
+    await counters.record_delete("work_orders", deleted.get("status"))
+    await rollups.refresh_for("work_order", deleted)
     return {"message": "Work order deleted successfully"}
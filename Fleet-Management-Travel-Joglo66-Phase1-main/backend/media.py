@@ -0,0 +1,513 @@
+"""Photo and document storage: streamed uploads, deduplicated blobs, ranged downloads.
+
+An upload is read from the request stream as it arrives (multipart/form-data with one
+file part, or the raw file with ?filename=), hashed and written to a temporary file a
+chunk at a time, so memory use does not grow with the file. The file is then renamed
+to blobs/<sha256> under MEDIA_ROOT: identical content, like a receipt uploaded twice,
+is stored once. A "media" document per upload records owner, name and type, and the
+owner's photos, documents or receipt_url field gets the file's URL. A blob is deleted
+with the last media document pointing at it.
+
+Downloads are streamed from a worker thread in chunks and honour a single byte Range
+(206, or 416 when unsatisfiable), so resumed downloads and PDF viewers that fetch
+pages on demand work. Blobs never change, so the content hash is the ETag and
+responses may be cached for a year. Image thumbnails (thumbnails.py) are rendered
+right after upload, and on demand if missing.
+"""
+from fastapi import APIRouter, HTTPException, Depends, Request, Query, Response
+from fastapi.responses import StreamingResponse
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import quote
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import uuid
+from cache import SingleFlight
+from models import MediaFile, User
+from auth import get_current_user
+import response_cache
+import serialization
+import thumbnails
+
+
+media_router = APIRouter(prefix="/media", tags=["Media"])
+
+# Database will be injected from server.py
+db = None
+
+logger = logging.getLogger(__name__)
+
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', Path(__file__).parent / 'media'))
+MEDIA_MAX_BYTES = int(os.environ.get('MEDIA_MAX_BYTES', 25 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+# Multipart framing plus any small form fields sent alongside the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+CONTENT_TYPES = thumbnails.IMAGE_TYPES | {"application/pdf"}
+
+# Owner type -> (collection, id field, {kind: owner field the file is attached to})
+OWNERS = {
+    "vehicle": ("vehicles", "vehicle_id", {"photo": "photos", "document": "documents"}),
+    "driver": ("drivers", "driver_id", {"document": "documents"}),
+    "inspection": ("inspections", "inspection_id", {"photo": "photos"}),
+    "fuel_log": ("fuel_logs", "log_id", {"receipt": "receipt_url"}),
+}
+
+_thumbnail_builds = SingleFlight()
+# Thumbnails rendered after upload; referenced until done so they aren't collected
+_prerenders = set()
+
+
+def _blob_path(sha256: str) -> Path:
+    return MEDIA_ROOT / "blobs" / sha256[:2] / sha256
+
+
+def _thumbnail_path(sha256: str) -> Path:
+    return MEDIA_ROOT / "thumbnails" / sha256[:2] / f"{sha256}-{thumbnails.THUMBNAIL_SIZE}.jpg"
+
+
+def _owner(owner_type: str, kind: str) -> tuple:
+    """(collection, id field, attached field) for a kind of file on a type of owner"""
+    if owner_type not in OWNERS:
+        raise HTTPException(status_code=400, detail=f"owner_type must be one of: {', '.join(OWNERS)}")
+    collection_name, id_field, fields = OWNERS[owner_type]
+    if kind not in fields:
+        raise HTTPException(status_code=400, detail=f"A {owner_type} takes kind: {', '.join(fields)}")
+    return collection_name, id_field, fields[kind]
+
+
+def _attach_update(field: str, media_doc: dict) -> dict:
+    if field == "receipt_url":
+        return {"$set": {field: media_doc["url"]}}
+    if field == "documents":
+        return {"$push": {field: {
+            "media_id": media_doc["media_id"],
+            "filename": media_doc["filename"],
+            "content_type": media_doc["content_type"],
+            "size": media_doc["size"],
+            "url": media_doc["url"],
+            "uploaded_at": media_doc["created_at"]
+        }}}
+    return {"$push": {field: media_doc["url"]}}
+
+
+def _detach_update(field: str, media_doc: dict) -> dict:
+    if field == "receipt_url":
+        return {"$set": {field: None}}
+    if field == "documents":
+        return {"$pull": {field: {"media_id": media_doc["media_id"]}}}
+    return {"$pull": {field: media_doc["url"]}}
+
+
+def _content_type(declared: Optional[str], filename: str) -> str:
+    """The declared type, or the one the file name implies; 415 unless it is an accepted type"""
+    declared = (declared or "").split(";")[0].strip().lower()
+    if declared in ("", "application/octet-stream"):
+        declared = mimetypes.guess_type(filename)[0] or declared
+    if declared not in CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail=f"Accepted file types: {', '.join(sorted(CONTENT_TYPES))}")
+    return declared
+
+
+def _clean_filename(filename: Optional[str], kind: str) -> str:
+    # Browsers on Windows may send the full client-side path
+    name = (filename or "").replace("\\", "/").split("/")[-1].strip()
+    return name[:255] or kind
+
+
+# Receiving uploads
+
+class _Upload:
+    """A file being received: hashed and written to a temporary file as chunks arrive"""
+
+    def __init__(self):
+        (MEDIA_ROOT / "tmp").mkdir(parents=True, exist_ok=True)
+        self.path = MEDIA_ROOT / "tmp" / uuid.uuid4().hex
+        self.file = open(self.path, "wb")
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def _write(self, data: bytes):
+        self.digest.update(data)
+        self.file.write(data)
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > MEDIA_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"File is larger than {MEDIA_MAX_BYTES} bytes")
+        await asyncio.to_thread(self._write, data)
+
+    def discard(self):
+        self.file.close()
+        self.path.unlink(missing_ok=True)
+
+
+class _FilePart:
+    """python-multipart callbacks that pick out the first part carrying a filename"""
+
+    MAX_HEADER_BYTES = 16 * 1024
+
+    def __init__(self):
+        self.headers = {}
+        self.header_bytes = 0
+        self.field = b""
+        self.value = b""
+        self.in_file = False
+        self.found = False
+        self.done = False
+        self.filename = None
+        self.content_type = None
+        # File data parsed from the latest chunk, written out by the caller
+        self.pending = []
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field,
+            "on_header_value": self._header_value,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self):
+        self.headers = {}
+        self.header_bytes = 0
+
+    def _header_field(self, data: bytes, start: int, end: int):
+        self._count(end - start)
+        self.field += data[start:end]
+
+    def _header_value(self, data: bytes, start: int, end: int):
+        self._count(end - start)
+        self.value += data[start:end]
+
+    def _count(self, size: int):
+        self.header_bytes += size
+        if self.header_bytes > self.MAX_HEADER_BYTES:
+            raise HTTPException(status_code=400, detail="Multipart part headers too large")
+
+    def _header_end(self):
+        self.headers[self.field.lower()] = self.value
+        self.field = self.value = b""
+
+    def _headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        self.in_file = not self.found and b"filename" in options
+        if self.in_file:
+            self.found = True
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self.content_type = self.headers.get(b"content-type", b"").decode("latin-1")
+
+    def _part_data(self, data: bytes, start: int, end: int):
+        if self.in_file:
+            self.pending.append(bytes(data[start:end]))
+
+    def _part_end(self):
+        if self.in_file:
+            self.in_file = False
+            self.done = True
+
+
+async def _receive(request: Request, filename: Optional[str], kind: str) -> tuple:
+    """Stream the request's file to disk; (upload, filename, content type)"""
+    body_type, options = parse_options_header(request.headers.get("content-type", ""))
+    upload = _Upload()
+    try:
+        if body_type == b"multipart/form-data":
+            if b"boundary" not in options:
+                raise HTTPException(status_code=400, detail="Multipart body without a boundary")
+            part = _FilePart()
+            parser = MultipartParser(options[b"boundary"], part.callbacks())
+            received = 0
+            content_type = None
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > MEDIA_MAX_BYTES + MULTIPART_OVERHEAD:
+                    raise HTTPException(status_code=413, detail=f"File is larger than {MEDIA_MAX_BYTES} bytes")
+                try:
+                    parser.write(chunk)
+                except MultipartParseError:
+                    raise HTTPException(status_code=400, detail="Malformed multipart body")
+                if part.found and content_type is None:
+                    # Reject a wrong type as soon as its part headers arrive, not after the upload
+                    filename = _clean_filename(part.filename, kind)
+                    content_type = _content_type(part.content_type, filename)
+                for data in part.pending:
+                    await upload.write(data)
+                part.pending.clear()
+            parser.finalize()
+            if not part.done:
+                raise HTTPException(status_code=400, detail="Expected a file part (multipart/form-data with a filename)")
+        else:
+            filename = _clean_filename(filename, kind)
+            content_type = _content_type(body_type.decode("latin-1"), filename)
+            async for chunk in request.stream():
+                await upload.write(chunk)
+        upload.file.close()
+        if not upload.size:
+            raise HTTPException(status_code=400, detail="Empty file")
+    except BaseException:
+        upload.discard()
+        raise
+    return upload, filename, content_type
+
+
+# Thumbnails
+
+async def _ensure_thumbnail(sha256: str) -> Path:
+    target = _thumbnail_path(sha256)
+    if not target.exists():
+        # Concurrent requests for the same image share one render
+        await _thumbnail_builds.run(sha256, lambda: thumbnails.render(str(_blob_path(sha256)), str(target)))
+    return target
+
+
+async def _prerender(sha256: str):
+    try:
+        await _ensure_thumbnail(sha256)
+    except Exception:
+        logger.warning("Thumbnail render failed for blob %s", sha256, exc_info=True)
+
+
+# Serving files
+
+def _http_date(value: datetime) -> str:
+    # Mongo hands datetimes back naive, in UTC
+    return format_datetime(value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value, usegmt=True)
+
+
+def _byte_range(request: Request, size: int, etag: str) -> Optional[tuple]:
+    """(first, last) byte of a single satisfiable Range; None to send the whole file"""
+    header = request.headers.get("range")
+    if not header or not size:
+        return None
+    # A Range conditional on an older version gets the whole current file
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        return None
+    unit, _, spec = header.partition("=")
+    # Several ranges would need multipart/byteranges; the whole file is a valid answer
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, separator, last = spec.strip().partition("-")
+    try:
+        if not separator:
+            return None
+        if not first:
+            # Suffix range: the final `last` bytes
+            length = int(last)
+            if length > 0:
+                return max(size - length, 0), size - 1
+            first, last = size, size
+        else:
+            first = int(first)
+            last = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if first >= size:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    if last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+def _read_chunks(file, remaining: int):
+    """Yield up to remaining bytes of file (iterated in a worker thread by StreamingResponse)"""
+    try:
+        while remaining > 0:
+            data = file.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def _serve(request: Request, path: Path, content_type: str, etag: str, filename: str, modified: datetime) -> Response:
+    headers = {
+        "ETag": etag,
+        # The URL's content never changes; private because it needs a session
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "Last-Modified": _http_date(modified),
+    }
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File content is missing")
+    try:
+        size = os.fstat(file.fileno()).st_size
+        byte_range = _byte_range(request, size, etag)
+        if byte_range:
+            first, last = byte_range
+            file.seek(first)
+            headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+            status_code, length = 206, last - first + 1
+        else:
+            status_code, length = 200, size
+    except BaseException:
+        file.close()
+        raise
+
+    headers.update({
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(length),
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(filename)}",
+        "X-Content-Type-Options": "nosniff",
+    })
+    return StreamingResponse(_read_chunks(file, length), status_code=status_code, media_type=content_type, headers=headers)
+
+
+async def _get_media(media_id: str) -> dict:
+    doc = await db.media.find_one({"media_id": media_id}, {"_id": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Media not found")
+    return doc
+
+
+async def _release_blob(sha256: str):
+    """Remove a blob (and its thumbnail) once no media document references it.
+
+    An upload of the same content records its document and then moves its blob in, so
+    it can land between the reference count and the unlink. The blob is moved aside
+    first and counted again: a new reference puts it back, otherwise it is unlinked.
+    """
+    if await db.media.count_documents({"sha256": sha256}, limit=1):
+        return
+    blob = _blob_path(sha256)
+    aside = blob.with_name(f"{blob.name}.{uuid.uuid4().hex}.deleting")
+    try:
+        os.replace(blob, aside)
+    except FileNotFoundError:
+        return
+    if await db.media.count_documents({"sha256": sha256}, limit=1):
+        # Same content, so this is safe even if the upload has already moved its copy in
+        os.replace(aside, blob)
+        return
+    aside.unlink(missing_ok=True)
+    _thumbnail_path(sha256).unlink(missing_ok=True)
+
+
+# Routes
+
+@media_router.post("", response_model=MediaFile)
+async def upload_media(
+    request: Request,
+    owner_type: str = Query(..., description="vehicle, driver, inspection or fuel_log"),
+    owner_id: str = Query(...),
+    kind: str = Query(..., description="photo or document (vehicle), document (driver), photo (inspection), receipt (fuel_log)"),
+    filename: Optional[str] = Query(None, description="File name when the body is the raw file rather than multipart"),
+    current_user: User = Depends(get_current_user)
+):
+    """Upload a photo, document or receipt and attach it to its owner"""
+    collection_name, id_field, field = _owner(owner_type, kind)
+    if not await db[collection_name].find_one({id_field: owner_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail=f"{owner_type.replace('_', ' ').capitalize()} not found")
+
+    upload, filename, content_type = await _receive(request, filename, kind)
+    sha256 = upload.digest.hexdigest()
+    media_id = f"med_{uuid.uuid4().hex[:12]}"
+    media_doc = {
+        "media_id": media_id,
+        "owner_type": owner_type,
+        "owner_id": owner_id,
+        "kind": kind,
+        "filename": filename,
+        "content_type": content_type,
+        "size": upload.size,
+        "sha256": sha256,
+        "url": f"/api/media/{media_id}/content",
+        "thumbnail_url": f"/api/media/{media_id}/thumbnail" if content_type in thumbnails.IMAGE_TYPES else None,
+        "uploaded_by": current_user.user_id,
+        "created_at": datetime.now(timezone.utc)
+    }
+    try:
+        # Recorded before the blob is moved in, so a concurrent delete of the last other
+        # upload of this content sees this one and keeps the blob
+        await db.media.insert_one(media_doc)
+        media_doc.pop("_id", None)
+        blob = _blob_path(sha256)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        # Same content, same name: a duplicate just replaces identical bytes
+        os.replace(upload.path, blob)
+    except BaseException:
+        upload.discard()
+        await db.media.delete_one({"media_id": media_id})
+        raise
+
+    attached = await db[collection_name].find_one_and_update({id_field: owner_id}, _attach_update(field, media_doc), projection={"_id": 1})
+    if not attached:
+        # The owner was deleted while the file was uploading
+        await delete_media(media_id, current_user)
+        raise HTTPException(status_code=404, detail=f"{owner_type.replace('_', ' ').capitalize()} not found")
+    response_cache.bump(collection_name)
+
+    if media_doc["thumbnail_url"] and thumbnails.available():
+        task = asyncio.ensure_future(_prerender(sha256))
+        _prerenders.add(task)
+        task.add_done_callback(_prerenders.discard)
+
+    return serialization.respond(MediaFile, media_doc)
+
+@media_router.get("", response_model=List[MediaFile])
+async def get_media_for_owner(owner_type: str, owner_id: str, current_user: User = Depends(get_current_user)):
+    """Get the files attached to a vehicle, driver, inspection or fuel log, newest first"""
+    docs = await db.media.find({"owner_type": owner_type, "owner_id": owner_id}, {"_id": 0}).sort("created_at", -1).to_list(None)
+    return serialization.respond(List[MediaFile], docs)
+
+@media_router.get("/{media_id}", response_model=MediaFile)
+async def get_media(media_id: str, current_user: User = Depends(get_current_user)):
+    """Get a file's metadata"""
+    return serialization.respond(MediaFile, await _get_media(media_id))
+
+@media_router.get("/{media_id}/content")
+async def download_media(media_id: str, request: Request, current_user: User = Depends(get_current_user)):
+    """Download a file; supports Range and If-None-Match"""
+    doc = await _get_media(media_id)
+    return _serve(request, _blob_path(doc["sha256"]), doc["content_type"], f'"{doc["sha256"]}"', doc["filename"], doc["created_at"])
+
+@media_router.get("/{media_id}/thumbnail")
+async def get_thumbnail(media_id: str, request: Request, current_user: User = Depends(get_current_user)):
+    """Get a JPEG thumbnail of an image, rendering it first if needed"""
+    doc = await _get_media(media_id)
+    if doc["content_type"] not in thumbnails.IMAGE_TYPES:
+        raise HTTPException(status_code=404, detail="Only images have thumbnails")
+    if not thumbnails.available():
+        raise HTTPException(status_code=404, detail="Thumbnails are not available on this server")
+    try:
+        path = await _ensure_thumbnail(doc["sha256"])
+    except Exception:
+        logger.warning("Thumbnail render failed for %s", media_id, exc_info=True)
+        raise HTTPException(status_code=422, detail="Could not render a thumbnail of this image")
+    name = f"{os.path.splitext(doc['filename'])[0]}-thumbnail.jpg"
+    return _serve(request, path, "image/jpeg", f'"{doc["sha256"]}-{thumbnails.THUMBNAIL_SIZE}"', name, doc["created_at"])
+
+@media_router.delete("/{media_id}")
+async def delete_media(media_id: str, current_user: User = Depends(get_current_user)):
+    """Delete a file and detach it from its owner"""
+    doc = await db.media.find_one_and_delete({"media_id": media_id}, projection={"_id": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Media not found")
+
+    collection_name, id_field, field = _owner(doc["owner_type"], doc["kind"])
+    query = {id_field: doc["owner_id"]}
+    if field == "receipt_url":
+        # Only if no newer receipt has replaced it
+        query[field] = doc["url"]
+    await db[collection_name].update_one(query, _detach_update(field, doc))
+    response_cache.bump(collection_name)
+
+    await _release_blob(doc["sha256"])
+    return {"message": "Media deleted successfully"}
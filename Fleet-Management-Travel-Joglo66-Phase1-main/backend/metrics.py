@@ -0,0 +1,219 @@
+"""Fixed-bucket histograms for latency and size measurements, and the per-route HTTP
+metrics served in Prometheus text format at /metrics.
+
+Bucket bounds are chosen up front, so recording a value is a bisect plus two additions
+with no allocation. Histograms are updated without locks: a racing increment from
+another thread can at worst lose a single count, which is fine for monitoring.
+Requests are labelled with their route template (/api/vehicles/{vehicle_id}) rather
+than the raw path, so label cardinality stays bounded by the number of routes.
+"""
+from bisect import bisect_left
+import time
+
+# Milliseconds
+LATENCY_BUCKETS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        # One count per bound (value <= bound) plus an overflow bucket
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile by interpolating inside the bucket it falls in"""
+        counts = list(self.counts)
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                if index == len(self.bounds):
+                    return float(lower)  # overflow bucket has no upper bound
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return float(self.bounds[-1])
+
+    def summary(self) -> dict:
+        count = self.count
+        return {
+            "count": count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / count, 3) if count else 0.0,
+            "p50": round(self.quantile(0.5), 3),
+            "p95": round(self.quantile(0.95), 3),
+            "p99": round(self.quantile(0.99), 3),
+            "buckets": {**{str(bound): count for bound, count in zip(self.bounds, self.counts)}, "+Inf": self.counts[-1]},
+        }
+
+
+# HTTP metrics per route template, recorded by MetricsMiddleware
+
+# Bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+UNMATCHED = "unmatched"
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "request_size", "response_size", "in_flight", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.request_size = Histogram(SIZE_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.in_flight = 0
+        self.statuses = {}
+
+
+# (method, route template) -> RouteMetrics
+routes = {}
+
+
+def _bucket(path: str) -> tuple:
+    return tuple(path.split("/")[1:3])
+
+
+class RouteIndex:
+    """Route templates grouped by their first two path segments, so resolving a path only
+    tries the regexes of routes that share its prefix"""
+
+    def __init__(self, app_routes):
+        self.buckets = {}
+        self.wildcard = []
+        for route in app_routes:
+            template = getattr(route, "path_format", None)
+            if template is None or not hasattr(route, "path_regex"):
+                continue
+            key = _bucket(template)
+            if any("{" in segment for segment in key):
+                self.wildcard.append(route)
+            else:
+                self.buckets.setdefault(key, []).append(route)
+
+    def resolve(self, method: str, path: str) -> str:
+        partial = None
+        for candidates in (self.buckets.get(_bucket(path), ()), self.wildcard):
+            for route in candidates:
+                if route.path_regex.match(path):
+                    methods = getattr(route, "methods", None)
+                    if not methods or method in methods:
+                        return route.path_format
+                    partial = partial or route.path_format
+        return partial or UNMATCHED
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each request against its route template"""
+
+    def __init__(self, app):
+        self.app = app
+        self.index = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.index is None:
+            # Routes are all registered by the time the first request arrives
+            self.index = RouteIndex(scope["app"].router.routes)
+
+        key = (scope["method"], self.index.resolve(scope["method"], scope["path"]))
+        metrics = routes.get(key)
+        if metrics is None:
+            metrics = routes.setdefault(key, RouteMetrics())
+        received = sent = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal sent, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            metrics.in_flight -= 1
+            metrics.latency.observe((time.perf_counter() - start) * 1000)
+            metrics.request_size.observe(received)
+            metrics.response_size.observe(sent)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+
+# Prometheus text exposition format (version 0.0.4)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_histograms(name: str, help: str, series: list, scale: float = 1.0) -> list:
+    """Exposition lines for (labels, histogram) pairs; scale converts recorded units (e.g. ms -> s)"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+    for labels, histogram in series:
+        cumulative = 0
+        counts = list(histogram.counts)
+        for bound, count in zip(histogram.bounds, counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(bound * scale)})} {cumulative}")
+        cumulative += counts[-1]
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.sum * scale)}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    return lines
+
+
+def render_http() -> list:
+    snapshot = [({"method": method, "route": route}, metrics) for (method, route), metrics in list(routes.items())]
+    lines = render_histograms(
+        "http_request_duration_seconds", "Time from request start to the end of the response body.",
+        [(labels, metrics.latency) for labels, metrics in snapshot], scale=0.001
+    )
+    lines += render_histograms(
+        "http_request_size_bytes", "Request body size.",
+        [(labels, metrics.request_size) for labels, metrics in snapshot]
+    )
+    lines += render_histograms(
+        "http_response_size_bytes", "Response body size.",
+        [(labels, metrics.response_size) for labels, metrics in snapshot]
+    )
+    lines += ["# HELP http_requests_total Requests handled, by status code.", "# TYPE http_requests_total counter"]
+    for labels, metrics in snapshot:
+        for status, count in sorted(metrics.statuses.items()):
+            lines.append(f"http_requests_total{_labels({**labels, 'status': status})} {count}")
+    lines += ["# HELP http_requests_in_flight Requests currently being handled.", "# TYPE http_requests_in_flight gauge"]
+    for labels, metrics in snapshot:
+        lines.append(f"http_requests_in_flight{_labels(labels)} {metrics.in_flight}")
+    return lines
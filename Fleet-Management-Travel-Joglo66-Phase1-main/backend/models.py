@@ -1,8 +1,17 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model, model_validator
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 
+def partial_model(model):
+    """Copy of model whose fields may all be omitted, for PATCH bodies.
+
+    Omitted fields are left out by model_dump(exclude_unset=True); fields that are sent
+    are validated exactly as in the full model.
+    """
+    fields = {name: (info.annotation, None) for name, info in model.model_fields.items()}
+    return create_model(model.__name__.replace("Create", "Update"), **fields)
+
 # User Models
 class User(BaseModel):
     user_id: str
@@ -59,21 +68,27 @@ class MaintenanceRecord(MaintenanceRecordCreate):
     created_at: datetime
 
 # Work Order Models
+class WorkOrderPart(BaseModel):
+    part_id: str
+    quantity: int = Field(1, gt=0)
+    cost: float = 0  # unit cost, priced from parts_inventory by the server
+
 class WorkOrderCreate(BaseModel):
     vehicle_id: str
     assigned_to: Optional[str] = None
     status: str = "Pending"  # Pending, In Progress, Completed, Cancelled
     priority: str  # Low, Medium, High, Critical
     description: str
-    parts: List[dict] = []
+    parts: List[WorkOrderPart] = []
     labor_cost: float = 0
-    parts_cost: float = 0
-    total_cost: float = 0
     scheduled_date: datetime
     completed_date: Optional[datetime] = None
 
 class WorkOrder(WorkOrderCreate):
     order_id: str
+    parts_cost: float = 0
+    total_cost: float = 0
+    parts_consumed_at: Optional[datetime] = None  # set once completing the order took its parts from stock
     created_at: datetime
 
 # Driver Models
@@ -96,13 +111,24 @@ class DriverAssignmentCreate(BaseModel):
     vehicle_id: str
     driver_id: str
     start_date: datetime
-    end_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None  # open-ended until set
     notes: Optional[str] = None
+    
+    @model_validator(mode="after")
+    def check_dates(self):
+        # Naive datetimes are UTC (as stored), so mixed offset-aware and naive dates still compare
+        utc = lambda value: value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+        if self.end_date is not None and utc(self.end_date) <= utc(self.start_date):
+            raise ValueError("end_date must be after start_date")
+        return self
 
 class DriverAssignment(DriverAssignmentCreate):
     assignment_id: str
     created_at: datetime
 
+class DriverAssignmentEnd(BaseModel):
+    end_date: Optional[datetime] = None
+
 # Fuel Log Models
 class FuelLogCreate(BaseModel):
     vehicle_id: str
@@ -117,8 +143,69 @@ class FuelLogCreate(BaseModel):
 
 class FuelLog(FuelLogCreate):
     log_id: str
+    distance: Optional[int] = None  # km since the vehicle's previous fill-up
+    km_per_l: Optional[float] = None
     created_at: datetime
 
+class VehicleFuelEfficiency(BaseModel):
+    vehicle_id: str
+    fills: int
+    distance: int
+    quantity: float
+    cost: float
+    km_per_l: Optional[float] = None
+    cost_per_km: Optional[float] = None
+    median_km_per_l: Optional[float] = None
+    outliers: int
+    last_odometer: int
+    updated_at: datetime
+
+# Trip Models
+class TripStart(BaseModel):
+    vehicle_id: str
+    driver_id: str
+    start_odometer: int
+    purpose: Optional[str] = None
+    start_time: Optional[datetime] = None
+
+class TripEnd(BaseModel):
+    end_odometer: int
+    end_time: Optional[datetime] = None
+
+class TripRecord(BaseModel):
+    vehicle_id: str
+    driver_id: str
+    start_odometer: int
+    end_odometer: int
+    start_time: datetime
+    end_time: datetime
+    purpose: Optional[str] = None
+    
+    @model_validator(mode="after")
+    def check_odometer(self):
+        if self.end_odometer < self.start_odometer:
+            raise ValueError("end_odometer is lower than start_odometer")
+        return self
+
+class Trip(BaseModel):
+    trip_id: str
+    vehicle_id: str
+    driver_id: str
+    start_odometer: int
+    end_odometer: Optional[int] = None
+    distance: Optional[int] = None
+    purpose: Optional[str] = None
+    status: str = "In Progress"  # In Progress, Completed
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    created_by: Optional[str] = None
+    created_at: datetime
+
+class TripDistance(BaseModel):
+    period: Optional[str] = None  # YYYY-MM-DD when grouped by day
+    trips: int
+    distance: int
+
 # Parts Inventory Models
 class PartCreate(BaseModel):
     name: str
@@ -176,6 +263,9 @@ class AlertCreate(BaseModel):
 
 class Alert(AlertCreate):
     alert_id: str
+    service_type: Optional[str] = None  # oil_change, brake_check, air_filter, major_service (ServiceDue only)
+    log_id: Optional[str] = None  # fuel log with the outlying reading (FuelEfficiency only)
+    part_id: Optional[str] = None  # LowStock only
     created_at: datetime
     resolved_at: Optional[datetime] = None
 
@@ -194,9 +284,103 @@ class DashboardStats(BaseModel):
     avgFuelEfficiency: float
     totalMileageThisMonth: int
 
+# Report Models
+class VehicleReport(BaseModel):
+    vehicle_id: str
+    plate: Optional[str] = None
+    brand: Optional[str] = None
+    model: Optional[str] = None
+    status: Optional[str] = None
+    fuel_cost: float = 0
+    fuel_quantity: float = 0
+    distance: float = 0
+    fuel_efficiency: float = 0  # km per litre
+    maintenance_cost: float = 0
+    maintenance_count: int = 0
+    work_orders: int = 0
+    work_orders_completed: int = 0
+    work_order_cost: float = 0
+    downtime_days: float = 0
+    reliability_score: float = 100
+    depreciation: float = 0
+    total_operating_cost: float = 0
+    tco: float = 0
+
+class MonthlyReport(BaseModel):
+    month: str  # YYYY-MM
+    fuel_cost: float = 0
+    fuel_quantity: float = 0
+    fuel_logs: int = 0
+    maintenance_cost: float = 0
+    maintenance_count: int = 0
+    work_orders: int = 0
+    work_orders_completed: int = 0
+    work_order_cost: float = 0
+    downtime_days: float = 0
+
+class VehicleTotals(BaseModel):
+    fuel_cost: float = 0
+    fuel_quantity: float = 0
+    fuel_logs: int = 0
+    maintenance_cost: float = 0
+    maintenance_count: int = 0
+    work_orders: int = 0
+    work_orders_completed: int = 0
+    work_order_cost: float = 0
+    downtime_days: float = 0
+    distance: float = 0  # between the lowest and highest fuel log odometer
+    km_per_l: Optional[float] = None
+    cost_per_km: Optional[float] = None
+    inspections: int = 0
+    tires: int = 0
+
+# Vehicle detail page: the vehicle, its newest documents per collection, and its totals
+class VehicleOverview(BaseModel):
+    vehicle: Vehicle
+    totals: VehicleTotals
+    maintenance_records: List[MaintenanceRecord]
+    fuel_logs: List[FuelLog]
+    work_orders: List[WorkOrder]
+    inspections: List[Inspection]
+    tires: List[Tire]
+    assignments: List[DriverAssignment]
+    trips: List[Trip]
+
+# Search Models
+class SearchResult(BaseModel):
+    type: str  # vehicle, driver, part
+    id: str
+    label: str  # plate, driver name or part name
+    detail: Optional[str] = None  # brand and model, license number or part number
+    field: str  # field the query matched best
+    score: float
+
+# Media Models
+class MediaFile(BaseModel):
+    media_id: str
+    owner_type: str  # vehicle, driver, inspection, fuel_log
+    owner_id: str
+    kind: str  # photo, document, receipt
+    filename: str
+    content_type: str
+    size: int
+    sha256: str
+    url: str
+    thumbnail_url: Optional[str] = None  # images only
+    uploaded_by: str
+    created_at: datetime
+
 # Auth Models
 class SessionRequest(BaseModel):
     session_id: str
 
 class SessionResponse(BaseModel):
     user: User
+
+# Partial Update Models (PATCH)
+VehicleUpdate = partial_model(VehicleCreate)
+WorkOrderUpdate = partial_model(WorkOrderCreate)
+DriverUpdate = partial_model(DriverCreate)
+PartUpdate = partial_model(PartCreate)
+TireUpdate = partial_model(TireCreate)
+InspectionUpdate = partial_model(InspectionCreate)
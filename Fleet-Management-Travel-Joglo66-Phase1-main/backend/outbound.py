@@ -0,0 +1,50 @@
+"""The app's one pooled HTTP client for calls to other services.
+
+A client per call pays a TCP and TLS handshake every time; this one keeps connections
+alive between calls, so a burst of logins reuses a handful of connections to the auth
+provider instead of opening one each. It is created on first use and closed on
+shutdown. Pool size and timeouts come from the OUTBOUND_* environment variables.
+"""
+import httpx
+import os
+
+OUTBOUND_MAX_CONNECTIONS = int(os.environ.get('OUTBOUND_MAX_CONNECTIONS', 100))
+OUTBOUND_MAX_KEEPALIVE = int(os.environ.get('OUTBOUND_MAX_KEEPALIVE', 20))
+OUTBOUND_KEEPALIVE_EXPIRY = float(os.environ.get('OUTBOUND_KEEPALIVE_EXPIRY', 30))
+OUTBOUND_TIMEOUT = float(os.environ.get('OUTBOUND_TIMEOUT', 10))
+OUTBOUND_CONNECT_TIMEOUT = float(os.environ.get('OUTBOUND_CONNECT_TIMEOUT', 5))
+
+_client = None
+# URL pattern -> transport, for services answered in-process (see auth_stub.py)
+_mounts = {}
+
+
+def mount(url: str, transport: httpx.AsyncBaseTransport):
+    """Send every request for url's scheme, host and port to transport instead of the network"""
+    if _client is not None:
+        raise RuntimeError("Mount transports before the outbound client is first used")
+    url = httpx.URL(url)
+    port = f":{url.port}" if url.port else ""
+    _mounts[f"{url.scheme}://{url.host}{port}"] = transport
+
+
+def client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OUTBOUND_MAX_CONNECTIONS,
+                max_keepalive_connections=OUTBOUND_MAX_KEEPALIVE,
+                keepalive_expiry=OUTBOUND_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(OUTBOUND_TIMEOUT, connect=OUTBOUND_CONNECT_TIMEOUT),
+            mounts=dict(_mounts)
+        )
+    return _client
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,69 @@
+"""Everything the vehicle detail page shows, gathered in one request.
+
+Each section is one indexed query on (vehicle_id, date-ish field) returning the newest
+few documents, and the totals come from the vehicle's monthly rollups and fuel summary
+rather than from scanning its history. All of them are sent together with
+asyncio.gather, so the request costs about one database round trip whatever the
+number of sections.
+"""
+from fastapi import HTTPException
+import asyncio
+import fuel_analytics
+import rollups
+
+# Database will be injected from server.py
+db = None
+
+# Section -> (collection, newest-first sort field); every pair is covered by a
+# (vehicle_id, field) index in indexes.py
+SECTIONS = {
+    "maintenance_records": ("maintenance_records", "date"),
+    "fuel_logs": ("fuel_logs", "date"),
+    "work_orders": ("work_orders", "created_at"),
+    "inspections": ("inspections", "date"),
+    "tires": ("tires", "created_at"),
+    "assignments": ("driver_assignments", "created_at"),
+    "trips": ("trips", "start_time"),
+}
+
+
+async def _recent(collection_name: str, sort_field: str, vehicle_id: str, limit: int) -> list:
+    return await db[collection_name].find({"vehicle_id": vehicle_id}, {"_id": 0}) \
+        .sort(sort_field, -1) \
+        .limit(limit) \
+        .to_list(limit)
+
+
+async def _rollup_totals(vehicle_id: str) -> dict:
+    group = {"_id": None, "odometer_min": {"$min": "$odometer_min"}, "odometer_max": {"$max": "$odometer_max"}}
+    for field in rollups.SUM_FIELDS:
+        group[field] = {"$sum": f"${field}"}
+    rows = await db[rollups.ROLLUP_COLLECTION].aggregate([
+        {"$match": {"vehicle_id": vehicle_id}},
+        {"$group": group}
+    ]).to_list(1)
+    return rows[0] if rows else {}
+
+
+async def vehicle_overview(vehicle_id: str, recent: int) -> dict:
+    """The vehicle, its newest `recent` documents per section, and its lifetime totals"""
+    results = await asyncio.gather(
+        db.vehicles.find_one({"vehicle_id": vehicle_id}, {"_id": 0}),
+        _rollup_totals(vehicle_id),
+        db[fuel_analytics.STATS_COLLECTION].find_one({"vehicle_id": vehicle_id}, {"_id": 0, "km_per_l": 1, "cost_per_km": 1}),
+        db.inspections.count_documents({"vehicle_id": vehicle_id}),
+        db.tires.count_documents({"vehicle_id": vehicle_id}),
+        *(_recent(collection_name, sort_field, vehicle_id, recent) for collection_name, sort_field in SECTIONS.values())
+    )
+    vehicle, rollup, fuel_stats, inspections, tires = results[:5]
+    if not vehicle:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+
+    totals = {field: rollup.get(field, 0) for field in rollups.SUM_FIELDS}
+    totals["distance"] = max((rollup.get("odometer_max") or 0) - (rollup.get("odometer_min") or 0), 0)
+    totals["km_per_l"] = (fuel_stats or {}).get("km_per_l")
+    totals["cost_per_km"] = (fuel_stats or {}).get("cost_per_km")
+    totals["inspections"] = inspections
+    totals["tires"] = tires
+
+    return {"vehicle": vehicle, "totals": totals, **dict(zip(SECTIONS, results[5:]))}
@@ -0,0 +1,103 @@
+from fastapi import HTTPException, Query, Request, Response
+from datetime import datetime
+from typing import List, Optional
+from dataclasses import dataclass
+import base64
+import json
+import os
+import load_shedding
+import serialization
+
+PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', 100))
+PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 1000))
+
+# Response headers carrying the continuation token; exposed to browsers via CORS in server.py
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PAGINATION_HEADERS = [NEXT_CURSOR_HEADER, "Link"]
+
+
+@dataclass
+class PageParams:
+    limit: int
+    cursor: Optional[str]
+    order: str
+    request: Request
+
+
+def page_params(
+    request: Request,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Sort by created_at ascending or descending")
+) -> PageParams:
+    """Common paging query parameters for list endpoints"""
+    return PageParams(limit=limit, cursor=cursor, order=order, request=request)
+
+
+def encode_cursor(created_at: datetime, id_value: str) -> str:
+    payload = json.dumps({"c": created_at.isoformat(), "i": id_value}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["c"]), payload["i"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def match_fields(**fields) -> dict:
+    """Build an equality filter from the query parameters that were actually supplied"""
+    return {field: value for field, value in fields.items() if value is not None}
+
+
+def date_range(field: str, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> dict:
+    """Build a half-open [date_from, date_to) range filter on field"""
+    bounds = {}
+    if date_from is not None:
+        bounds["$gte"] = date_from
+    if date_to is not None:
+        bounds["$lt"] = date_to
+    return {field: bounds} if bounds else {}
+
+
+async def paginate(collection, query: dict, id_field: str, page: PageParams, response: Response) -> list:
+    """Fetch one keyset page ordered by (created_at, id_field) and set the next-page headers.
+
+    The cursor resumes strictly after the last document returned, so pages stay
+    stable while new documents are inserted and every page costs one indexed seek.
+    """
+    direction = -1 if page.order == "desc" else 1
+    if page.cursor:
+        created_at, last_id = decode_cursor(page.cursor)
+        op = "$lt" if direction == -1 else "$gt"
+        query = {"$and": [query, {"$or": [
+            {"created_at": {op: created_at}},
+            {"created_at": created_at, id_field: {op: last_id}}
+        ]}]}
+
+    docs = await collection.find(query, {"_id": 0}) \
+        .sort([("created_at", direction), (id_field, direction)]) \
+        .limit(page.limit + 1) \
+        .to_list(page.limit + 1)
+
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last["created_at"], last[id_field])
+        next_url = page.request.url.include_query_params(cursor=next_cursor)
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+    return docs
+
+
+async def page_response(collection, query: dict, id_field: str, page: PageParams, model) -> Response:
+    """Fetch one page like paginate() and render it directly as a JSON list of model"""
+    scratch = Response()
+    with load_shedding.heavy_reads.slot():
+        docs = await paginate(collection, query, id_field, page, scratch)
+    headers = {name: scratch.headers[name] for name in PAGINATION_HEADERS if name in scratch.headers}
+    return serialization.respond(List[model], docs, headers)
@@ -1,65 +1,79 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, Depends, Request
 from datetime import datetime, timezone
-import uuid
-from typing import List
-from models import Part, PartCreate, User
+from typing import List, Optional
+from models import Part, PartCreate, PartUpdate, User
 from auth import get_current_user
+import inventory
+import load_shedding
+import response_cache
+import search
+import serialization
+from pagination import PageParams, page_params, paginate, match_fields
+from repository import Repository, patch_fields
 
 
 parts_router = APIRouter(prefix="/parts", tags=["Parts"])
 
-# Database will be injected from server.py
-db = None
+parts = Repository("parts_inventory", "part_id", "prt", "Part")
+
+async def _apply_update(part_id: str, fields: dict):
+    fields["updated_at"] = datetime.now(timezone.utc)
+    updated = await parts.update(part_id, fields)
+    response_cache.bump("parts_inventory")
+    search.index.put("part", updated)
+    await inventory.sync_low_stock([updated])
+    return serialization.respond(Part, updated)
 
 @parts_router.get("", response_model=List[Part])
-async def get_parts(current_user: User = Depends(get_current_user)):
-    """Get all parts"""
-    parts = await db.parts_inventory.find({}, {"_id": 0}).to_list(1000)
-    return parts
+async def get_parts(
+    request: Request,
+    part_number: Optional[str] = None,
+    supplier: Optional[str] = None,
+    location: Optional[str] = None,
+    low_stock: bool = False,
+    page: PageParams = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    """Get parts, one page at a time"""
+    query = match_fields(part_number=part_number, supplier=supplier, location=location)
+    if low_stock:
+        query["$expr"] = {"$lte": ["$quantity", "$min_stock"]}
+    load = lambda response: paginate(parts.collection, query, "part_id", page, response)
+    return await response_cache.serve(request, "parts_inventory", List[Part], load, load_shedding.heavy_reads)
 
 @parts_router.post("", response_model=Part)
 async def create_part(part: PartCreate, current_user: User = Depends(get_current_user)):
     """Create a new part"""
-    part_id = f"prt_{uuid.uuid4().hex[:12]}"
-    part_doc = part.dict()
-    part_doc["part_id"] = part_id
-    part_doc["created_at"] = datetime.now(timezone.utc)
-    part_doc["updated_at"] = datetime.now(timezone.utc)
+    part_doc = parts.new_doc(part.dict())
+    part_doc["updated_at"] = part_doc["created_at"]
     
-    await db.parts_inventory.insert_one(part_doc)
+    await parts.insert(part_doc)
+    response_cache.bump("parts_inventory")
+    search.index.put("part", part_doc)
+    await inventory.sync_low_stock([part_doc])
     
-    return Part(**part_doc)
+    return serialization.respond(Part, part_doc)
 
 @parts_router.get("/{part_id}", response_model=Part)
-async def get_part(part_id: str, current_user: User = Depends(get_current_user)):
+async def get_part(part_id: str, request: Request, current_user: User = Depends(get_current_user)):
     """Get part by ID"""
-    part = await db.parts_inventory.find_one({"part_id": part_id}, {"_id": 0})
-    if not part:
-        raise HTTPException(status_code=404, detail="Part not found")
-    return Part(**part)
+    return await response_cache.serve(request, "parts_inventory", Part, lambda response: parts.get(part_id))
 
 @parts_router.put("/{part_id}", response_model=Part)
 async def update_part(part_id: str, part: PartCreate, current_user: User = Depends(get_current_user)):
     """Update part"""
-    existing = await db.parts_inventory.find_one({"part_id": part_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Part not found")
-    
-    update_data = part.dict()
-    update_data["updated_at"] = datetime.now(timezone.utc)
-    
-    await db.parts_inventory.update_one(
-        {"part_id": part_id},
-        {"$set": update_data}
-    )
-    
-    updated_part = await db.parts_inventory.find_one({"part_id": part_id}, {"_id": 0})
-    return Part(**updated_part)
+    return await _apply_update(part_id, part.dict())
+
+@parts_router.patch("/{part_id}", response_model=Part)
+async def patch_part(part_id: str, part: PartUpdate, current_user: User = Depends(get_current_user)):
+    """Update only the part fields that were sent"""
+    return await _apply_update(part_id, patch_fields(part))
 
 @parts_router.delete("/{part_id}")
 async def delete_part(part_id: str, current_user: User = Depends(get_current_user)):
     """Delete part"""
-    result = await db.parts_inventory.delete_one({"part_id": part_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Part not found")
+    await parts.delete(part_id, projection={"_id": 1})
+    response_cache.bump("parts_inventory")
+    search.index.remove("part", part_id)
+    await inventory.sync_low_stock([], removed_ids=[part_id])
     return {"message": "Part deleted successfully"}
@@ -0,0 +1,667 @@
+"""MongoDB filter, update and aggregation semantics evaluated on plain Python dicts.
+
+This is the half of the embedded store (sqlite_store.py) that doesn't run as SQL:
+filters on unindexed or array fields, $expr, update operators, upserts and the
+aggregation stages SQLite can't take over. It covers the operators this app uses and
+follows Mongo where the difference would show: a filter on a path through an array
+matches any element, {field: None} also matches a missing field, range operators only
+compare values of the same type (numbers with numbers, dates with dates), and sorts
+order mixed types the way BSON does.
+"""
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+_MISSING = object()
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    # BSON dates have millisecond precision; query operands are cut the same way the
+    # driver (and sqlite_store._encode_date) cuts stored ones
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def _rank(value) -> int:
+    """Position of value's type in BSON comparison order"""
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, (list, tuple)):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+
+def sort_key(value):
+    """Key that orders any mix of values like a MongoDB sort"""
+    rank = _rank(value)
+    if rank == 1:
+        return (1, 0)
+    if rank == 9:
+        return (9, _naive_utc(value))
+    if rank == 4:
+        return (4, tuple((key, sort_key(item)) for key, item in value.items()))
+    if rank == 5:
+        return (5, tuple(sort_key(item) for item in value))
+    if rank == 10:
+        return (10, str(value))
+    return (rank, value)
+
+
+def compare(a, b) -> int:
+    a, b = sort_key(a), sort_key(b)
+    return (a > b) - (a < b)
+
+
+def _equal(value, target) -> bool:
+    if value is _MISSING:
+        return target is None
+    if _rank(value) != _rank(target):
+        return False
+    if isinstance(value, datetime):
+        return _naive_utc(value) == _naive_utc(target)
+    return value == target
+
+
+# Paths
+
+def _resolve(doc, parts: list) -> list:
+    """Every value at a dotted path; a path through an array fans out over its elements"""
+    value = doc
+    for i, part in enumerate(parts):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list):
+            if part.isdigit():
+                index = int(part)
+                value = value[index] if index < len(value) else _MISSING
+            else:
+                values = []
+                for item in value:
+                    if isinstance(item, dict):
+                        values.extend(value for value in _resolve(item, parts[i:]) if value is not _MISSING)
+                return values or [_MISSING]
+        else:
+            return [_MISSING]
+        if value is _MISSING:
+            return [_MISSING]
+    return [value]
+
+
+def _candidates(values: list):
+    """Values a filter is tested against: each value, plus the elements of array values"""
+    for value in values:
+        if isinstance(value, list):
+            yield from value
+        yield value
+
+
+def get_path(doc, path: str, default=None):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return default
+        if value is _MISSING:
+            return default
+    return value
+
+
+def set_path(doc: dict, path: str, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        if isinstance(doc, list):
+            doc = doc[int(part)]
+            continue
+        child = doc.get(part)
+        if child is None:
+            child = doc[part] = {}
+        elif not isinstance(child, (dict, list)):
+            raise OperationFailure(f"Cannot create field '{parts[-1]}' in element {{{part}: {child!r}}}")
+        doc = child
+    if isinstance(doc, list):
+        doc[int(parts[-1])] = value
+    else:
+        doc[parts[-1]] = value
+
+
+def unset_path(doc: dict, path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part) if isinstance(doc, dict) else None
+        if doc is None:
+            return
+    if isinstance(doc, dict):
+        doc.pop(parts[-1], None)
+
+
+# Filters
+
+_RANGE = {
+    "$gt": lambda order: order > 0,
+    "$gte": lambda order: order >= 0,
+    "$lt": lambda order: order < 0,
+    "$lte": lambda order: order <= 0,
+}
+
+
+def _is_operator_dict(condition) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(key.startswith("$") for key in condition)
+
+
+def _any_equal(values: list, target) -> bool:
+    return any(_equal(value, target) for value in _candidates(values))
+
+
+def _match_operator(op: str, operand, values: list) -> bool:
+    if op == "$eq":
+        return _any_equal(values, operand)
+    if op == "$ne":
+        return not _any_equal(values, operand)
+    if op in _RANGE:
+        if operand is None:
+            return op in ("$gte", "$lte") and _any_equal(values, None)
+        test = _RANGE[op]
+        rank = _rank(operand)
+        return any(
+            value is not _MISSING and _rank(value) == rank and test(compare(value, operand))
+            for value in _candidates(values)
+        )
+    if op == "$in":
+        return any(_any_equal(values, target) for target in operand)
+    if op == "$nin":
+        return not any(_any_equal(values, target) for target in operand)
+    if op == "$exists":
+        return any(value is not _MISSING for value in values) == bool(operand)
+    if op == "$not":
+        return not _match_conditions(operand, values)
+    if op == "$size":
+        return any(isinstance(value, list) and len(value) == operand for value in values)
+    if op == "$elemMatch":
+        return any(
+            isinstance(value, list) and any(
+                matches(item, operand) if isinstance(item, dict) and not _is_operator_dict(operand)
+                else _match_conditions(operand, [item])
+                for item in value
+            )
+            for value in values
+        )
+    raise OperationFailure(f"unknown operator: {op}", code=2)
+
+
+def _match_conditions(condition, values: list) -> bool:
+    if _is_operator_dict(condition):
+        return all(_match_operator(op, operand, values) for op, operand in condition.items())
+    return _any_equal(values, condition)
+
+
+def matches(doc: dict, query: dict) -> bool:
+    """Whether doc satisfies a MongoDB filter"""
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, part) for part in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, part) for part in condition):
+                return False
+        elif key == "$expr":
+            if not truthy(evaluate(condition, doc)):
+                return False
+        elif key.startswith("$"):
+            raise OperationFailure(f"unknown top level operator: {key}", code=2)
+        elif not _match_conditions(condition, _resolve(doc, key.split("."))):
+            return False
+    return True
+
+
+# Projection and sorting
+
+def project(doc: dict, projection) -> dict:
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = projection.get("_id", 1)
+    fields = {field: flag for field, flag in projection.items() if field != "_id"}
+
+    if any(fields.values()):
+        result = {"_id": doc["_id"]} if include_id and "_id" in doc else {}
+        for field in fields:
+            value = get_path(doc, field, _MISSING)
+            if value is not _MISSING:
+                set_path(result, field, value)
+        return result
+
+    result = dict(doc)
+    if not include_id:
+        result.pop("_id", None)
+    for field in fields:
+        if "." in field:
+            head = field.split(".", 1)[0]
+            if isinstance(result.get(head), dict):
+                result[head] = dict(result[head])
+        unset_path(result, field)
+    return result
+
+
+def normalize_sort(key_or_list, direction=None) -> list:
+    """[(field, direction)] from any of the forms pymongo accepts"""
+    if key_or_list is None:
+        return []
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [(field, order) for field, order in key_or_list]
+
+
+def sort_documents(docs: list, sort: list) -> list:
+    # Stable sorts from the last key to the first give the compound order
+    for field, direction in reversed(sort):
+        docs.sort(key=lambda doc: sort_key(get_path(doc, field)), reverse=direction < 0)
+    return docs
+
+
+# Updates
+
+def _pull_matches(item, condition) -> bool:
+    if _is_operator_dict(condition):
+        return _match_conditions(condition, [item])
+    if isinstance(condition, dict) and isinstance(item, dict):
+        return matches(item, condition)
+    return _equal(item, condition)
+
+
+def _numeric(value, op: str, path: str):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise OperationFailure(f"Cannot apply {op} to a value of non-numeric type at '{path}'", code=14)
+
+
+def apply_update(doc: dict, update: dict, inserting: bool = False):
+    """Apply update operators to doc in place"""
+    for op, fields in update.items():
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for path, value in fields.items():
+            if op in ("$set", "$setOnInsert"):
+                set_path(doc, path, value)
+            elif op == "$unset":
+                unset_path(doc, path)
+            elif op in ("$inc", "$mul"):
+                current = get_path(doc, path, _MISSING)
+                _numeric(value, op, path)
+                if current is _MISSING:
+                    set_path(doc, path, value if op == "$inc" else 0)
+                else:
+                    _numeric(current, op, path)
+                    set_path(doc, path, current + value if op == "$inc" else current * value)
+            elif op in ("$min", "$max"):
+                current = get_path(doc, path, _MISSING)
+                order = compare(value, current) if current is not _MISSING else 0
+                if current is _MISSING or (order < 0 if op == "$min" else order > 0):
+                    set_path(doc, path, value)
+            elif op in ("$push", "$addToSet"):
+                current = get_path(doc, path, _MISSING)
+                if current is _MISSING:
+                    current = []
+                    set_path(doc, path, current)
+                elif not isinstance(current, list):
+                    raise OperationFailure(f"The field '{path}' must be an array", code=2)
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                for item in items:
+                    if op == "$push" or not any(_equal(existing, item) for existing in current):
+                        current.append(item)
+            elif op == "$pull":
+                current = get_path(doc, path)
+                if isinstance(current, list):
+                    current[:] = [item for item in current if not _pull_matches(item, value)]
+            else:
+                raise OperationFailure(f"Unknown modifier: {op}", code=9)
+
+
+def upsert_seed(query: dict) -> dict:
+    """The document an upsert starts from: the filter's equality conditions"""
+    doc = {}
+    for key, condition in query.items():
+        if key == "$and":
+            for part in condition:
+                doc.update(upsert_seed(part))
+        elif key.startswith("$"):
+            continue
+        elif _is_operator_dict(condition):
+            if "$eq" in condition:
+                set_path(doc, key, condition["$eq"])
+        else:
+            set_path(doc, key, condition)
+    return doc
+
+
+# Aggregation expressions
+
+def truthy(value) -> bool:
+    if value is None or value is False or value is _MISSING:
+        return False
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value != 0
+    return True
+
+
+def _field(doc, path: str):
+    """A $path in an expression; through an array it yields the array of sub-values"""
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list):
+            value = [item.get(part) for item in value if isinstance(item, dict) and part in item]
+        else:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+def _date_to_string(args: dict, doc):
+    value = evaluate(args["date"], doc)
+    if value is None:
+        return evaluate(args.get("onNull"), doc)
+    value = _naive_utc(value)
+    format = args.get("format", "%Y-%m-%dT%H:%M:%S.%LZ").replace("%L", f"{value.microsecond // 1000:03d}")
+    return value.strftime(format)
+
+
+def _subtract(a, b):
+    if a is None or b is None:
+        return None
+    if isinstance(a, datetime) and isinstance(b, datetime):
+        return int((_naive_utc(a) - _naive_utc(b)).total_seconds() * 1000)
+    return a - b
+
+
+def _divide(a, b):
+    if a is None or b is None:
+        return None
+    if b == 0:
+        raise OperationFailure("can't $divide by zero", code=2)
+    return a / b
+
+
+def _extreme(values: list, pick):
+    values = [value for value in values if value is not None]
+    if len(values) == 1 and isinstance(values[0], list):
+        values = [value for value in values[0] if value is not None]
+    return pick(values, key=sort_key) if values else None
+
+
+def _cond(args, doc):
+    if isinstance(args, dict):
+        args = [args["if"], args["then"], args["else"]]
+    condition, then, otherwise = args
+    return evaluate(then if truthy(evaluate(condition, doc)) else otherwise, doc)
+
+
+def _if_null(args, doc):
+    for expression in args[:-1]:
+        value = evaluate(expression, doc)
+        if value is not None:
+            return value
+    return evaluate(args[-1], doc)
+
+
+def _values(args, doc) -> list:
+    return [evaluate(arg, doc) for arg in (args if isinstance(args, list) else [args])]
+
+
+# Operators that see their arguments unevaluated
+_LAZY_OPERATORS = {
+    "$cond": _cond,
+    "$ifNull": _if_null,
+    "$and": lambda args, doc: all(truthy(evaluate(arg, doc)) for arg in args),
+    "$or": lambda args, doc: any(truthy(evaluate(arg, doc)) for arg in args),
+    "$literal": lambda args, doc: args,
+    "$dateToString": _date_to_string,
+}
+
+_OPERATORS = {
+    "$eq": lambda a, b: compare(a, b) == 0,
+    "$ne": lambda a, b: compare(a, b) != 0,
+    "$gt": lambda a, b: compare(a, b) > 0,
+    "$gte": lambda a, b: compare(a, b) >= 0,
+    "$lt": lambda a, b: compare(a, b) < 0,
+    "$lte": lambda a, b: compare(a, b) <= 0,
+    "$cmp": compare,
+    "$not": lambda a: not truthy(a),
+    "$subtract": _subtract,
+    "$divide": _divide,
+    "$add": lambda *values: None if None in values else sum(values),
+    "$multiply": lambda *values: None if None in values else _product(values),
+    "$max": lambda *values: _extreme(list(values), max),
+    "$min": lambda *values: _extreme(list(values), min),
+    "$size": lambda value: len(value),
+    "$toString": lambda value: None if value is None else str(value),
+}
+
+
+def _product(values):
+    result = 1
+    for value in values:
+        result *= value
+    return result
+
+
+def evaluate(expression, doc):
+    """Value of an aggregation expression against doc"""
+    if isinstance(expression, str):
+        if expression.startswith("$$"):
+            if expression in ("$$ROOT", "$$CURRENT"):
+                return doc
+            raise OperationFailure(f"Use of undefined variable: {expression[2:]}", code=17276)
+        if expression.startswith("$"):
+            return _field(doc, expression[1:])
+        return expression
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            (op, args), = expression.items()
+            if op.startswith("$"):
+                if op in _LAZY_OPERATORS:
+                    return _LAZY_OPERATORS[op](args, doc)
+                if op in _OPERATORS:
+                    return _OPERATORS[op](*_values(args, doc))
+                raise OperationFailure(f"Unrecognized expression '{op}'", code=168)
+        return {key: evaluate(value, doc) for key, value in expression.items()}
+    if isinstance(expression, list):
+        return [evaluate(item, doc) for item in expression]
+    return expression
+
+
+# Aggregation stages
+
+def hashable_key(value):
+    """value as a dict key, equal for values Mongo treats as equal"""
+    rank = _rank(value)
+    if rank == 4:
+        return (4, tuple((key, hashable_key(item)) for key, item in value.items()))
+    if rank == 5:
+        return (5, tuple(hashable_key(item) for item in value))
+    if rank == 9:
+        return (9, _naive_utc(value))
+    return (rank, value)
+
+
+class _Accumulator:
+    __slots__ = ("op", "expression", "value", "count")
+
+    def __init__(self, op: str, expression):
+        self.op = op
+        self.expression = expression
+        self.value = [] if op in ("$push", "$addToSet") else (0 if op in ("$sum", "$avg", "$count") else _MISSING)
+        self.count = 0
+
+    def add(self, doc):
+        if self.op == "$count":
+            self.value += 1
+            return
+        value = evaluate(self.expression, doc)
+        op = self.op
+        if op in ("$sum", "$avg"):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.value += value
+                self.count += 1
+        elif op in ("$min", "$max"):
+            if value is not None and (
+                self.value is _MISSING or (compare(value, self.value) < 0 if op == "$min" else compare(value, self.value) > 0)
+            ):
+                self.value = value
+        elif op == "$first":
+            if self.value is _MISSING:
+                self.value = value
+        elif op == "$last":
+            self.value = value
+        elif op == "$push":
+            self.value.append(value)
+        elif op == "$addToSet":
+            if not any(_equal(existing, value) for existing in self.value):
+                self.value.append(value)
+
+    def result(self):
+        if self.op == "$avg":
+            return self.value / self.count if self.count else None
+        return None if self.value is _MISSING else self.value
+
+
+_ACCUMULATORS = {"$sum", "$avg", "$min", "$max", "$first", "$last", "$push", "$addToSet", "$count"}
+
+
+def _group(docs, spec: dict) -> list:
+    fields = {}
+    for name, accumulator in spec.items():
+        if name == "_id":
+            continue
+        (op, expression), = accumulator.items()
+        if op not in _ACCUMULATORS:
+            raise OperationFailure(f"unknown group operator '{op}'", code=15952)
+        fields[name] = (op, expression)
+
+    groups = {}
+    for doc in docs:
+        key = evaluate(spec["_id"], doc)
+        group = groups.get(hashable_key(key))
+        if group is None:
+            group = groups[hashable_key(key)] = (key, {name: _Accumulator(op, expression) for name, (op, expression) in fields.items()})
+        for accumulator in group[1].values():
+            accumulator.add(doc)
+    return [
+        {"_id": key, **{name: accumulator.result() for name, accumulator in accumulators.items()}}
+        for key, accumulators in groups.values()
+    ]
+
+
+def _unwind(docs, spec) -> list:
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    path = spec["path"][1:]
+    keep_empty = spec.get("preserveNullAndEmptyArrays", False)
+    unwound = []
+    for doc in docs:
+        value = get_path(doc, path)
+        if isinstance(value, list) and value:
+            for item in value:
+                copy = dict(doc)
+                _set_copied(copy, path, item)
+                unwound.append(copy)
+        elif isinstance(value, list) or value is None:
+            if keep_empty:
+                unwound.append(doc)
+        else:
+            unwound.append(doc)
+    return unwound
+
+
+def _set_copied(doc: dict, path: str, value):
+    """set_path on a shallow copy, copying each nested dict on the way so the source stays intact"""
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc[part] = dict(doc.get(part) or {})
+        doc = doc[part]
+    doc[parts[-1]] = value
+
+
+def _add_fields(docs, spec: dict) -> list:
+    result = []
+    for doc in docs:
+        copy = dict(doc)
+        for path, expression in spec.items():
+            _set_copied(copy, path, evaluate(expression, doc))
+        result.append(copy)
+    return result
+
+
+def _project(docs, spec: dict) -> list:
+    computed = {
+        field: expression for field, expression in spec.items()
+        if not (isinstance(expression, int) and expression in (0, 1))
+    }
+    if not computed:
+        return [project(doc, spec) for doc in docs]
+
+    # Computed fields make it an inclusion projection
+    included = [field for field, flag in spec.items() if field not in computed and flag and field != "_id"]
+    result = []
+    for doc in docs:
+        projected = {"_id": doc["_id"]} if spec.get("_id", 1) and "_id" in doc else {}
+        for field in included:
+            value = get_path(doc, field, _MISSING)
+            if value is not _MISSING:
+                set_path(projected, field, value)
+        for field, expression in computed.items():
+            _set_copied(projected, field, evaluate(expression, doc))
+        result.append(projected)
+    return result
+
+
+def run_pipeline(docs, pipeline: list) -> list:
+    """Run aggregation stages over docs (an iterable of dicts)"""
+    docs = list(docs)
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif name == "$group":
+            docs = _group(docs, spec)
+        elif name == "$sort":
+            docs = sort_documents(docs, normalize_sort(spec))
+        elif name == "$unwind":
+            docs = _unwind(docs, spec)
+        elif name in ("$addFields", "$set"):
+            docs = _add_fields(docs, spec)
+        elif name == "$project":
+            docs = _project(docs, spec)
+        elif name == "$unset":
+            docs = [project(doc, {field: 0 for field in ([spec] if isinstance(spec, str) else spec)}) for doc in docs]
+        elif name == "$skip":
+            docs = docs[spec:]
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$count":
+            docs = [{spec: len(docs)}] if docs else []
+        else:
+            raise OperationFailure(f"Unrecognized pipeline stage name: '{name}'", code=40324)
+    return docs
@@ -0,0 +1,157 @@
+from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+import os
+from models import VehicleReport, MonthlyReport, User
+from auth import get_current_user, require_admin
+import load_shedding
+import rollups
+
+
+reports_router = APIRouter(prefix="/reports", tags=["Reports"])
+
+# Database will be injected from server.py
+db = None
+
+DEPRECIATION_RATE = float(os.environ.get('DEPRECIATION_RATE', 0.15))
+
+MONTH_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+
+def _rollup_match(month_from: Optional[str], month_to: Optional[str], vehicle_id: Optional[str] = None) -> dict:
+    match = {}
+    if vehicle_id:
+        match["vehicle_id"] = vehicle_id
+    months = {}
+    if month_from:
+        months["$gte"] = month_from
+    if month_to:
+        months["$lte"] = month_to
+    if months:
+        match["month"] = months
+    return match
+
+async def _vehicle_reports(month_from: Optional[str], month_to: Optional[str]) -> List[VehicleReport]:
+    """Fold the rollups in range into one row per vehicle, then join vehicle details"""
+    group = {"_id": "$vehicle_id", "odometer_min": {"$min": "$odometer_min"}, "odometer_max": {"$max": "$odometer_max"}}
+    for field in rollups.SUM_FIELDS:
+        group[field] = {"$sum": f"${field}"}
+    
+    totals = {}
+    pipeline = [{"$match": _rollup_match(month_from, month_to)}, {"$group": group}]
+    with load_shedding.heavy_reads.slot():
+        async for row in db[rollups.ROLLUP_COLLECTION].aggregate(pipeline):
+            totals[row["_id"]] = row
+        
+        vehicles = await db.vehicles.find(
+            {},
+            {"_id": 0, "vehicle_id": 1, "plate": 1, "brand": 1, "model": 1, "status": 1, "total_value": 1}
+        ).to_list(None)
+    
+    reports = []
+    for vehicle in vehicles:
+        row = totals.get(vehicle["vehicle_id"], {})
+        fuel_quantity = row.get("fuel_quantity", 0)
+        distance = max((row.get("odometer_max") or 0) - (row.get("odometer_min") or 0), 0)
+        maintenance_count = row.get("maintenance_count", 0)
+        maintenance_cost = row.get("maintenance_cost", 0)
+        fuel_cost = row.get("fuel_cost", 0)
+        depreciation = (vehicle.get("total_value") or 0) * DEPRECIATION_RATE
+        total_operating_cost = fuel_cost + maintenance_cost
+        
+        reports.append(VehicleReport(
+            vehicle_id=vehicle["vehicle_id"],
+            plate=vehicle.get("plate"),
+            brand=vehicle.get("brand"),
+            model=vehicle.get("model"),
+            status=vehicle.get("status"),
+            fuel_cost=fuel_cost,
+            fuel_quantity=fuel_quantity,
+            distance=distance,
+            fuel_efficiency=round(distance / fuel_quantity, 2) if fuel_quantity > 0 else 0,
+            maintenance_cost=maintenance_cost,
+            maintenance_count=maintenance_count,
+            work_orders=row.get("work_orders", 0),
+            work_orders_completed=row.get("work_orders_completed", 0),
+            work_order_cost=row.get("work_order_cost", 0),
+            downtime_days=round(row.get("downtime_days", 0), 2),
+            # Same scoring the Reports page used: fewer and cheaper repairs rank higher
+            reliability_score=max(100 - maintenance_count * 5 - maintenance_cost / 1000000, 0),
+            depreciation=depreciation,
+            total_operating_cost=total_operating_cost,
+            tco=total_operating_cost + depreciation
+        ))
+    return reports
+
+@reports_router.get("/vehicles", response_model=List[VehicleReport])
+async def get_vehicle_reports(
+    month_from: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    month_to: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    current_user: User = Depends(get_current_user)
+):
+    """Get every per-vehicle metric for the month range"""
+    return await _vehicle_reports(month_from, month_to)
+
+@reports_router.get("/tco", response_model=List[VehicleReport])
+async def get_tco_report(
+    month_from: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    month_to: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    current_user: User = Depends(get_current_user)
+):
+    """Get vehicles ranked by total cost of ownership"""
+    reports = await _vehicle_reports(month_from, month_to)
+    return sorted(reports, key=lambda r: r.tco, reverse=True)
+
+@reports_router.get("/fuel-efficiency", response_model=List[VehicleReport])
+async def get_fuel_efficiency_report(
+    month_from: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    month_to: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    current_user: User = Depends(get_current_user)
+):
+    """Get vehicles ranked by km per litre"""
+    reports = await _vehicle_reports(month_from, month_to)
+    return sorted(reports, key=lambda r: r.fuel_efficiency, reverse=True)
+
+@reports_router.get("/reliability", response_model=List[VehicleReport])
+async def get_reliability_report(
+    month_from: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    month_to: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    current_user: User = Depends(get_current_user)
+):
+    """Get vehicles ranked by reliability score"""
+    reports = await _vehicle_reports(month_from, month_to)
+    return sorted(reports, key=lambda r: r.reliability_score, reverse=True)
+
+@reports_router.get("/downtime", response_model=List[VehicleReport])
+async def get_downtime_report(
+    month_from: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    month_to: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    current_user: User = Depends(get_current_user)
+):
+    """Get vehicles ranked by days spent in completed work orders"""
+    reports = await _vehicle_reports(month_from, month_to)
+    return sorted(reports, key=lambda r: r.downtime_days, reverse=True)
+
+@reports_router.get("/monthly", response_model=List[MonthlyReport])
+async def get_monthly_report(
+    month_from: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    month_to: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    vehicle_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get month-by-month totals for the fleet or a single vehicle"""
+    group = {"_id": "$month"}
+    for field in rollups.SUM_FIELDS:
+        group[field] = {"$sum": f"${field}"}
+    
+    pipeline = [
+        {"$match": _rollup_match(month_from, month_to, vehicle_id)},
+        {"$group": group},
+        {"$sort": {"_id": 1}}
+    ]
+    with load_shedding.heavy_reads.slot():
+        rows = await db[rollups.ROLLUP_COLLECTION].aggregate(pipeline).to_list(None)
+    return [MonthlyReport(month=row.pop("_id"), **row) for row in rows]
+
+@reports_router.post("/rollups/rebuild")
+async def rebuild_rollups(current_user: User = Depends(require_admin)):
+    """Rebuild the monthly rollups from the source collections"""
+    return await rollups.rebuild()
@@ -0,0 +1,95 @@
+"""Shared document access for the CRUD routers.
+
+Each router declares a Repository for its collection instead of repeating the same
+find/update/delete code. Every write is a single round trip: updates use
+find_one_and_update, deletes find_one_and_delete, and both raise the router's 404
+when nothing matched.
+"""
+from fastapi import HTTPException
+from pydantic import BaseModel
+from pymongo import ReturnDocument
+from datetime import datetime, timezone
+import uuid
+
+# Database will be injected from server.py
+db = None
+
+
+def patch_fields(update: BaseModel) -> dict:
+    """Only the fields a PATCH body actually sent"""
+    return update.model_dump(exclude_unset=True)
+
+
+class Repository:
+    def __init__(self, collection_name: str, id_field: str, id_prefix: str, label: str):
+        self.collection_name = collection_name
+        self.id_field = id_field
+        self.id_prefix = id_prefix
+        self.not_found = f"{label} not found"
+
+    @property
+    def collection(self):
+        return db[self.collection_name]
+
+    def _missing(self) -> HTTPException:
+        return HTTPException(status_code=404, detail=self.not_found)
+
+    def new_doc(self, fields: dict) -> dict:
+        """fields plus a freshly generated id and created_at"""
+        doc = dict(fields)
+        doc[self.id_field] = f"{self.id_prefix}_{uuid.uuid4().hex[:12]}"
+        doc["created_at"] = datetime.now(timezone.utc)
+        return doc
+
+    async def insert(self, doc: dict, session=None) -> dict:
+        await self.collection.insert_one(doc, session=session)
+        doc.pop("_id", None)
+        return doc
+
+    async def get(self, id_value: str, projection: dict = None) -> dict:
+        doc = await self.collection.find_one({self.id_field: id_value}, projection or {"_id": 0})
+        if not doc:
+            raise self._missing()
+        return doc
+
+    async def update(self, id_value: str, fields: dict) -> dict:
+        """$set fields and return the updated document"""
+        if not fields:
+            return await self.get(id_value)
+        updated = await self.collection.find_one_and_update(
+            {self.id_field: id_value},
+            {"$set": fields},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated:
+            raise self._missing()
+        return updated
+
+    async def update_with_previous(self, id_value: str, fields: dict, match: dict = None, session=None):
+        """$set fields and return (previous, updated), for callers that react to what changed.
+
+        The pre-image comes back from the same round trip; the updated document is the
+        pre-image with fields applied, which is exactly what $set stored. match adds
+        conditions on the current document; if they don't hold this is a 404 as well.
+        """
+        if not fields:
+            doc = await self.get(id_value)
+            return doc, doc
+        previous = await self.collection.find_one_and_update(
+            {**(match or {}), self.id_field: id_value},
+            {"$set": fields},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
+        if not previous:
+            raise self._missing()
+        return previous, {**previous, **fields}
+
+    async def delete(self, id_value: str, projection: dict = None) -> dict:
+        """Delete a document and return it (or the projected part of it)"""
+        deleted = await self.collection.find_one_and_delete({self.id_field: id_value}, projection=projection or {"_id": 0})
+        if not deleted:
+            raise self._missing()
+        return deleted
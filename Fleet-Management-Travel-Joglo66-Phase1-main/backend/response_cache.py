@@ -0,0 +1,89 @@
+"""Serialized GET responses cached against per-collection version counters.
+
+Every write to a cached collection calls bump(), which moves the collection to a new
+version; cache keys include the version, so older entries simply stop being reachable
+and age out of the LRU. Responses carry a strong ETag (a digest of the body) and an
+If-None-Match that matches a cached entry is answered with 304 without touching Mongo.
+
+Concurrent misses on the same key are coalesced: the first request builds the response
+and the rest await that build instead of running the same queries again. The key holds
+the collection version, so a request that arrives after a write never joins a build
+that started before it.
+
+Versions are per process. Writes made by another worker or by a script are picked up
+once RESPONSE_CACHE_TTL expires the entries they made stale.
+"""
+from fastapi import Request, Response
+import hashlib
+import os
+from cache import SingleFlight, TTLCache
+import serialization
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 2000))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 30))
+enabled = os.environ.get('RESPONSE_CACHE', 'true').lower() in ('1', 'true', 'yes')
+
+# Response headers set by handlers (pagination) that belong to the cached body
+CACHED_HEADERS = ("x-next-cursor", "link")
+
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+builds = SingleFlight()
+_versions = {}
+
+
+def bump(*collection_names: str):
+    """Invalidate every cached response built from these collections"""
+    for name in collection_names:
+        _versions[name] = _versions.get(name, 0) + 1
+
+
+def version(collection_name: str) -> int:
+    return _versions.get(collection_name, 0)
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _respond(request: Request, etag: str, body: bytes, headers: dict) -> Response:
+    headers = {**headers, "ETag": etag, "Cache-Control": "private, no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _build(key: tuple, model, load, limiter) -> tuple:
+    scratch = Response()
+    if limiter is None:
+        data = await load(scratch)
+    else:
+        with limiter.slot():
+            data = await load(scratch)
+    body = serialization.dump(model, data)
+    headers = {name: value for name, value in scratch.headers.items() if name in CACHED_HEADERS}
+    entry = (_etag(body), body, headers)
+    # A write that landed while load() ran has already moved the version on
+    if enabled and version(key[0]) == key[1]:
+        response_cache.set(key, entry)
+    return entry
+
+
+async def serve(request: Request, collection_name: str, model, load, limiter=None) -> Response:
+    """Answer a GET from the cache, or run load(response) and cache its serialized result.
+
+    load receives a Response it may set headers on (e.g. pagination cursors) and returns
+    the data to serialize as model. With a load_shedding.Limiter, building the response
+    takes one of its slots (cache hits and coalesced requests do not).
+    """
+    key = (collection_name, version(collection_name), request.url.path, str(request.query_params))
+    entry = response_cache.get(key) if enabled else None
+    if entry is None:
+        entry = await builds.run(key, lambda: _build(key, model, load, limiter))
+    return _respond(request, *entry)
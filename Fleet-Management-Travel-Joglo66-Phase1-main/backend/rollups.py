@@ -0,0 +1,239 @@
+"""Per-vehicle, per-month rollups of fuel, maintenance and work-order activity.
+
+Writes in the fuel, maintenance and work-order routers keep the rollups current;
+reports.py reads only from them. Rebuild everything from the source collections with:
+
+    python rollups.py rebuild
+"""
+from pymongo import ReplaceOne, UpdateOne
+from datetime import datetime, timezone
+import asyncio
+
+# Database will be injected from server.py
+db = None
+
+ROLLUP_COLLECTION = "vehicle_monthly_rollups"
+
+SUM_FIELDS = (
+    "fuel_cost", "fuel_quantity", "fuel_logs",
+    "maintenance_cost", "maintenance_count",
+    "work_orders", "work_orders_completed", "work_order_cost", "downtime_days",
+)
+
+
+def _utc(value: datetime) -> datetime:
+    # Documents read back from Mongo are naive UTC; freshly validated ones may carry an offset
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def month_key(value: datetime) -> str:
+    return _utc(value).strftime("%Y-%m")
+
+
+def month_bounds(month: str):
+    """Return the [start, end) datetimes of a YYYY-MM month"""
+    year, month_number = (int(part) for part in month.split("-"))
+    start = datetime(year, month_number, 1, tzinfo=timezone.utc)
+    end = datetime(year + month_number // 12, month_number % 12 + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+def _work_order_date(doc: dict):
+    return doc.get("completed_date") or doc.get("scheduled_date")
+
+
+def _bucket_date(kind: str, doc: dict):
+    return _work_order_date(doc) if kind == "work_order" else doc.get("date")
+
+
+def _contribution(kind: str, doc: dict):
+    """Return (sums, minimums, maximums) a single source document adds to its bucket"""
+    if kind == "fuel":
+        odometer = doc.get("odometer", 0)
+        return (
+            {"fuel_cost": doc.get("cost", 0), "fuel_quantity": doc.get("quantity", 0), "fuel_logs": 1},
+            {"odometer_min": odometer},
+            {"odometer_max": odometer},
+        )
+    if kind == "maintenance":
+        return {"maintenance_cost": doc.get("cost", 0), "maintenance_count": 1}, {}, {}
+
+    sums = {"work_orders": 1, "work_order_cost": doc.get("total_cost", 0)}
+    if doc.get("status") == "Completed":
+        sums["work_orders_completed"] = 1
+        if doc.get("completed_date") and doc.get("scheduled_date"):
+            days = (_utc(doc["completed_date"]) - _utc(doc["scheduled_date"])).total_seconds() / 86400
+            sums["downtime_days"] = max(days, 0)
+    return sums, {}, {}
+
+
+def _fold(buckets: dict, kind: str, doc: dict):
+    bucket_date = _bucket_date(kind, doc)
+    if not doc.get("vehicle_id") or not bucket_date:
+        return
+    key = (doc["vehicle_id"], month_key(bucket_date))
+    bucket = buckets.setdefault(key, {"inc": {}, "min": {}, "max": {}})
+    sums, minimums, maximums = _contribution(kind, doc)
+    for field, value in sums.items():
+        bucket["inc"][field] = bucket["inc"].get(field, 0) + value
+    for field, value in minimums.items():
+        bucket["min"][field] = min(value, bucket["min"].get(field, value))
+    for field, value in maximums.items():
+        bucket["max"][field] = max(value, bucket["max"].get(field, value))
+
+
+def _rollup_id(vehicle_id: str, month: str) -> str:
+    return f"{vehicle_id}:{month}"
+
+
+async def record(kind: str, docs: list):
+    """Fold newly inserted source documents into their rollups with one bulk write"""
+    buckets = {}
+    for doc in docs:
+        _fold(buckets, kind, doc)
+    if not buckets:
+        return
+
+    operations = []
+    for (vehicle_id, month), bucket in buckets.items():
+        update = {"$setOnInsert": {"vehicle_id": vehicle_id, "month": month}, "$inc": bucket["inc"]}
+        if bucket["min"]:
+            update["$min"] = bucket["min"]
+        if bucket["max"]:
+            update["$max"] = bucket["max"]
+        operations.append(UpdateOne({"_id": _rollup_id(vehicle_id, month)}, update, upsert=True))
+    await db[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+
+
+async def refresh(vehicle_id: str, month: str):
+    """Recompute one vehicle-month from the source collections.
+
+    Used after updates and deletes, where a minimum or maximum cannot be undone by $inc.
+    """
+    start, end = month_bounds(month)
+    date_range = {"$gte": start, "$lt": end}
+    fuel_logs, maintenance_records, work_orders = await asyncio.gather(
+        db.fuel_logs.find({"vehicle_id": vehicle_id, "date": date_range}, {"_id": 0}).to_list(None),
+        db.maintenance_records.find({"vehicle_id": vehicle_id, "date": date_range}, {"_id": 0}).to_list(None),
+        db.work_orders.find({"vehicle_id": vehicle_id, "$or": [
+            {"completed_date": date_range},
+            {"completed_date": None, "scheduled_date": date_range},
+        ]}, {"_id": 0}).to_list(None),
+    )
+
+    buckets = {}
+    for kind, docs in (("fuel", fuel_logs), ("maintenance", maintenance_records), ("work_order", work_orders)):
+        for doc in docs:
+            _fold(buckets, kind, doc)
+
+    rollup_id = _rollup_id(vehicle_id, month)
+    bucket = buckets.get((vehicle_id, month))
+    if not bucket:
+        await db[ROLLUP_COLLECTION].delete_one({"_id": rollup_id})
+        return
+    rollup = {"vehicle_id": vehicle_id, "month": month, **bucket["inc"], **bucket["min"], **bucket["max"]}
+    await db[ROLLUP_COLLECTION].replace_one({"_id": rollup_id}, rollup, upsert=True)
+
+
+async def refresh_for(kind: str, *docs):
+    """Refresh the buckets the given (old and/or new) source documents fall into"""
+    targets = set()
+    for doc in docs:
+        bucket_date = _bucket_date(kind, doc) if doc else None
+        if bucket_date and doc.get("vehicle_id"):
+            targets.add((doc["vehicle_id"], month_key(bucket_date)))
+    await asyncio.gather(*(refresh(vehicle_id, month) for vehicle_id, month in targets))
+
+
+def _month_expression(date_expression):
+    return {"$dateToString": {"format": "%Y-%m", "date": date_expression}}
+
+
+REBUILD_PIPELINES = {
+    "fuel_logs": [
+        {"$match": {"date": {"$ne": None}}},
+        {"$group": {
+            "_id": {"vehicle_id": "$vehicle_id", "month": _month_expression("$date")},
+            "fuel_cost": {"$sum": "$cost"},
+            "fuel_quantity": {"$sum": "$quantity"},
+            "fuel_logs": {"$sum": 1},
+            "odometer_min": {"$min": "$odometer"},
+            "odometer_max": {"$max": "$odometer"},
+        }},
+    ],
+    "maintenance_records": [
+        {"$match": {"date": {"$ne": None}}},
+        {"$group": {
+            "_id": {"vehicle_id": "$vehicle_id", "month": _month_expression("$date")},
+            "maintenance_cost": {"$sum": "$cost"},
+            "maintenance_count": {"$sum": 1},
+        }},
+    ],
+    "work_orders": [
+        {"$addFields": {"_completed": {"$and": [
+            {"$eq": ["$status", "Completed"]},
+            {"$ne": [{"$ifNull": ["$completed_date", None]}, None]},
+        ]}}},
+        {"$group": {
+            "_id": {
+                "vehicle_id": "$vehicle_id",
+                "month": _month_expression({"$ifNull": ["$completed_date", "$scheduled_date"]}),
+            },
+            "work_orders": {"$sum": 1},
+            "work_order_cost": {"$sum": "$total_cost"},
+            "work_orders_completed": {"$sum": {"$cond": [{"$eq": ["$status", "Completed"]}, 1, 0]}},
+            "downtime_days": {"$sum": {"$cond": [
+                "$_completed",
+                {"$max": [0, {"$divide": [{"$subtract": ["$completed_date", "$scheduled_date"]}, 86400000]}]},
+                0,
+            ]}},
+        }},
+    ],
+}
+
+
+async def rebuild(batch_size: int = 1000) -> dict:
+    """Rebuild every rollup from scratch with server-side $group pipelines.
+
+    Reports keep reading complete rollups throughout: each bucket is replaced in place
+    by _id, and only buckets that no longer have any source documents are deleted
+    once every current one is written.
+    """
+    rollups = {}
+    for collection_name, pipeline in REBUILD_PIPELINES.items():
+        async for row in db[collection_name].aggregate(pipeline, allowDiskUse=True):
+            key = row.pop("_id")
+            if not key.get("vehicle_id") or not key.get("month"):
+                continue
+            rollup_id = _rollup_id(key["vehicle_id"], key["month"])
+            rollups.setdefault(rollup_id, {"_id": rollup_id, **key}).update(row)
+
+    # Listed before writing, so buckets that record() creates meanwhile aren't taken for stale ones
+    stale = [doc["_id"] async for doc in db[ROLLUP_COLLECTION].find({}, {"_id": 1}) if doc["_id"] not in rollups]
+    docs = list(rollups.values())
+    for i in range(0, len(docs), batch_size):
+        await db[ROLLUP_COLLECTION].bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs[i:i + batch_size]],
+            ordered=False
+        )
+    for i in range(0, len(stale), batch_size):
+        await db[ROLLUP_COLLECTION].delete_many({"_id": {"$in": stale[i:i + batch_size]}})
+    return {"rollups": len(docs), "removed": len(stale)}
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import os
+    from pathlib import Path
+    from dotenv import load_dotenv
+    import storage
+
+    parser = argparse.ArgumentParser(description="Maintain vehicle monthly rollups")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = storage.connect()
+    db = client[os.environ['DB_NAME']]
+
+    print(json.dumps(asyncio.run(rebuild())))
@@ -0,0 +1,267 @@
+"""Driver assignment timelines: conflict-free writes and point-in-time lookups.
+
+An assignment covers [start_date, end_date), open-ended while end_date is null. Every
+vehicle and every driver has a timeline of its assignments, and a new assignment may
+not overlap any other on either timeline.
+
+Conflicts are checked in the database: another assignment overlaps [start, end) when
+it starts before end and ends (or is open) after start. The query seeks the
+(vehicle_id, start_date, end_date) or (driver_id, start_date, end_date) index to the
+timeline's assignments starting before end and tests end_date from the index entry.
+It doesn't assume the timeline is already free of overlaps, since assignments written
+before conflicts were rejected may not be. Requests racing past the check all insert,
+then re-check against the assignments inserted before their own (by created_at, then
+assignment_id); every one but the first finds a conflict and deletes itself.
+
+Lookups ("who drives this vehicle at T", "which vehicles are free in this window")
+are answered from an in-memory interval index per timeline: intervals sorted by
+start with a running maximum of end, so a lookup bisects to the window and walks
+back only while earlier intervals can still reach it. The index is loaded on first
+use, kept current by this process's writes, and reloaded every ASSIGNMENT_INDEX_TTL
+seconds to pick up writes from other workers. Writes made while a load is scanning are
+replayed onto the index it produces.
+"""
+from fastapi import HTTPException
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Optional
+import asyncio
+import os
+import time
+from cache import SingleFlight
+
+# Database will be injected from server.py
+db = None
+
+COLLECTION = "driver_assignments"
+ASSIGNMENT_INDEX_TTL = float(os.environ.get('ASSIGNMENT_INDEX_TTL', 60))
+
+# Timeline field -> label used in conflict messages
+TIMELINES = {"vehicle_id": "Vehicle", "driver_id": "Driver"}
+
+# End of an open-ended assignment
+FOREVER = datetime.max.replace(tzinfo=timezone.utc)
+
+
+def _utc(value: datetime) -> datetime:
+    # Documents read back from Mongo are naive UTC; freshly validated ones may carry an offset
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _end(doc: dict) -> datetime:
+    return _utc(doc["end_date"]) if doc.get("end_date") else FOREVER
+
+
+# Conflict checks (database)
+
+async def _overlapping(field: str, value: str, start: datetime, end: Optional[datetime], inserted_before: dict = None) -> Optional[dict]:
+    """An assignment on this timeline overlapping [start, end), if there is one;
+    with inserted_before, only assignments created before that one count"""
+    conditions = [
+        {field: value, "start_date": {"$lt": end}} if end else {field: value},
+        {"$or": [{"end_date": None}, {"end_date": {"$gt": start}}]},
+    ]
+    if inserted_before:
+        conditions.append({"$or": [
+            {"created_at": {"$lt": inserted_before["created_at"]}},
+            {"created_at": inserted_before["created_at"], "assignment_id": {"$lt": inserted_before["assignment_id"]}},
+        ]})
+    return await db[COLLECTION].find_one({"$and": conditions}, {"_id": 0})
+
+
+async def _conflict(doc: dict, inserted_before: dict = None):
+    """(field, overlapping assignment) for the first timeline doc conflicts on, else None"""
+    found = await asyncio.gather(*(
+        _overlapping(field, doc[field], doc["start_date"], doc.get("end_date"), inserted_before) for field in TIMELINES
+    ))
+    for field, other in zip(TIMELINES, found):
+        if other:
+            return field, other
+    return None
+
+
+def _conflict_error(field: str, other: dict) -> HTTPException:
+    until = other["end_date"].isoformat() if other.get("end_date") else "open-ended"
+    return HTTPException(
+        status_code=409,
+        detail=f"{TIMELINES[field]} {other[field]} is already assigned in that period "
+               f"({other['assignment_id']}, {other['start_date'].isoformat()} to {until})"
+    )
+
+
+async def create_assignment(doc: dict) -> dict:
+    """Insert doc unless it overlaps another assignment of its vehicle or driver (409)"""
+    conflict = await _conflict(doc)
+    if conflict:
+        raise _conflict_error(*conflict)
+
+    await db[COLLECTION].insert_one(doc)
+    doc.pop("_id", None)
+
+    # A concurrent request may have passed the same check; the later insert gives way
+    conflict = await _conflict(doc, inserted_before=doc)
+    if conflict:
+        await db[COLLECTION].delete_one({"assignment_id": doc["assignment_id"]})
+        raise _conflict_error(*conflict)
+
+    index.add(doc)
+    return doc
+
+
+async def end_assignment(driver_id: str, assignment_id: str, end_date: datetime) -> dict:
+    """Close an open-ended assignment at end_date; shortening cannot create a conflict"""
+    existing = await db[COLLECTION].find_one({"assignment_id": assignment_id, "driver_id": driver_id}, {"_id": 0})
+    if not existing:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    if existing.get("end_date"):
+        raise HTTPException(status_code=409, detail="Assignment already ended")
+    if _utc(end_date) <= _utc(existing["start_date"]):
+        raise HTTPException(status_code=400, detail="end_date must be after start_date")
+
+    # Matching on the open end makes closing a single atomic transition
+    previous = await db[COLLECTION].find_one_and_update(
+        {"assignment_id": assignment_id, "end_date": None},
+        {"$set": {"end_date": end_date}},
+        projection={"_id": 0}
+    )
+    if not previous:
+        raise HTTPException(status_code=409, detail="Assignment already ended")
+
+    updated = {**previous, "end_date": end_date}
+    index.replace(previous, updated)
+    return updated
+
+
+# Point-in-time lookups (in-memory interval index)
+
+class Timeline:
+    """One vehicle's or driver's assignments, sorted by start, with a running maximum of end"""
+
+    __slots__ = ("starts", "entries", "max_ends")
+
+    def __init__(self):
+        self.starts = []
+        self.entries = []
+        self.max_ends = []
+
+    def add(self, start: datetime, end: datetime, doc: dict):
+        position = bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.entries.insert(position, (start, end, doc))
+        self._reindex(position)
+
+    def remove(self, assignment_id: str):
+        for position, (_, _, doc) in enumerate(self.entries):
+            if doc["assignment_id"] == assignment_id:
+                del self.starts[position]
+                del self.entries[position]
+                self._reindex(position)
+                return
+
+    def _reindex(self, position: int):
+        del self.max_ends[position:]
+        running = self.max_ends[-1] if self.max_ends else None
+        for _, end, _ in self.entries[position:]:
+            running = end if running is None or end > running else running
+            self.max_ends.append(running)
+
+    def overlapping(self, start: datetime, end: datetime) -> list:
+        """Assignments overlapping [start, end)"""
+        found = []
+        position = bisect_left(self.starts, end) - 1
+        # Nothing at or before position ends after start once the running maximum doesn't
+        while position >= 0 and self.max_ends[position] > start:
+            entry_start, entry_end, doc = self.entries[position]
+            if entry_end > start:
+                found.append(doc)
+            position -= 1
+        return found
+
+    def covering(self, at: datetime) -> list:
+        """Assignments in force at the instant at"""
+        found = []
+        position = bisect_right(self.starts, at) - 1
+        while position >= 0 and self.max_ends[position] > at:
+            entry_start, entry_end, doc = self.entries[position]
+            if entry_end > at:
+                found.append(doc)
+            position -= 1
+        return found
+
+
+class AssignmentIndex:
+    def __init__(self):
+        self.timelines = {field: {} for field in TIMELINES}
+        self.loaded_at = None
+        self._loads = SingleFlight()
+        # Writes made while a load runs, as (previous document or None, document)
+        self._pending = None
+
+    def _add(self, doc: dict):
+        start, end = _utc(doc["start_date"]), _end(doc)
+        for field, timelines in self.timelines.items():
+            timelines.setdefault(doc[field], Timeline()).add(start, end, doc)
+
+    def _replace(self, previous: dict, updated: dict):
+        for field, timelines in self.timelines.items():
+            timeline = timelines.get(previous[field])
+            if timeline:
+                timeline.remove(previous["assignment_id"])
+        self._add(updated)
+
+    def add(self, doc: dict):
+        """Index a created assignment (before the first load the load covers it)"""
+        if self._pending is not None:
+            self._pending.append((None, doc))
+        if self.loaded_at is not None:
+            self._add(doc)
+
+    def replace(self, previous: dict, updated: dict):
+        if self._pending is not None:
+            self._pending.append((previous, updated))
+        if self.loaded_at is not None:
+            self._replace(previous, updated)
+
+    async def _load(self):
+        # The scan may already be past an assignment written meanwhile
+        self._pending = []
+        try:
+            timelines = {field: {} for field in TIMELINES}
+            projection = {"_id": 0, "assignment_id": 1, "vehicle_id": 1, "driver_id": 1, "start_date": 1, "end_date": 1, "notes": 1, "created_at": 1}
+            # Sorted by start, so every Timeline.add appends
+            async for doc in db[COLLECTION].find({}, projection).sort("start_date", 1):
+                start, end = _utc(doc["start_date"]), _end(doc)
+                for field in TIMELINES:
+                    timelines[field].setdefault(doc[field], Timeline()).add(start, end, doc)
+            self.timelines = timelines
+            # The scan may have read a replayed write too, so replace rather than add
+            for previous, doc in self._pending:
+                self._replace(previous or doc, doc)
+            self.loaded_at = time.monotonic()
+        finally:
+            self._pending = None
+
+    async def ensure_loaded(self):
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < ASSIGNMENT_INDEX_TTL:
+            return
+        await self._loads.run("load", self._load)
+
+
+index = AssignmentIndex()
+
+
+async def assigned_at(field: str, value: str, at: datetime) -> Optional[dict]:
+    """The assignment of one vehicle or driver in force at the instant at, if any"""
+    await index.ensure_loaded()
+    timeline = index.timelines[field].get(value)
+    found = timeline.covering(_utc(at)) if timeline else []
+    # covering() walks back from the latest start; more than one is only possible in
+    # data written before overlaps were rejected, and then the latest one wins
+    return found[0] if found else None
+
+
+async def busy_in_window(field: str, start: datetime, end: Optional[datetime]) -> set:
+    """Vehicle or driver ids with an assignment overlapping [start, end)"""
+    await index.ensure_loaded()
+    start, end = _utc(start), _utc(end) if end else FOREVER
+    return {value for value, timeline in index.timelines[field].items() if timeline.overlapping(start, end)}
@@ -0,0 +1,234 @@
+"""Typeahead search over vehicles, drivers and parts from an in-process n-gram index.
+
+Field values are normalized to lowercase alphanumerics, so "ab-1234 cd", "AB 1234 CD"
+and "AB1234CD" are the same text; a query is normalized the same way. Two structures
+answer it:
+
+- A sorted list per entity type of every normalized value from each word boundary
+  onwards ("Driver Budi 12" -> "driverbudi12", "budi12", "12"). A bisect finds every
+  value or word the query is a prefix of, exact matches first, whatever the query's
+  length.
+- A trigram index (trigram -> entities) for queries of three or more characters that
+  only occur inside a word, consulted when the prefix matches don't fill the page.
+
+Either way at most SEARCH_SCAN_LIMIT entries of each requested type are looked at, so
+a one-letter query costs the same as a full plate. Scores rank exact matches over
+prefixes over word prefixes over substrings, and identifiers (plate, VIN, license and
+part numbers) above names within each. The routers update the index on every write;
+it is loaded on first use and reloaded every SEARCH_INDEX_TTL seconds to pick up
+writes from other workers and scripts. Writes made while a load is scanning are
+replayed onto the index it produces.
+"""
+from fastapi import APIRouter, Depends, Query
+from bisect import bisect_left, insort
+from typing import List, Optional
+import heapq
+import os
+import re
+import time
+from cache import SingleFlight
+from models import SearchResult, User
+from auth import get_current_user
+
+
+search_router = APIRouter(prefix="/search", tags=["Search"])
+
+# Database will be injected from server.py
+db = None
+
+SEARCH_INDEX_TTL = float(os.environ.get('SEARCH_INDEX_TTL', 300))
+SEARCH_SCAN_LIMIT = 2000
+
+# Entity type -> (collection, id field, label field, detail fields, {field: bonus})
+ENTITIES = {
+    "vehicle": ("vehicles", "vehicle_id", "plate", ("brand", "model"), {"plate": 10, "vin": 10, "brand": 0, "model": 0}),
+    "driver": ("drivers", "driver_id", "name", ("license_number",), {"license_number": 10, "name": 5}),
+    "part": ("parts_inventory", "part_id", "name", ("part_number",), {"part_number": 10, "name": 5}),
+}
+
+# Match tiers; a field's bonus (at most 10) orders fields within a tier
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING = 100, 60, 40, 20
+
+_separators = re.compile(r"[^0-9a-z]+")
+
+
+def _words(text: str) -> list:
+    return [word for word in _separators.split(str(text).lower()) if word]
+
+
+def _trigrams(compact: str) -> set:
+    return {compact[i:i + 3] for i in range(len(compact) - 2)}
+
+
+class SearchIndex:
+    def __init__(self):
+        # type -> sorted [(suffix from a word boundary, whole value?, id, field)]
+        self.suffixes = {kind: [] for kind in ENTITIES}
+        self.trigrams = {}
+        # (type, id) -> (label, detail, {field: compact value}, suffix entries, trigrams)
+        self.entries = {}
+        self.loaded_at = None
+        self._loads = SingleFlight()
+        # Writes made while a load runs, as (type, document or None for a removal, id)
+        self._pending = None
+
+    def _put(self, kind: str, doc: dict, presorted: bool = False):
+        collection_name, id_field, label_field, detail_fields, bonuses = ENTITIES[kind]
+        key = (kind, doc[id_field])
+        self._remove(key)
+        values = {}
+        suffixes = []
+        trigrams = set()
+        for field in bonuses:
+            words = _words(doc.get(field) or "")
+            if not words:
+                continue
+            values[field] = compact = "".join(words)
+            for position in range(len(words)):
+                suffixes.append(("".join(words[position:]), position == 0, key[1], field))
+            trigrams |= _trigrams(compact)
+        detail = " ".join(str(doc[field]) for field in detail_fields if doc.get(field))
+        self.entries[key] = (str(doc.get(label_field) or key[1]), detail or None, values, suffixes, trigrams)
+        if presorted:
+            self.suffixes[kind].extend(suffixes)
+        else:
+            for entry in suffixes:
+                insort(self.suffixes[kind], entry)
+        for trigram in trigrams:
+            self.trigrams.setdefault(trigram, set()).add(key)
+
+    def _remove(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        suffixes = self.suffixes[key[0]]
+        for suffix in entry[3]:
+            position = bisect_left(suffixes, suffix)
+            if position < len(suffixes) and suffixes[position] == suffix:
+                del suffixes[position]
+        for trigram in entry[4]:
+            posting = self.trigrams.get(trigram)
+            if posting is not None:
+                posting.discard(key)
+                if not posting:
+                    del self.trigrams[trigram]
+
+    def put(self, kind: str, doc: dict):
+        """Index a created or updated document (before the first load the load covers it)"""
+        if self._pending is not None:
+            self._pending.append((kind, doc, doc[ENTITIES[kind][1]]))
+        if self.loaded_at is not None:
+            self._put(kind, doc)
+
+    def remove(self, kind: str, id_value: str):
+        if self._pending is not None:
+            self._pending.append((kind, None, id_value))
+        if self.loaded_at is not None:
+            self._remove((kind, id_value))
+
+    async def _load(self):
+        # The scan may already be past a document a router writes meanwhile
+        self._pending = []
+        try:
+            loaded = SearchIndex()
+            for kind, (collection_name, id_field, label_field, detail_fields, bonuses) in ENTITIES.items():
+                projection = {"_id": 0, id_field: 1, label_field: 1, **{field: 1 for field in (*detail_fields, *bonuses)}}
+                async for doc in db[collection_name].find({}, projection):
+                    loaded._put(kind, doc, presorted=True)
+            # One sort instead of an insort per suffix
+            for suffixes in loaded.suffixes.values():
+                suffixes.sort()
+            self.suffixes, self.trigrams, self.entries = loaded.suffixes, loaded.trigrams, loaded.entries
+            for kind, doc, id_value in self._pending:
+                if doc is None:
+                    self._remove((kind, id_value))
+                else:
+                    self._put(kind, doc)
+            self.loaded_at = time.monotonic()
+        finally:
+            self._pending = None
+
+    async def ensure_loaded(self):
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < SEARCH_INDEX_TTL:
+            return
+        await self._loads.run("load", self._load)
+
+    def _prefix_matches(self, query: str, kinds: set, scores: dict):
+        for kind in kinds:
+            suffixes = self.suffixes[kind]
+            bonuses = ENTITIES[kind][4]
+            position = bisect_left(suffixes, (query,))
+            end = min(len(suffixes), position + SEARCH_SCAN_LIMIT)
+            while position < end:
+                suffix, whole, id_value, field = suffixes[position]
+                if not suffix.startswith(query):
+                    break
+                position += 1
+                if whole:
+                    tier = EXACT if suffix == query else PREFIX
+                else:
+                    tier = WORD_PREFIX
+                score = tier + bonuses[field]
+                key = (kind, id_value)
+                if score > scores.get(key, (0,))[0]:
+                    scores[key] = (score, field)
+
+    def _substring_matches(self, query: str, kinds: set, scores: dict):
+        postings = []
+        for trigram in _trigrams(query):
+            posting = self.trigrams.get(trigram)
+            if not posting:
+                return
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:]) if len(postings) > 1 else postings[0]
+        checked = 0
+        for key in candidates:
+            if key in scores or key[0] not in kinds:
+                continue
+            checked += 1
+            if checked > SEARCH_SCAN_LIMIT:
+                break
+            bonuses = ENTITIES[key[0]][4]
+            best = None
+            for field, compact in self.entries[key][2].items():
+                if query in compact and (best is None or bonuses[field] > bonuses[best]):
+                    best = field
+            if best is not None:
+                scores[key] = (SUBSTRING + bonuses[best], best)
+
+    def search(self, text: str, kinds: set, limit: int) -> list:
+        query = "".join(_words(text))
+        if not query:
+            return []
+        scores = {}
+        self._prefix_matches(query, kinds, scores)
+        if len(scores) < limit and len(query) >= 3:
+            self._substring_matches(query, kinds, scores)
+
+        def rank(item):
+            key, (score, field) = item
+            label = self.entries[key][0]
+            return -score, len(label), label
+
+        results = []
+        for key, (score, field) in heapq.nsmallest(limit, scores.items(), key=rank):
+            label, detail = self.entries[key][:2]
+            results.append({"type": key[0], "id": key[1], "label": label, "detail": detail, "field": field, "score": score})
+        return results
+
+
+index = SearchIndex()
+
+
+@search_router.get("", response_model=List[SearchResult])
+async def search(
+    q: str = Query(..., min_length=1, max_length=100, description="Plate, VIN, name, license or part number fragment"),
+    type: Optional[List[str]] = Query(None, description="Restrict to vehicle, driver and/or part"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_user)
+):
+    """Typeahead search across vehicles, drivers and parts, best matches first"""
+    await index.ensure_loaded()
+    kinds = set(type or ENTITIES) & set(ENTITIES)
+    return index.search(q, kinds, limit)
@@ -0,0 +1,77 @@
+"""Response rendering that validates each payload at most once.
+
+Documents read from our own collections were validated by the models on the way in, so
+by default (TRUSTED_DOCUMENTS) they are only trimmed to the model's fields, given the
+defaults of fields they lack, and encoded with orjson. Everything else goes through a
+cached TypeAdapter, which validates and serializes in one Rust pass instead of the
+validate-then-jsonable_encoder-then-json.dumps route a response_model takes.
+"""
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from functools import lru_cache
+from pydantic import BaseModel, TypeAdapter
+from typing import get_args, get_origin
+import os
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:  # orjson is optional; the standard library encoder still works
+    orjson = None
+    FastJSONResponse = JSONResponse
+
+trusted = os.environ.get('TRUSTED_DOCUMENTS', 'true').lower() in ('1', 'true', 'yes')
+
+
+@lru_cache(maxsize=None)
+def adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+@lru_cache(maxsize=None)
+def _fields(model) -> tuple:
+    """(name, required, field_info) for every field of a model"""
+    return tuple((name, info.is_required(), info) for name, info in model.model_fields.items())
+
+
+def _item_model(model):
+    """The BaseModel a payload of this type holds, and whether it is a list of them"""
+    if get_origin(model) is list:
+        (item,) = get_args(model)
+        return item, True
+    return model, False
+
+
+def _trim(fields: tuple, doc: dict) -> dict:
+    out = {}
+    for name, required, info in fields:
+        if name in doc:
+            out[name] = doc[name]
+        elif required:
+            raise KeyError(name)
+        else:
+            out[name] = info.get_default(call_default_factory=True)
+    return out
+
+
+def dump(model, data) -> bytes:
+    """Serialize data (documents or model instances) as model to JSON bytes"""
+    item, many = _item_model(model)
+    if trusted and orjson and isinstance(item, type) and issubclass(item, BaseModel):
+        docs = data if many else [data]
+        if all(type(doc) is dict for doc in docs):
+            fields = _fields(item)
+            try:
+                trimmed = [_trim(fields, doc) for doc in docs]
+            except KeyError:
+                pass  # not shaped like the model after all; validate it properly
+            else:
+                return orjson.dumps(trimmed if many else trimmed[0])
+
+    type_adapter = adapter(model)
+    return type_adapter.dump_json(type_adapter.validate_python(data))
+
+
+def respond(model, data, headers: dict = None) -> Response:
+    """Build a ready-to-send JSON response, bypassing response_model re-validation"""
+    return Response(content=dump(model, data), media_type="application/json", headers=headers)
@@ -1,7 +1,6 @@
 from fastapi import FastAPI, APIRouter
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
@@ -17,30 +16,41 @@ from tires import tires_router
 from inspections import inspections_router
 from alerts import alerts_router
 from dashboard import dashboard_router
+from bulk_import import bulk_import_router
+from exports import exports_router
+from reports import reports_router
+from trips import trips_router
+from diagnostics import diagnostics_router, metrics_router
+from search import search_router
+from media import media_router
+from pagination import PAGINATION_HEADERS
+from serialization import FastJSONResponse
+import command_monitor
+import outbound
+import thumbnails
+from metrics import MetricsMiddleware
+import storage
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Inject db into all modules
-import auth, vehicles, maintenance, drivers, fuel, parts, tires, inspections, alerts, dashboard
-auth.db = db
-vehicles.db = db
-maintenance.db = db
-drivers.db = db
-fuel.db = db
-parts.db = db
-tires.db = db
-inspections.db = db
-alerts.db = db
-dashboard.db = db
+# Database connection: MongoDB, or the embedded SQLite store (STORAGE_BACKEND, see storage.py)
+client = storage.connect()
+
+import auth, repository, dashboard, counters, bulk_import, exports, reports, rollups, trips, service_alerts, fuel_analytics, inventory, overview, schedule, search, media
+import indexes
+
+def use_database(database):
+    """Inject database into every module that talks to the database (also used by the benchmarks)"""
+    global db
+    db = database
+    for module in (auth, repository, dashboard, counters, bulk_import, exports, reports, rollups, trips, service_alerts, fuel_analytics, inventory, overview, schedule, search, media):
+        module.db = database
+
+use_database(client[os.environ['DB_NAME']])
 
 # Create the main app without a prefix
-app = FastAPI(title="Fleet Management API", version="1.0.0")
+app = FastAPI(title="Fleet Management API", version="1.0.0", default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -62,9 +72,17 @@ api_router.include_router(tires_router)
 api_router.include_router(inspections_router)
 api_router.include_router(alerts_router)
 api_router.include_router(dashboard_router)
+api_router.include_router(bulk_import_router)
+api_router.include_router(exports_router)
+api_router.include_router(reports_router)
+api_router.include_router(trips_router)
+api_router.include_router(diagnostics_router)
+api_router.include_router(search_router)
+api_router.include_router(media_router)
 
 # Include the router in the main app
 app.include_router(api_router)
+app.include_router(metrics_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -72,8 +90,13 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=PAGINATION_HEADERS + ["ETag", "Accept-Ranges", "Content-Range"],
 )
 
+# Added last so it is outermost and times everything, CORS included
+if os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+    app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -81,6 +104,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_command_monitor():
+    command_monitor.start(db)
+
+@app.on_event("startup")
+async def create_indexes():
+    await indexes.ensure_indexes(db)
+
+@app.on_event("startup")
+async def rebuild_dashboard_counters():
+    # Incremental counters start from the real collection state on every boot
+    if counters.enabled:
+        await counters.rebuild()
+        logger.info("Dashboard status counters rebuilt")
+
+@app.on_event("shutdown")
+async def close_outbound_client():
+    await outbound.close()
+
+@app.on_event("shutdown")
+async def stop_thumbnail_workers():
+    thumbnails.shutdown()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""Service-interval alerting, evaluated whenever a vehicle's mileage changes.
+
+vehicle_service_state keeps, per vehicle, the highest mileage at which each service type
+was last performed, so an evaluation costs O(service types) instead of rescanning the
+vehicle's maintenance history. Rebuild the state and re-evaluate the fleet with:
+
+    python service_alerts.py rebuild
+"""
+from pymongo import UpdateOne
+import os
+import alert_sync
+import counters
+import response_cache
+
+# Database will be injected from server.py
+db = None
+
+STATE_COLLECTION = "vehicle_service_state"
+
+SERVICE_INTERVALS = {
+    "Car": {"oil_change": 5000, "brake_check": 10000, "air_filter": 15000, "major_service": 30000},
+    "Van": {"oil_change": 5000, "brake_check": 10000, "air_filter": 12000, "major_service": 40000},
+    "Bus": {"oil_change": 5000, "brake_check": 10000, "air_filter": 12000, "major_service": 40000},
+    "Truck": {"oil_change": 5000, "brake_check": 10000, "air_filter": 12000, "major_service": 40000},
+}
+
+# Interval key -> label used in alert messages
+SERVICE_LABELS = {
+    "oil_change": "Oil Change",
+    "brake_check": "Brake Check",
+    "air_filter": "Air Filter / Tune Up",
+    "major_service": "Major Service",
+}
+
+# MaintenanceRecord.service_type -> interval key
+RECORD_SERVICE_KEYS = {
+    "Oil Change": "oil_change",
+    "Brake Service": "brake_check",
+    "Brake Check": "brake_check",
+    "Air Filter / Tune Up": "air_filter",
+    "Major Service": "major_service",
+}
+
+SERVICE_DUE_SOON_KM = int(os.environ.get('SERVICE_DUE_SOON_KM', 500))
+EVALUATION_BATCH = 500
+
+
+def mileage_readings(docs: list, field: str) -> dict:
+    """Highest reading of field per vehicle across docs"""
+    readings = {}
+    for doc in docs:
+        vehicle_id, value = doc.get("vehicle_id"), doc.get(field)
+        if vehicle_id and value is not None:
+            readings[vehicle_id] = max(readings.get(vehicle_id, value), value)
+    return readings
+
+
+def _desired_alert(vehicle: dict, service_key: str, last_service_mileage: int):
+    intervals = SERVICE_INTERVALS.get(vehicle.get("type"), SERVICE_INTERVALS["Car"])
+    km_until_due = intervals[service_key] - ((vehicle.get("mileage") or 0) - last_service_mileage)
+    label = SERVICE_LABELS[service_key]
+    if km_until_due <= 0:
+        return "High", f"{vehicle.get('plate')} - {label} is OVERDUE ({abs(km_until_due)} km past due)"
+    if km_until_due <= SERVICE_DUE_SOON_KM:
+        return "Medium", f"{vehicle.get('plate')} - {label} due in {km_until_due} km"
+    return None
+
+
+async def evaluate(vehicle_ids):
+    """Create, refresh or resolve ServiceDue alerts for the given vehicles"""
+    vehicle_ids = list(set(vehicle_ids))
+    if not vehicle_ids:
+        return
+
+    vehicles = await db.vehicles.find(
+        {"vehicle_id": {"$in": vehicle_ids}},
+        {"_id": 0, "vehicle_id": 1, "plate": 1, "type": 1, "mileage": 1}
+    ).to_list(None)
+    states = {}
+    async for state in db[STATE_COLLECTION].find({"_id": {"$in": vehicle_ids}}):
+        states[state["_id"]] = state.get("last_service", {})
+    active = {}
+    async for alert in db.alerts.find(
+        {"vehicle_id": {"$in": vehicle_ids}, "type": "ServiceDue", "status": "Active", "service_type": {"$ne": None}},
+        {"_id": 0}
+    ):
+        active[(alert["vehicle_id"], alert["service_type"])] = alert
+
+    desired = {}
+    for vehicle in vehicles:
+        last_service = states.get(vehicle["vehicle_id"], {})
+        for service_key in SERVICE_LABELS:
+            alert = _desired_alert(vehicle, service_key, last_service.get(service_key, 0))
+            if alert:
+                key = (vehicle["vehicle_id"], service_key)
+                desired[key] = (*alert, {"vehicle_id": vehicle["vehicle_id"], "service_type": service_key})
+    await alert_sync.reconcile(db.alerts, "ServiceDue", active, desired)
+
+
+async def on_mileage_readings(readings: dict):
+    """Advance vehicles.mileage to the given odometer readings and re-evaluate those vehicles"""
+    if not readings:
+        return
+    # $max keeps mileage monotonic even when readings arrive out of order
+    await db.vehicles.bulk_write([
+        UpdateOne({"vehicle_id": vehicle_id}, {"$max": {"mileage": odometer}})
+        for vehicle_id, odometer in readings.items()
+    ], ordered=False)
+    response_cache.bump("vehicles")
+    await evaluate(readings)
+
+
+async def on_services(records: list):
+    """Fold new maintenance records into the service state, then advance mileage and evaluate"""
+    state_updates = {}
+    for record in records:
+        service_key = RECORD_SERVICE_KEYS.get(record.get("service_type"))
+        if service_key and record.get("vehicle_id") and record.get("mileage") is not None:
+            fields = state_updates.setdefault(record["vehicle_id"], {})
+            field = f"last_service.{service_key}"
+            fields[field] = max(fields.get(field, record["mileage"]), record["mileage"])
+
+    if state_updates:
+        await db[STATE_COLLECTION].bulk_write([
+            UpdateOne({"_id": vehicle_id}, {"$max": fields}, upsert=True)
+            for vehicle_id, fields in state_updates.items()
+        ], ordered=False)
+    await on_mileage_readings(mileage_readings(records, "mileage"))
+
+
+async def rebuild_state(vehicle_ids=None) -> int:
+    """Recompute last-service mileages from maintenance_records, for some vehicles or all of them"""
+    match = {"service_type": {"$in": list(RECORD_SERVICE_KEYS)}}
+    if vehicle_ids is not None:
+        match["vehicle_id"] = {"$in": list(vehicle_ids)}
+
+    states = {vehicle_id: {} for vehicle_id in (vehicle_ids or [])}
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": {"vehicle_id": "$vehicle_id", "service_type": "$service_type"}, "mileage": {"$max": "$mileage"}}}
+    ]
+    async for row in db.maintenance_records.aggregate(pipeline):
+        service_key = RECORD_SERVICE_KEYS[row["_id"]["service_type"]]
+        last_service = states.setdefault(row["_id"]["vehicle_id"], {})
+        last_service[service_key] = max(last_service.get(service_key, 0), row["mileage"] or 0)
+
+    # Evaluations keep reading complete state throughout: each vehicle's state is replaced
+    # in place, and only vehicles without service records lose theirs, once the rest are
+    # written. Listed before writing, so state that on_services() creates meanwhile stays.
+    stale = []
+    if vehicle_ids is None:
+        stale = [doc["_id"] async for doc in db[STATE_COLLECTION].find({}, {"_id": 1}) if doc["_id"] not in states]
+    items = list(states.items())
+    for i in range(0, len(items), EVALUATION_BATCH):
+        await db[STATE_COLLECTION].bulk_write([
+            UpdateOne({"_id": vehicle_id}, {"$set": {"last_service": last_service}}, upsert=True)
+            for vehicle_id, last_service in items[i:i + EVALUATION_BATCH]
+        ], ordered=False)
+    for i in range(0, len(stale), EVALUATION_BATCH):
+        await db[STATE_COLLECTION].delete_many({"_id": {"$in": stale[i:i + EVALUATION_BATCH]}})
+    return len(states)
+
+
+async def rebuild() -> dict:
+    """Rebuild all service state and re-evaluate every vehicle"""
+    states = await rebuild_state()
+    evaluated = 0
+    batch = []
+    async for vehicle in db.vehicles.find({}, {"_id": 0, "vehicle_id": 1}):
+        batch.append(vehicle["vehicle_id"])
+        if len(batch) >= EVALUATION_BATCH:
+            await evaluate(batch)
+            evaluated += len(batch)
+            batch = []
+    if batch:
+        await evaluate(batch)
+        evaluated += len(batch)
+    return {"vehicle_states": states, "vehicles_evaluated": evaluated}
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import json
+    from pathlib import Path
+    from dotenv import load_dotenv
+    import storage
+
+    parser = argparse.ArgumentParser(description="Maintain service-due alert state")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = storage.connect()
+    db = client[os.environ['DB_NAME']]
+    counters.db = db
+
+    print(json.dumps(asyncio.run(rebuild())))
@@ -0,0 +1,1025 @@
+"""Embedded storage: the part of Motor's API the app uses, on top of SQLite.
+
+Selected with STORAGE_BACKEND=sqlite (see storage.py) for installs that can't run a
+MongoDB server. SQLiteClient(path)[name] stands in for a Motor database, and its
+collections answer the same calls the routers make: find / find_one / insert_* /
+update_* / replace_one / find_one_and_* / delete_* / count_documents / distinct /
+bulk_write / aggregate / create_indexes. Results, errors (DuplicateKeyError,
+BulkWriteError) and result objects are pymongo's own.
+
+Each collection is a table of (id, doc) rows with the document stored as JSON. Dates,
+ObjectIds and non-finite floats are stored as tagged strings ("$date:2026-01-31T08:00:00.000",
+"$oid:...") so they survive the round trip; tagged dates compare correctly as text, and
+sorts run one query per BSON type bracket so mixed types still come back in MongoDB's
+order (SQLite alone would put dates among the strings). Every declared index becomes an SQLite expression index on json_extract(), with
+unique, sparse and partial indexes mapped to their SQLite equivalents.
+
+Filter conditions on indexed fields (and _id) are translated to SQL, with sort, skip and
+limit following them when nothing is left over; the rest of a filter is checked in
+Python by query_engine. Indexed fields are assumed to hold scalars, as they do
+throughout this app. An aggregation's leading $match and a $group of sums, counts,
+minimums and maximums over plain fields also run as SQL, which covers the dashboard and
+report pipelines; other stages run in query_engine.
+
+Calls run synchronously on the event loop. Against a local file with indexed queries
+they take well under a millisecond, less than handing them to a thread would cost, and
+it makes every call atomic: find_one_and_update can't interleave with another request.
+Iterating a cursor is the exception: it reads CURSOR_BATCH_SIZE documents at a time
+from an open SQLite statement and yields to the loop between batches, so a long scan
+holds neither the whole result nor the loop. Like a MongoDB cursor, it may or may not
+see writes made while it is open.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+from bson import ObjectId
+from bson.errors import InvalidDocument
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+from pymongo.operations import IndexModel
+import asyncio
+import itertools
+import json
+import math
+import re
+import sqlite3
+import time
+import query_engine
+
+# How often expired documents are purged from collections with a TTL index, like mongod's TTL monitor
+TTL_INTERVAL_SECONDS = 60
+# Documents a cursor reads and decodes before letting other requests run
+CURSOR_BATCH_SIZE = 500
+
+_FIELD_PATH = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+_RANGE_SQL = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+# Encoding
+
+def _encode_date(value: datetime) -> str:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    # BSON dates have millisecond precision
+    return "$date:" + value.isoformat(timespec="milliseconds")
+
+
+def _encode(value):
+    """value with every type JSON lacks replaced by its tagged string"""
+    kind = type(value)
+    if kind is str:
+        return "$" + value if value[:1] == "$" else value
+    if kind is dict:
+        return {key: _encode(item) for key, item in value.items()}
+    if kind is list or kind is tuple:
+        return [_encode(item) for item in value]
+    if kind is datetime:
+        return _encode_date(value)
+    if kind is float:
+        return value if math.isfinite(value) else f"$float:{value!r}"
+    if value is None or kind is int or kind is bool:
+        return value
+    if kind is ObjectId:
+        return f"$oid:{value}"
+    # Subclasses: str enums, SON and other mappings
+    if isinstance(value, str):
+        return _encode(str.__str__(value))
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, dict):
+        return _encode(dict(value))
+    raise InvalidDocument(f"cannot encode object: {value!r}, of type: {type(value)!r}")
+
+
+def _decode_tagged(value: str):
+    if value[1:2] == "$":
+        return value[1:]
+    tag, _, body = value[1:].partition(":")
+    if tag == "date":
+        return datetime.fromisoformat(body)
+    if tag == "oid":
+        return ObjectId(body)
+    if tag == "float":
+        return float(body)
+    return value
+
+
+def _decode_list(values: list) -> list:
+    for i, value in enumerate(values):
+        kind = type(value)
+        if kind is str:
+            if value[:1] == "$":
+                values[i] = _decode_tagged(value)
+        elif kind is list:
+            _decode_list(value)
+    return values
+
+
+def _object_hook(obj: dict) -> dict:
+    for key, value in obj.items():
+        kind = type(value)
+        if kind is str:
+            if value[:1] == "$":
+                obj[key] = _decode_tagged(value)
+        elif kind is list:
+            _decode_list(value)
+    return obj
+
+
+def _decode_scalar(value):
+    return _decode_tagged(value) if type(value) is str and value[:1] == "$" else value
+
+
+def _dumps(doc: dict) -> str:
+    return json.dumps(
+        {key: _encode(value) for key, value in doc.items() if key != "_id"},
+        separators=(",", ":"), ensure_ascii=False, allow_nan=False
+    )
+
+
+_decoder = json.JSONDecoder(object_hook=_object_hook)
+
+
+def _load(id_value, text: str) -> dict:
+    doc = _decoder.decode(text)
+    doc["_id"] = _decode_scalar(id_value)
+    return doc
+
+
+# SQL translation
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value) -> str:
+    """An encoded scalar as an SQL literal, for index definitions (which can't take parameters)"""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+def _pushable(value) -> bool:
+    kind = type(value)
+    return kind is str or kind is int or kind is datetime or kind is ObjectId or (kind is float and math.isfinite(value))
+
+
+def _column(field: str) -> str:
+    return "id" if field == "_id" else f"json_extract(doc, '$.{field}')"
+
+
+def _type_bounds(column: str, value, op: str) -> list:
+    """Extra conditions keeping a range inside value's type, since SQLite compares across types.
+
+    Stored values order as NULL < numbers < text; dates are the text starting "$date:",
+    other tagged values sit in the range "$a".."${" and every plain string is outside it.
+    """
+    upper = op in ("$gt", "$gte")
+    if isinstance(value, datetime):
+        return [f"{column} < '$date;'"] if upper else [f"{column} >= '$date:'"]
+    if isinstance(value, str):
+        tagged = f"({column} < '$a' OR {column} >= '${{')"
+        return [tagged] if upper else [f"{column} >= ''", tagged]
+    return [f"{column} < ''"] if upper else []
+
+
+
+def _json_type(field: str):
+    return None if field == "_id" else f"json_type(doc, '$.{field}')"
+
+
+def _brackets(field: str) -> list:
+    """Conditions selecting each BSON type bracket of a field, in MongoDB's ascending sort order.
+
+    Each one is a range on the indexed column, so every bracket is an index scan that
+    SQLite already orders correctly: null, then numbers (NaN, -inf, finite, inf), strings,
+    ObjectIds, booleans (JSON true/false, which SQLite reads as 1/0) and dates.
+    """
+    column = _column(field)
+    json_type = _json_type(field)
+    numbers = f"{column} < ''"
+    booleans = "0"
+    if json_type:
+        numbers += f" AND {json_type} IN ('integer', 'real')"
+        booleans = f"{column} IN (0, 1) AND {json_type} IN ('true', 'false')"
+    return [
+        f"{column} IS NULL",
+        f"{column} = '$float:nan'",
+        f"{column} = '$float:-inf'",
+        numbers,
+        f"{column} = '$float:inf'",
+        f"{column} >= '' AND ({column} < '$a' OR {column} >= '${{')",
+        f"{column} >= '$oid:' AND {column} < '$oid;'",
+        booleans,
+        f"{column} >= '$date:' AND {column} < '$date;'",
+    ]
+
+
+def _bracket_sql(field: str) -> str:
+    """A field's bracket as a number, for ORDER BY terms after the first"""
+    return "CASE " + " ".join(f"WHEN {condition} THEN {rank}" for rank, condition in enumerate(_brackets(field))) + " END"
+
+
+class _AnyField:
+    """Stands in for the indexed-field set when every plain field may be translated"""
+
+    def __contains__(self, field) -> bool:
+        return bool(_FIELD_PATH.match(field))
+
+
+def _field_sql(field: str, condition, bind):
+    """SQL for one field's condition, or None when it has to be checked in Python"""
+    column = _column(field)
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        conditions = condition
+    else:
+        conditions = {"$eq": condition}
+
+    parts = []
+    for op, operand in conditions.items():
+        if op in ("$eq", "$ne"):
+            if operand is None:
+                parts.append(f"{column} IS {'NOT ' if op == '$ne' else ''}NULL")
+            elif not _pushable(operand):
+                return None
+            elif op == "$eq":
+                parts.append(f"{column} = {bind(operand)}")
+            else:
+                parts.append(f"({column} IS NULL OR {column} != {bind(operand)})")
+        elif op in ("$in", "$nin"):
+            if not isinstance(operand, (list, tuple)):
+                return None
+            values = [value for value in operand if value is not None]
+            has_null = len(values) < len(operand)
+            if not all(_pushable(value) for value in values):
+                return None
+            listed = ", ".join(bind(value) for value in values)
+            if op == "$in":
+                sql = f"{column} IN ({listed})" if values else "0"
+                parts.append(f"({sql} OR {column} IS NULL)" if has_null else sql)
+            else:
+                sql = f"{column} NOT IN ({listed})" if values else "1"
+                parts.append(f"({column} IS NOT NULL AND {sql})" if has_null else f"({column} IS NULL OR {sql})")
+        elif op in _RANGE_SQL:
+            if not _pushable(operand) or type(operand) is ObjectId:
+                return None
+            parts.append(f"{column} {_RANGE_SQL[op]} {bind(operand)}")
+            parts.extend(_type_bounds(column, operand, op))
+        else:
+            return None
+    return " AND ".join(parts)
+
+
+def _translate(query: dict, indexed, literal: bool = False):
+    """Split a filter into SQL conditions on indexed fields and a residual filter for Python.
+
+    Returns (clauses, params, residual); with literal, values are inlined instead of bound.
+    """
+    clauses = []
+    params = []
+    residual = {}
+    for key, condition in query.items():
+        if key == "$and":
+            rest = []
+            for part in condition:
+                part_clauses, part_params, part_residual = _translate(part, indexed, literal)
+                clauses.extend(part_clauses)
+                params.extend(part_params)
+                if part_residual:
+                    rest.append(part_residual)
+            if rest:
+                residual["$and"] = rest
+        elif key == "$or":
+            branches = [_translate(part, indexed, literal) for part in condition]
+            if branches and not any(part_residual for _, _, part_residual in branches):
+                clauses.append("(" + " OR ".join(
+                    "(" + (" AND ".join(part_clauses) or "1") + ")" for part_clauses, _, _ in branches
+                ) + ")")
+                for _, part_params, _ in branches:
+                    params.extend(part_params)
+            else:
+                residual[key] = condition
+        elif key.startswith("$") or (key != "_id" and key not in indexed):
+            residual[key] = condition
+        else:
+            field_params = []
+
+            def bind(value):
+                value = _encode(value)
+                if literal:
+                    return _literal(value)
+                field_params.append(value)
+                return "?"
+
+            sql = _field_sql(key, condition, bind)
+            if sql is None:
+                residual[key] = condition
+            else:
+                clauses.append(sql)
+                params.extend(field_params)
+    return clauses, params, residual
+
+
+def _plain_path(expression) -> bool:
+    return isinstance(expression, str) and expression[:1] == "$" and bool(_FIELD_PATH.match(expression[1:]))
+
+
+def _check_update(update: dict):
+    if not update or not all(key.startswith("$") for key in update):
+        raise ValueError("update only works with $ operators")
+
+
+def _check_replacement(replacement: dict):
+    if any(key.startswith("$") for key in replacement):
+        raise ValueError("replacement can not include $ operators")
+
+
+# Cursors
+
+class SQLiteCursor:
+    """What find() returns: sort/skip/limit chain as on a Motor cursor, and the query runs on the first read"""
+
+    def __init__(self, collection, filter: dict, projection=None, sort=None, skip: int = 0, limit: int = 0):
+        self._collection = collection
+        self._filter = filter
+        self._projection = projection
+        self._sort = query_engine.normalize_sort(sort)
+        self._skip = skip
+        self._limit = limit
+        self._batch_size = CURSOR_BATCH_SIZE
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = query_engine.normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int):
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int):
+        self._batch_size = batch_size
+        return self
+
+    def close(self):
+        pass
+
+    async def to_list(self, length=None) -> list:
+        docs = self._collection._find(self._filter, self._projection, self._sort, self._skip, self._limit)
+        return docs[:length] if length else docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        # Read, decode and hand out one batch at a time, letting other requests run in
+        # between, so a long scan (an export, an index load) neither holds the whole
+        # result in memory nor the event loop for its whole length
+        collection = self._collection
+        rows = collection._scan(self._filter, self._sort, self._skip, self._limit)
+        command_name = "find"
+        try:
+            while True:
+                with collection._command(command_name, self._filter):
+                    batch = collection._project(list(itertools.islice(rows, self._batch_size)), self._projection)
+                command_name = "getMore"
+                for doc in batch:
+                    yield doc
+                if len(batch) < self._batch_size:
+                    return
+                await asyncio.sleep(0)
+        finally:
+            rows.close()
+
+
+class SQLiteCommandCursor:
+    """What aggregate() returns"""
+
+    def __init__(self, collection, pipeline: list):
+        self._collection = collection
+        self._pipeline = pipeline
+
+    async def to_list(self, length=None) -> list:
+        docs = self._collection._aggregate(self._pipeline)
+        return docs[:length] if length else docs
+
+    def close(self):
+        pass
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        docs = await self.to_list(None)
+        for start in range(0, len(docs), CURSOR_BATCH_SIZE):
+            if start:
+                await asyncio.sleep(0)
+            for doc in docs[start:start + CURSOR_BATCH_SIZE]:
+                yield doc
+
+
+class _BulkOperations:
+    """Receives pymongo's InsertOne / UpdateOne / ... requests through their _add_to_bulk hook"""
+
+    def __init__(self):
+        self.operations = []
+
+    def add_insert(self, document):
+        self.operations.append(("insert", document))
+
+    def add_update(self, selector, update, multi=False, upsert=False, **kwargs):
+        self.operations.append(("update", selector, update, multi, upsert))
+
+    def add_replace(self, selector, replacement, upsert=False, **kwargs):
+        self.operations.append(("replace", selector, replacement, upsert))
+
+    def add_delete(self, selector, limit, **kwargs):
+        self.operations.append(("delete", selector, limit))
+
+
+# Collections
+
+class SQLiteCollection:
+    def __init__(self, database, name: str):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+        self._client = database.client
+        self._connection = self._client.connection
+        self._table = _quote(self.full_name)
+        self._connection.execute(f"CREATE TABLE IF NOT EXISTS {self._table} (id PRIMARY KEY NOT NULL, doc TEXT NOT NULL)")
+        self._ttl_checked = 0.0
+        self._load_indexes()
+
+    def _load_indexes(self):
+        self._indexes = {
+            name: _decoder.decode(spec)
+            for name, spec in self._connection.execute(
+                "SELECT name, spec FROM _indexes WHERE collection = ? ORDER BY rowid", (self.full_name,)
+            )
+        }
+        self._indexed = {field for spec in self._indexes.values() for field, _ in spec["key"]}
+        self._ttl = [
+            (spec["key"][0][0], spec["expireAfterSeconds"])
+            for spec in self._indexes.values() if spec.get("expireAfterSeconds") is not None
+        ]
+
+    @contextmanager
+    def _command(self, command_name: str, filter=None):
+        started = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self._client._record(self.name, command_name, (time.perf_counter() - started) * 1000, failed, filter)
+
+    @contextmanager
+    def _transaction(self):
+        if self._connection.in_transaction:
+            yield
+            return
+        self._connection.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def _duplicate(self, error: sqlite3.IntegrityError) -> DuplicateKeyError:
+        message = f"E11000 duplicate key error collection: {self.full_name} ({error})"
+        return DuplicateKeyError(message, 11000, {"code": 11000, "errmsg": message})
+
+    # Reads
+
+    def _order_sql(self, sort: list):
+        """ORDER BY terms for sort, or None if a sort field isn't indexed.
+
+        The first field is ordered within one type bracket at a time (see _rows); later
+        fields sort on their bracket first. SQLite reads the first from the index and
+        only sorts runs of equal first values for the rest.
+        """
+        terms = []
+        for i, (field, direction) in enumerate(sort):
+            if field != "_id" and field not in self._indexed:
+                return None
+            order = 'DESC' if direction < 0 else 'ASC'
+            if i:
+                terms.append(f"{_bracket_sql(field)} {order}")
+            terms.append(f"{_column(field)} {order}")
+        return ", ".join(terms)
+
+    def _scan(self, query: dict, sort: list = (), skip: int = 0, limit: int = 0):
+        """(rowid, id, text, doc) for each matching document, in sort order, read as they're consumed"""
+        clauses, params, residual = _translate(query or {}, self._indexed)
+        select = f"SELECT rowid, id, doc FROM {self._table}"
+        sql = select + (" WHERE " + " AND ".join(clauses) if clauses else "")
+        order = self._order_sql(sort)
+        if not residual and order == "":
+            if skip or limit:
+                sql += " LIMIT ? OFFSET ?"
+                params += [limit or -1, skip]
+            yield from self._read(sql, params)
+            return
+        if not residual and order is not None:
+            # SQLite sorts dates among the strings, so read each type bracket in turn
+            brackets = _brackets(sort[0][0])
+            wanted = skip + limit if limit else None
+            seen = 0
+            for bracket in reversed(brackets) if sort[0][1] < 0 else brackets:
+                bracket_sql = f"{select} WHERE {' AND '.join(clauses + [bracket])} ORDER BY {order}"
+                bracket_params = params
+                if wanted:
+                    bracket_sql += " LIMIT ?"
+                    bracket_params = params + [wanted - seen]
+                for row in self._read(bracket_sql, bracket_params):
+                    seen += 1
+                    if seen > skip:
+                        yield row
+                if wanted and seen >= wanted:
+                    return
+            return
+
+        if not sort:
+            # Without a sort to apply afterwards, the scan can stop as soon as the page is full
+            matched = 0
+            for row in self._read(sql, params):
+                if not residual or query_engine.matches(row[3], residual):
+                    matched += 1
+                    if matched > skip:
+                        yield row
+                    if limit and matched >= skip + limit:
+                        return
+            return
+        rows = [row for row in self._read(sql, params) if not residual or query_engine.matches(row[3], residual)]
+        for field, direction in reversed(sort):
+            rows.sort(key=lambda row: query_engine.sort_key(query_engine.get_path(row[3], field)), reverse=direction < 0)
+        yield from rows[skip:skip + limit if limit else None]
+
+    def _read(self, sql: str, params: list):
+        cursor = self._connection.execute(sql, params)
+        try:
+            for rowid, id_value, text in cursor:
+                yield rowid, id_value, text, _load(id_value, text)
+        finally:
+            cursor.close()
+
+    def _rows(self, query: dict, sort: list = (), skip: int = 0, limit: int = 0) -> list:
+        return list(self._scan(query, sort, skip, limit))
+
+    @staticmethod
+    def _project(rows, projection) -> list:
+        if projection == {"_id": 0}:
+            # The usual projection; the documents are fresh, so drop _id in place
+            for _, _, _, doc in rows:
+                del doc["_id"]
+            return [doc for _, _, _, doc in rows]
+        return [query_engine.project(doc, projection) for _, _, _, doc in rows]
+
+    def _find(self, filter: dict, projection, sort: list, skip: int, limit: int) -> list:
+        with self._command("find", filter):
+            return self._project(self._rows(filter, sort, skip, limit), projection)
+
+    def find(self, filter: dict = None, projection=None, sort=None, skip: int = 0, limit: int = 0, **kwargs) -> SQLiteCursor:
+        return SQLiteCursor(self, filter or {}, projection, sort, skip, limit)
+
+    async def find_one(self, filter=None, projection=None, *args, sort=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        docs = self._find(filter or {}, projection, query_engine.normalize_sort(sort), 0, 1)
+        return docs[0] if docs else None
+
+    async def count_documents(self, filter: dict, skip: int = 0, limit: int = 0, **kwargs) -> int:
+        with self._command("count", filter):
+            clauses, params, residual = _translate(filter, self._indexed)
+            if residual or skip or limit:
+                return len(self._rows(filter, skip=skip, limit=limit))
+            sql = f"SELECT COUNT(*) FROM {self._table}" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+            return self._connection.execute(sql, params).fetchone()[0]
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return self._connection.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+
+    async def distinct(self, key: str, filter: dict = None, **kwargs) -> list:
+        with self._command("distinct", filter):
+            seen = set()
+            values = []
+            for _, _, _, doc in self._rows(filter or {}):
+                value = query_engine.get_path(doc, key)
+                for item in (value if isinstance(value, list) else [value]):
+                    marker = query_engine.hashable_key(item)
+                    if item is not None and marker not in seen:
+                        seen.add(marker)
+                        values.append(item)
+            return values
+
+    # Writes
+
+    def _purge_expired(self):
+        if not self._ttl or time.monotonic() - self._ttl_checked < TTL_INTERVAL_SECONDS:
+            return
+        self._ttl_checked = time.monotonic()
+        now = datetime.now(timezone.utc)
+        for field, seconds in self._ttl:
+            column = _column(field)
+            self._connection.execute(
+                f"DELETE FROM {self._table} WHERE {column} >= '$date:' AND {column} < ?",
+                (_encode_date(now - timedelta(seconds=seconds)),)
+            )
+
+    def _insert(self, doc: dict):
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        try:
+            self._connection.execute(f"INSERT INTO {self._table} (id, doc) VALUES (?, ?)", (_encode(doc["_id"]), _dumps(doc)))
+        except sqlite3.IntegrityError as e:
+            raise self._duplicate(e) from None
+
+    def _modify(self, filter: dict, update: dict, multi: bool, upsert: bool, replace: bool = False, sort: list = ()):
+        """Apply update (or replacement) to the matching documents.
+
+        Returns (raw result, (id, text) of the first document before, and after, the write).
+        """
+        rows = self._rows(filter, sort, limit=0 if multi else 1)
+        modified = 0
+        before = after = None
+        for rowid, id_value, text, doc in rows:
+            if replace:
+                if "_id" in update and update["_id"] != doc["_id"]:
+                    raise OperationFailure("The _id field cannot be changed", code=66)
+                doc = {"_id": doc["_id"], **update}
+            else:
+                query_engine.apply_update(doc, update)
+                if _encode(doc.get("_id")) != id_value:
+                    raise OperationFailure("Performing an update on the path '_id' would modify the immutable field '_id'", code=66)
+            new_text = _dumps(doc)
+            if new_text != text:
+                try:
+                    self._connection.execute(f"UPDATE {self._table} SET doc = ? WHERE rowid = ?", (new_text, rowid))
+                except sqlite3.IntegrityError as e:
+                    raise self._duplicate(e) from None
+                modified += 1
+            if before is None:
+                before, after = (id_value, text), (id_value, new_text)
+
+        if rows or not upsert:
+            return {"n": len(rows), "nModified": modified}, before, after
+
+        seed = query_engine.upsert_seed(filter)
+        if replace:
+            doc = {**({"_id": seed["_id"]} if "_id" in seed else {}), **update}
+        else:
+            doc = seed
+            query_engine.apply_update(doc, update, inserting=True)
+        self._insert(doc)
+        return {"n": 1, "nModified": 0, "upserted": doc["_id"]}, None, (_encode(doc["_id"]), _dumps(doc))
+
+    def _delete(self, filter: dict, multi: bool) -> int:
+        clauses, params, residual = _translate(filter, self._indexed)
+        if multi and not residual:
+            sql = f"DELETE FROM {self._table}" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+            return self._connection.execute(sql, params).rowcount
+        rows = self._rows(filter, limit=0 if multi else 1)
+        self._connection.executemany(f"DELETE FROM {self._table} WHERE rowid = ?", [(row[0],) for row in rows])
+        return len(rows)
+
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        with self._command("insert"):
+            self._purge_expired()
+            self._insert(document)
+        return InsertOneResult(document["_id"], True)
+
+    async def insert_many(self, documents, ordered: bool = True, **kwargs) -> InsertManyResult:
+        documents = list(documents)
+        errors = []
+        inserted = 0
+        with self._command("insert"):
+            with self._transaction():
+                self._purge_expired()
+                for index, doc in enumerate(documents):
+                    try:
+                        self._insert(doc)
+                        inserted += 1
+                    except DuplicateKeyError as e:
+                        errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": doc})
+                        if ordered:
+                            break
+            if errors:
+                raise BulkWriteError({
+                    "writeErrors": errors, "writeConcernErrors": [], "nInserted": inserted,
+                    "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [],
+                })
+        return InsertManyResult([doc["_id"] for doc in documents], True)
+
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        _check_update(update)
+        with self._command("update", filter), self._transaction():
+            raw, _, _ = self._modify(filter, update, multi=False, upsert=upsert)
+        return UpdateResult(raw, True)
+
+    async def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        _check_update(update)
+        with self._command("update", filter), self._transaction():
+            raw, _, _ = self._modify(filter, update, multi=True, upsert=upsert)
+        return UpdateResult(raw, True)
+
+    async def replace_one(self, filter: dict, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        _check_replacement(replacement)
+        with self._command("update", filter), self._transaction():
+            raw, _, _ = self._modify(filter, replacement, multi=False, upsert=upsert, replace=True)
+        return UpdateResult(raw, True)
+
+    async def find_one_and_update(self, filter: dict, update: dict, projection=None, sort=None, upsert: bool = False,
+                                  return_document=ReturnDocument.BEFORE, **kwargs):
+        _check_update(update)
+        with self._command("findAndModify", filter), self._transaction():
+            _, before, after = self._modify(filter, update, multi=False, upsert=upsert, sort=query_engine.normalize_sort(sort))
+        chosen = after if return_document == ReturnDocument.AFTER else before
+        return query_engine.project(_load(*chosen), projection) if chosen else None
+
+    async def find_one_and_replace(self, filter: dict, replacement: dict, projection=None, sort=None, upsert: bool = False,
+                                   return_document=ReturnDocument.BEFORE, **kwargs):
+        _check_replacement(replacement)
+        with self._command("findAndModify", filter), self._transaction():
+            _, before, after = self._modify(filter, replacement, multi=False, upsert=upsert, replace=True, sort=query_engine.normalize_sort(sort))
+        chosen = after if return_document == ReturnDocument.AFTER else before
+        return query_engine.project(_load(*chosen), projection) if chosen else None
+
+    async def find_one_and_delete(self, filter: dict, projection=None, sort=None, **kwargs):
+        with self._command("findAndModify", filter):
+            rows = self._rows(filter, query_engine.normalize_sort(sort), limit=1)
+            if not rows:
+                return None
+            self._connection.execute(f"DELETE FROM {self._table} WHERE rowid = ?", (rows[0][0],))
+            return query_engine.project(rows[0][3], projection)
+
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        with self._command("delete", filter):
+            return DeleteResult({"n": self._delete(filter, multi=False)}, True)
+
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        with self._command("delete", filter), self._transaction():
+            return DeleteResult({"n": self._delete(filter, multi=True)}, True)
+
+    async def bulk_write(self, requests, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        bulk = _BulkOperations()
+        for request in requests:
+            request._add_to_bulk(bulk)
+        result = {
+            "writeErrors": [], "writeConcernErrors": [], "nInserted": 0, "nUpserted": 0,
+            "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [],
+        }
+        with self._command("bulkWrite"):
+            with self._transaction():
+                self._purge_expired()
+                for index, (kind, *args) in enumerate(bulk.operations):
+                    try:
+                        if kind == "insert":
+                            self._insert(args[0])
+                            result["nInserted"] += 1
+                        elif kind == "delete":
+                            selector, limit = args
+                            result["nRemoved"] += self._delete(selector, multi=limit == 0)
+                        else:
+                            if kind == "update":
+                                selector, update, multi, upsert = args
+                                _check_update(update)
+                                raw, _, _ = self._modify(selector, update, multi=multi, upsert=upsert)
+                            else:
+                                selector, replacement, upsert = args
+                                _check_replacement(replacement)
+                                raw, _, _ = self._modify(selector, replacement, multi=False, upsert=upsert, replace=True)
+                            if "upserted" in raw:
+                                result["nUpserted"] += 1
+                                result["upserted"].append({"index": index, "_id": raw["upserted"]})
+                            else:
+                                result["nMatched"] += raw["n"]
+                                result["nModified"] += raw["nModified"]
+                    except OperationFailure as e:
+                        result["writeErrors"].append({"index": index, "code": e.code, "errmsg": str(e), "op": args[0]})
+                        if ordered:
+                            break
+            if result["writeErrors"]:
+                raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    # Aggregation
+
+    def aggregate(self, pipeline: list, **kwargs) -> SQLiteCommandCursor:
+        return SQLiteCommandCursor(self, pipeline)
+
+    def _group_sql(self, group: dict, clauses: list, params: list):
+        """Run a $group of sums, counts, averages, minimums and maximums over plain fields as
+        SQL; None when the group needs the Python engine"""
+        key = group["_id"]
+        if key is not None and not _plain_path(key):
+            return None
+        columns = ["NULL" if key is None else _column(key[1:])]
+        names = []
+        for name, accumulator in group.items():
+            if name == "_id":
+                continue
+            if not isinstance(accumulator, dict) or len(accumulator) != 1:
+                return None
+            (op, argument), = accumulator.items()
+            if op == "$sum" and type(argument) in (int, float):
+                columns.append("COUNT(*)" if argument == 1 else f"COUNT(*) * {argument!r}")
+                names.append(name)
+                continue
+            if op == "$sum" and isinstance(argument, dict) and list(argument) == ["$ifNull"] and argument["$ifNull"][1:] == [0]:
+                argument = argument["$ifNull"][0]
+            if not _plain_path(argument):
+                return None
+            value = _column(argument[1:])
+            # $sum and $avg skip non-numeric values; SQLite would coerce them
+            numeric = f"CASE WHEN json_type(doc, '$.{argument[1:]}') IN ('integer', 'real') THEN {value} END"
+            if op == "$sum":
+                columns.append(f"COALESCE(SUM({numeric}), 0)")
+            elif op == "$avg":
+                columns.append(f"AVG({numeric})")
+            elif op in ("$min", "$max"):
+                columns.append(f"{op[1:].upper()}({value})")
+            else:
+                return None
+            names.append(name)
+
+        # Grouping by the first column also yields no rows (as Mongo does) when nothing matched
+        sql = f"SELECT {', '.join(columns)} FROM {self._table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " GROUP BY 1"
+        return [
+            {"_id": _decode_scalar(row[0]), **{name: _decode_scalar(value) for name, value in zip(names, row[1:])}}
+            for row in self._connection.execute(sql, params)
+        ]
+
+    def _index_stats(self) -> list:
+        # SQLite keeps no per-index usage counts
+        stats = [{"name": "_id_", "key": {"_id": 1}, "accesses": {"ops": None, "since": None}}]
+        for name, spec in self._indexes.items():
+            stats.append({"name": name, "key": dict(spec["key"]), "accesses": {"ops": None, "since": None}})
+        return stats
+
+    def _aggregate(self, pipeline: list) -> list:
+        stages = list(pipeline)
+        match = stages[0]["$match"] if stages and "$match" in stages[0] else None
+        with self._command("aggregate", match):
+            if stages and "$indexStats" in stages[0]:
+                return query_engine.run_pipeline(self._index_stats(), stages[1:])
+            if match is not None:
+                stages = stages[1:]
+            clauses, params, residual = _translate(match or {}, self._indexed)
+            if not residual and stages and "$group" in stages[0]:
+                grouped = self._group_sql(stages[0]["$group"], clauses, params)
+                if grouped is not None:
+                    return query_engine.run_pipeline(grouped, stages[1:])
+            return query_engine.run_pipeline((doc for _, _, _, doc in self._rows(match or {})), stages)
+
+    # Indexes
+
+    def _create_index(self, spec: dict) -> str:
+        name = spec["name"]
+        keys = list(spec["key"].items())
+        if not all(_FIELD_PATH.match(field) for field, _ in keys):
+            raise OperationFailure(f"Unsupported index key for the SQLite store: {spec['key']}", code=67)
+        columns = ", ".join(f"{_column(field)}{' DESC' if direction == -1 else ''}" for field, direction in keys)
+        where = []
+        if spec.get("partialFilterExpression"):
+            clauses, _, residual = _translate(spec["partialFilterExpression"], _AnyField(), literal=True)
+            if residual:
+                raise OperationFailure(f"Unsupported partialFilterExpression: {residual}", code=67)
+            where.extend(clauses)
+        if spec.get("sparse"):
+            where.append(f"{_column(keys[0][0])} IS NOT NULL")
+
+        sql = f"CREATE {'UNIQUE ' if spec.get('unique') else ''}INDEX IF NOT EXISTS {_quote(self.full_name + '.' + name)} " \
+              f"ON {self._table} ({columns})"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        try:
+            self._connection.execute(sql)
+        except sqlite3.IntegrityError:
+            raise OperationFailure(
+                f"Index build failed: E11000 duplicate key error collection: {self.full_name} index: {name}", code=11000
+            ) from None
+        stored = {**spec, "key": [[field, direction] for field, direction in keys]}
+        self._connection.execute(
+            "INSERT OR REPLACE INTO _indexes (collection, name, spec) VALUES (?, ?, ?)",
+            (self.full_name, name, json.dumps(_encode(stored)))
+        )
+        self._load_indexes()
+        return name
+
+    async def create_indexes(self, indexes: list, **kwargs) -> list:
+        with self._command("createIndexes"):
+            return [self._create_index(dict(model.document)) for model in indexes]
+
+    async def create_index(self, keys, **kwargs) -> str:
+        return (await self.create_indexes([IndexModel(keys, **kwargs)]))[0]
+
+    async def index_information(self) -> dict:
+        info = {"_id_": {"key": [("_id", 1)]}}
+        for name, spec in self._indexes.items():
+            info[name] = {**{k: v for k, v in spec.items() if k != "name"}, "key": [tuple(key) for key in spec["key"]]}
+        return info
+
+    async def drop(self):
+        self._connection.execute(f"DROP TABLE IF EXISTS {self._table}")
+        self._connection.execute("DELETE FROM _indexes WHERE collection = ?", (self.full_name,))
+        self._connection.execute(f"CREATE TABLE {self._table} (id PRIMARY KEY NOT NULL, doc TEXT NOT NULL)")
+        self._load_indexes()
+
+
+# Databases and the client
+
+class SQLiteDatabase:
+    def __init__(self, client, name: str):
+        self.client = client
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name: str) -> SQLiteCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = SQLiteCollection(self, name)
+        return collection
+
+    def __getattr__(self, name: str) -> SQLiteCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    get_collection = __getitem__
+
+    async def command(self, command, **kwargs) -> dict:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name in ("hello", "isMaster", "ismaster"):
+            # A standalone server as far as callers are concerned: no replica set, no transactions
+            return {"isWritablePrimary": True, "ismaster": True, "ok": 1.0}
+        if name == "ping":
+            return {"ok": 1.0}
+        raise OperationFailure(f"no such command: '{name}'", code=59)
+
+    async def list_collection_names(self, **kwargs) -> list:
+        prefix = self.name + "."
+        return [
+            table[len(prefix):] for table, in self.client.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND substr(name, 1, ?) = ?", (len(prefix), prefix)
+            )
+        ]
+
+    async def drop_collection(self, name: str):
+        await self[name].drop()
+
+
+class SQLiteClient:
+    """Stands in for AsyncIOMotorClient; every database lives in the one SQLite file at path.
+
+    listener is a command_monitor.CommandMonitor, so /diagnostics/db reports the same
+    per-collection latencies on this backend as it does on Mongo.
+    """
+
+    def __init__(self, path: str = ":memory:", listener=None):
+        self.path = path
+        self.listener = listener
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        if path != ":memory:":
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS _indexes (collection TEXT NOT NULL, name TEXT NOT NULL, spec TEXT NOT NULL, "
+            "PRIMARY KEY (collection, name))"
+        )
+        self._databases = {}
+
+    def __getitem__(self, name: str) -> SQLiteDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = SQLiteDatabase(self, name)
+        return database
+
+    get_database = __getitem__
+
+    def _record(self, collection: str, command_name: str, elapsed_ms: float, failed: bool, filter):
+        if self.listener is not None:
+            self.listener.record(collection, command_name, elapsed_ms, failed, filter)
+
+    async def drop_database(self, name):
+        name = getattr(name, "name", name)
+        prefix = name + "."
+        tables = [table for table, in self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND substr(name, 1, ?) = ?", (len(prefix), prefix)
+        )]
+        for table in tables:
+            self.connection.execute(f"DROP TABLE {_quote(table)}")
+        self.connection.execute("DELETE FROM _indexes WHERE substr(collection, 1, ?) = ?", (len(prefix), prefix))
+        if name in self._databases:
+            # Collections recreate their tables when next used
+            self._databases[name]._collections.clear()
+
+    def close(self):
+        self.connection.close()
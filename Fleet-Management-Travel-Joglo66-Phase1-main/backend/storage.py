@@ -0,0 +1,36 @@
+"""Storage backend selection.
+
+The routers use the database through the part of Motor's collection API they need
+(find, find_one, insert_*, update_*, find_one_and_*, delete_*, count_documents,
+bulk_write, aggregate), on the db that server.py injects into each module. Either
+backend provides it:
+
+    STORAGE_BACKEND=mongo   (default) MongoDB through Motor, at MONGO_URL
+    STORAGE_BACKEND=sqlite  the embedded store in sqlite_store.py, in the file at SQLITE_PATH
+                            (":memory:" keeps everything in memory for the life of the process)
+
+The SQLite backend needs no database server, which suits single-depot installs and tests.
+"""
+from pathlib import Path
+import os
+import command_monitor
+
+BACKENDS = ("mongo", "sqlite")
+DEFAULT_SQLITE_PATH = str(Path(__file__).parent / 'fleet.sqlite3')
+
+
+def backend() -> str:
+    name = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
+    if name not in BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND must be one of {', '.join(BACKENDS)}, not {name!r}")
+    return name
+
+
+def connect():
+    """A client for the configured backend; client[DB_NAME] is the app's database"""
+    if backend() == "sqlite":
+        from sqlite_store import SQLiteClient
+        return SQLiteClient(os.environ.get('SQLITE_PATH', DEFAULT_SQLITE_PATH), listener=command_monitor.listener)
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=[command_monitor.listener])
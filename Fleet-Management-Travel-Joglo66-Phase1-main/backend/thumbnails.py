@@ -0,0 +1,59 @@
+"""Image thumbnails rendered in a process pool.
+
+Decoding and resizing a phone photo takes tens of milliseconds of pure CPU, which on
+the event loop would stall every other request. Renders run in a small pool of worker
+processes instead (THUMBNAIL_WORKERS, started on first use with "spawn", which is safe
+in a threaded server); this module imports nothing else from the app, so workers start
+quickly. Rendering needs Pillow; without it thumbnails are reported unavailable and
+uploads still work.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
+import os
+
+try:
+    import PIL
+except ImportError:  # Pillow is optional; only thumbnails need it
+    PIL = None
+
+THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', 320))
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+# Formats Pillow can open that a browser also shows
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+
+_pool = None
+
+
+def available() -> bool:
+    return PIL is not None and THUMBNAIL_WORKERS > 0
+
+
+def _render(source: str, target: str, size: int):
+    """Write a JPEG no larger than size x size of the image at source to target (in a worker)"""
+    from PIL import Image, ImageOps
+    with Image.open(source) as image:
+        image.draft("RGB", (size, size))  # JPEG decodes at a reduced scale, much faster
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        partial = f"{target}.{os.getpid()}.tmp"
+        image.save(partial, "JPEG", quality=80, optimize=True)
+    os.replace(partial, target)
+
+
+async def render(source: str, target: str, size: int = THUMBNAIL_SIZE):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    await asyncio.get_running_loop().run_in_executor(_pool, _render, source, target, size)
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -1,61 +1,65 @@
-from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime, timezone
-import uuid
-from typing import List
-from models import Tire, TireCreate, User
+from fastapi import APIRouter, Depends, Request
+from typing import List, Optional
+from models import Tire, TireCreate, TireUpdate, User
 from auth import get_current_user
+import load_shedding
+import response_cache
+import serialization
+from pagination import PageParams, page_params, paginate, match_fields
+from repository import Repository, patch_fields
 
 
 tires_router = APIRouter(prefix="/tires", tags=["Tires"])
 
-# Database will be injected from server.py
-db = None
+tires = Repository("tires", "tire_id", "tire", "Tire")
+
+async def _apply_update(tire_id: str, fields: dict):
+    updated = await tires.update(tire_id, fields)
+    response_cache.bump("tires")
+    return serialization.respond(Tire, updated)
 
 @tires_router.get("", response_model=List[Tire])
-async def get_tires(current_user: User = Depends(get_current_user)):
-    """Get all tires"""
-    tires = await db.tires.find({}, {"_id": 0}).to_list(1000)
-    return tires
+async def get_tires(
+    request: Request,
+    vehicle_id: Optional[str] = None,
+    status: Optional[str] = None,
+    position: Optional[str] = None,
+    page: PageParams = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    """Get tires, one page at a time"""
+    query = match_fields(vehicle_id=vehicle_id, status=status, position=position)
+    load = lambda response: paginate(tires.collection, query, "tire_id", page, response)
+    return await response_cache.serve(request, "tires", List[Tire], load, load_shedding.heavy_reads)
 
 @tires_router.post("", response_model=Tire)
 async def create_tire(tire: TireCreate, current_user: User = Depends(get_current_user)):
     """Create a new tire record"""
-    tire_id = f"tire_{uuid.uuid4().hex[:12]}"
-    tire_doc = tire.dict()
-    tire_doc["tire_id"] = tire_id
-    tire_doc["created_at"] = datetime.now(timezone.utc)
+    tire_doc = tires.new_doc(tire.dict())
     
-    await db.tires.insert_one(tire_doc)
+    await tires.insert(tire_doc)
+    response_cache.bump("tires")
     
-    return Tire(**tire_doc)
+    return serialization.respond(Tire, tire_doc)
 
 @tires_router.get("/{tire_id}", response_model=Tire)
-async def get_tire(tire_id: str, current_user: User = Depends(get_current_user)):
+async def get_tire(tire_id: str, request: Request, current_user: User = Depends(get_current_user)):
     """Get tire by ID"""
-    tire = await db.tires.find_one({"tire_id": tire_id}, {"_id": 0})
-    if not tire:
-        raise HTTPException(status_code=404, detail="Tire not found")
-    return Tire(**tire)
+    return await response_cache.serve(request, "tires", Tire, lambda response: tires.get(tire_id))
 
 @tires_router.put("/{tire_id}", response_model=Tire)
 async def update_tire(tire_id: str, tire: TireCreate, current_user: User = Depends(get_current_user)):
     """Update tire"""
-    existing = await db.tires.find_one({"tire_id": tire_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Tire not found")
-    
-    await db.tires.update_one(
-        {"tire_id": tire_id},
-        {"$set": tire.dict()}
-    )
-    
-    updated_tire = await db.tires.find_one({"tire_id": tire_id}, {"_id": 0})
-    return Tire(**updated_tire)
+    return await _apply_update(tire_id, tire.dict())
+
+@tires_router.patch("/{tire_id}", response_model=Tire)
+async def patch_tire(tire_id: str, tire: TireUpdate, current_user: User = Depends(get_current_user)):
+    """Update only the tire fields that were sent"""
+    return await _apply_update(tire_id, patch_fields(tire))
 
 @tires_router.delete("/{tire_id}")
 async def delete_tire(tire_id: str, current_user: User = Depends(get_current_user)):
     """Delete tire"""
-    result = await db.tires.delete_one({"tire_id": tire_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Tire not found")
+    await tires.delete(tire_id, projection={"_id": 1})
+    response_cache.bump("tires")
     return {"message": "Tire deleted successfully"}
@@ -0,0 +1,188 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timezone
+from typing import List, Optional
+from models import Trip, TripStart, TripEnd, TripRecord, TripDistance, User
+from auth import get_current_user
+from pagination import PageParams, page_params, page_response, match_fields, date_range
+import load_shedding
+import serialization
+import service_alerts
+from repository import Repository
+
+
+trips_router = APIRouter(prefix="/trips", tags=["Trips"])
+
+# Database will be injected from server.py
+db = None
+
+trips = Repository("trips", "trip_id", "trip", "Trip")
+
+# Completed trips are appended to one bucket document per vehicle per day and per driver per day,
+# so writes are a single $push and distance queries read a handful of bucket documents.
+BUCKET_COLLECTION = "trip_buckets"
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def _day_start(value: datetime) -> datetime:
+    value = _utc(value)
+    return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+
+def build_completed_trip_doc(record: TripRecord) -> dict:
+    """Build the stored document for a trip that is already finished"""
+    trip_doc = trips.new_doc(record.dict())
+    trip_doc["distance"] = record.end_odometer - record.start_odometer
+    trip_doc["status"] = "Completed"
+    trip_doc["created_by"] = None
+    return trip_doc
+
+async def record_completed(trip_docs: list):
+    """Append completed trips to their buckets in one bulk write, then advance vehicle mileage"""
+    buckets = {}
+    for trip in trip_docs:
+        day = _day_start(trip["end_time"])
+        entry = {
+            "trip_id": trip["trip_id"],
+            "vehicle_id": trip["vehicle_id"],
+            "driver_id": trip["driver_id"],
+            "end_time": trip["end_time"],
+            "distance": trip["distance"],
+        }
+        for entity in ("vehicle", "driver"):
+            entity_id = trip[f"{entity}_id"]
+            bucket = buckets.setdefault((entity, entity_id, day), [])
+            bucket.append(entry)
+    
+    if not buckets:
+        return
+    
+    operations = [
+        UpdateOne(
+            {"_id": f"{entity}:{entity_id}:{day:%Y-%m-%d}"},
+            {
+                "$setOnInsert": {"entity": entity, "entity_id": entity_id, "day": day},
+                "$push": {"trips": {"$each": entries}},
+                "$inc": {"count": len(entries), "distance": sum(e["distance"] for e in entries)}
+            },
+            upsert=True
+        )
+        for (entity, entity_id, day), entries in buckets.items()
+    ]
+    await db[BUCKET_COLLECTION].bulk_write(operations, ordered=False)
+    await service_alerts.on_mileage_readings(service_alerts.mileage_readings(trip_docs, "end_odometer"))
+
+@trips_router.get("", response_model=List[Trip])
+async def get_trips(
+    vehicle_id: Optional[str] = None,
+    driver_id: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    """Get trips, one page at a time"""
+    query = match_fields(vehicle_id=vehicle_id, driver_id=driver_id, status=status)
+    query.update(date_range("start_time", date_from, date_to))
+    return await page_response(trips.collection, query, "trip_id", page, Trip)
+
+@trips_router.post("", response_model=Trip)
+async def start_trip(trip: TripStart, current_user: User = Depends(get_current_user)):
+    """Start a trip"""
+    trip_doc = trips.new_doc(trip.dict())
+    trip_doc["start_time"] = trip.start_time or datetime.now(timezone.utc)
+    trip_doc["status"] = "In Progress"
+    trip_doc["end_odometer"] = None
+    trip_doc["end_time"] = None
+    trip_doc["distance"] = None
+    trip_doc["created_by"] = current_user.user_id
+    
+    try:
+        await trips.insert(trip_doc)
+    except DuplicateKeyError:
+        # A partial unique index allows one in-progress trip per vehicle
+        raise HTTPException(status_code=409, detail="Vehicle already has a trip in progress")
+    
+    return serialization.respond(Trip, trip_doc)
+
+@trips_router.get("/distance", response_model=List[TripDistance])
+async def get_trip_distance(
+    vehicle_id: Optional[str] = None,
+    driver_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    group_by: Optional[str] = Query(None, pattern="^day$"),
+    current_user: User = Depends(get_current_user)
+):
+    """Get completed-trip distance for a vehicle, a driver or the fleet over a date range"""
+    # Vehicle buckets cover every trip exactly once, so they also serve fleet-wide totals
+    if driver_id and not vehicle_id:
+        match = {"entity": "driver", "entity_id": driver_id}
+    else:
+        match = {"entity": "vehicle"}
+        if vehicle_id:
+            match["entity_id"] = vehicle_id
+    
+    days = {}
+    if date_from:
+        days["$gte"] = _day_start(date_from)
+    if date_to:
+        days["$lt"] = date_to
+    if days:
+        match["day"] = days
+    
+    # Bucket selection is a day-granular index range; exact bounds are applied to the trips inside
+    trip_match = match_fields(**{"trips.driver_id": driver_id if vehicle_id else None})
+    trip_match.update(date_range("trips.end_time", date_from, date_to))
+    
+    pipeline = [{"$match": match}, {"$unwind": "$trips"}]
+    if trip_match:
+        pipeline.append({"$match": trip_match})
+    pipeline.append({"$group": {
+        "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$day"}} if group_by else None,
+        "trips": {"$sum": 1},
+        "distance": {"$sum": "$trips.distance"}
+    }})
+    pipeline.append({"$sort": {"_id": 1}})
+    
+    with load_shedding.heavy_reads.slot():
+        rows = await db[BUCKET_COLLECTION].aggregate(pipeline).to_list(None)
+    if not rows and not group_by:
+        return [TripDistance(trips=0, distance=0)]
+    return [TripDistance(period=row["_id"], trips=row["trips"], distance=row["distance"]) for row in rows]
+
+@trips_router.get("/{trip_id}", response_model=Trip)
+async def get_trip(trip_id: str, current_user: User = Depends(get_current_user)):
+    """Get trip by ID"""
+    return serialization.respond(Trip, await trips.get(trip_id))
+
+@trips_router.post("/{trip_id}/end", response_model=Trip)
+async def end_trip(trip_id: str, trip_end: TripEnd, current_user: User = Depends(get_current_user)):
+    """End a trip and advance the vehicle's mileage"""
+    existing = await trips.get(trip_id, {"_id": 0, "status": 1, "start_odometer": 1})
+    if existing["status"] != "In Progress":
+        raise HTTPException(status_code=409, detail="Trip already ended")
+    if trip_end.end_odometer < existing["start_odometer"]:
+        raise HTTPException(status_code=400, detail="end_odometer is lower than start_odometer")
+    
+    completion = {
+        "status": "Completed",
+        "end_odometer": trip_end.end_odometer,
+        "end_time": trip_end.end_time or datetime.now(timezone.utc),
+        "distance": trip_end.end_odometer - existing["start_odometer"]
+    }
+    # The status condition makes closing the trip a single atomic transition;
+    # the pre-image plus the completion fields is the stored document
+    previous = await trips.collection.find_one_and_update(
+        {"trip_id": trip_id, "status": "In Progress"},
+        {"$set": completion},
+        projection={"_id": 0}
+    )
+    if not previous:
+        raise HTTPException(status_code=409, detail="Trip already ended")
+    
+    trip = {**previous, **completion}
+    await record_completed([trip])
+    return serialization.respond(Trip, trip)
@@ -1,63 +1,114 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, Depends, Query, Request
 from datetime import datetime, timezone
-import uuid
-from typing import List
-from models import Vehicle, VehicleCreate, User
+from typing import List, Optional
+from models import Vehicle, VehicleCreate, VehicleUpdate, VehicleOverview, DriverAssignment, User
 from auth import get_current_user
+import counters
+import load_shedding
+import overview
+import response_cache
+import schedule
+import search
+import serialization
+import service_alerts
+from pagination import PageParams, page_params, paginate, match_fields
+from repository import Repository, patch_fields
 
 vehicles_router = APIRouter(prefix="/vehicles", tags=["Vehicles"])
 
-# Database will be injected from server.py
-db = None
+vehicles = Repository("vehicles", "vehicle_id", "veh", "Vehicle")
+
+async def _apply_update(vehicle_id: str, fields: dict):
+    previous, updated = await vehicles.update_with_previous(vehicle_id, fields)
+    await counters.record_status_change("vehicles", previous.get("status"), updated.get("status"))
+    response_cache.bump("vehicles")
+    search.index.put("vehicle", updated)
+    if (previous.get("mileage"), previous.get("type")) != (updated.get("mileage"), updated.get("type")):
+        await service_alerts.evaluate([vehicle_id])
+    return serialization.respond(Vehicle, updated)
 
 @vehicles_router.get("", response_model=List[Vehicle])
-async def get_vehicles(current_user: User = Depends(get_current_user)):
-    """Get all vehicles"""
-    vehicles = await db.vehicles.find({}, {"_id": 0}).to_list(1000)
-    return vehicles
+async def get_vehicles(
+    request: Request,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    fuel_type: Optional[str] = None,
+    page: PageParams = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    """Get vehicles, one page at a time"""
+    query = match_fields(status=status, type=type, fuel_type=fuel_type)
+    load = lambda response: paginate(vehicles.collection, query, "vehicle_id", page, response)
+    return await response_cache.serve(request, "vehicles", List[Vehicle], load, load_shedding.heavy_reads)
 
 @vehicles_router.post("", response_model=Vehicle)
 async def create_vehicle(vehicle: VehicleCreate, current_user: User = Depends(get_current_user)):
     """Create a new vehicle"""
-    vehicle_id = f"veh_{uuid.uuid4().hex[:12]}"
-    vehicle_doc = vehicle.dict()
-    vehicle_doc["vehicle_id"] = vehicle_id
+    vehicle_doc = vehicles.new_doc(vehicle.dict())
     vehicle_doc["created_by"] = current_user.user_id
-    vehicle_doc["created_at"] = datetime.now(timezone.utc)
     vehicle_doc["photos"] = []
     vehicle_doc["documents"] = []
     
-    await db.vehicles.insert_one(vehicle_doc)
+    await vehicles.insert(vehicle_doc)
+    await counters.record_insert("vehicles", vehicle_doc["status"])
+    response_cache.bump("vehicles")
+    search.index.put("vehicle", vehicle_doc)
+    await service_alerts.evaluate([vehicle_doc["vehicle_id"]])
     
-    return Vehicle(**vehicle_doc)
+    return serialization.respond(Vehicle, vehicle_doc)
+
+@vehicles_router.get("/available", response_model=List[Vehicle])
+async def get_available_vehicles(
+    start: datetime,
+    end: Optional[datetime] = None,
+    status: Optional[str] = "Active",
+    current_user: User = Depends(get_current_user)
+):
+    """Get vehicles with no driver assignment overlapping [start, end) (open-ended without end)"""
+    busy = await schedule.busy_in_window("vehicle_id", start, end)
+    query = match_fields(status=status)
+    query["vehicle_id"] = {"$nin": sorted(busy)}
+    with load_shedding.heavy_reads.slot():
+        docs = await vehicles.collection.find(query, {"_id": 0}).sort("vehicle_id", 1).to_list(None)
+    return serialization.respond(List[Vehicle], docs)
 
 @vehicles_router.get("/{vehicle_id}", response_model=Vehicle)
-async def get_vehicle(vehicle_id: str, current_user: User = Depends(get_current_user)):
+async def get_vehicle(vehicle_id: str, request: Request, current_user: User = Depends(get_current_user)):
     """Get vehicle by ID"""
-    vehicle = await db.vehicles.find_one({"vehicle_id": vehicle_id}, {"_id": 0})
-    if not vehicle:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    return Vehicle(**vehicle)
+    return await response_cache.serve(request, "vehicles", Vehicle, lambda response: vehicles.get(vehicle_id))
+
+@vehicles_router.get("/{vehicle_id}/overview", response_model=VehicleOverview)
+async def get_vehicle_overview(
+    vehicle_id: str,
+    recent: int = Query(10, ge=1, le=100, description="Newest documents returned per section"),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a vehicle with its recent maintenance, fuel, work orders, inspections, tires, assignments and trips, plus totals"""
+    with load_shedding.heavy_reads.slot():
+        data = await overview.vehicle_overview(vehicle_id, recent)
+    return serialization.respond(VehicleOverview, data)
+
+@vehicles_router.get("/{vehicle_id}/driver", response_model=Optional[DriverAssignment])
+async def get_vehicle_driver(vehicle_id: str, at: Optional[datetime] = None, current_user: User = Depends(get_current_user)):
+    """Get the assignment in force for the vehicle at a time (default now), or null"""
+    current = await schedule.assigned_at("vehicle_id", vehicle_id, at or datetime.now(timezone.utc))
+    return serialization.respond(Optional[DriverAssignment], current)
 
 @vehicles_router.put("/{vehicle_id}", response_model=Vehicle)
 async def update_vehicle(vehicle_id: str, vehicle: VehicleCreate, current_user: User = Depends(get_current_user)):
     """Update vehicle"""
-    existing = await db.vehicles.find_one({"vehicle_id": vehicle_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    
-    await db.vehicles.update_one(
-        {"vehicle_id": vehicle_id},
-        {"$set": vehicle.dict()}
-    )
-    
-    updated_vehicle = await db.vehicles.find_one({"vehicle_id": vehicle_id}, {"_id": 0})
-    return Vehicle(**updated_vehicle)
+    return await _apply_update(vehicle_id, vehicle.dict())
+
+@vehicles_router.patch("/{vehicle_id}", response_model=Vehicle)
+async def patch_vehicle(vehicle_id: str, vehicle: VehicleUpdate, current_user: User = Depends(get_current_user)):
+    """Update only the vehicle fields that were sent"""
+    return await _apply_update(vehicle_id, patch_fields(vehicle))
 
 @vehicles_router.delete("/{vehicle_id}")
 async def delete_vehicle(vehicle_id: str, current_user: User = Depends(get_current_user)):
     """Delete vehicle"""
-    result = await db.vehicles.delete_one({"vehicle_id": vehicle_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
+    deleted = await vehicles.delete(vehicle_id, projection={"status": 1})
+    await counters.record_delete("vehicles", deleted.get("status"))
+    response_cache.bump("vehicles")
+    search.index.remove("vehicle", vehicle_id)
     return {"message": "Vehicle deleted successfully"}
@@ -81,6 +81,21 @@ export const DataProvider = ({ children }) => {
     fetchAllData();
   }, []);
 
+  // Alerts arrive as pushed deltas instead of being polled
+  useEffect(() => {
+    return alertsAPI.subscribe(async (type, alert) => {
+      if (type === 'resync') {
+        const alertsRes = await alertsAPI.getAll().catch(() => null);
+        if (alertsRes) setData(prev => ({ ...prev, alerts: alertsRes.data || [] }));
+        return;
+      }
+      setData(prev => ({
+        ...prev,
+        alerts: [alert, ...prev.alerts.filter(a => a.alert_id !== alert.alert_id)]
+      }));
+    });
+  }, []);
+
   const refreshData = () => {
     fetchAllData();
   };
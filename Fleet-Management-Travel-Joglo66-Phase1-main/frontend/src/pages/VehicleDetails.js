@@ -1,7 +1,8 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import Sidebar from '../components/Sidebar';
-import { mockVehicles, mockMaintenanceRecords, mockFuelLogs, mockTires, mockDriverAssignments, mockDrivers } from '../mock/mockData';
+import { useData } from '../context/DataContext';
+import { vehiclesAPI } from '../services/api';
 import { ArrowLeft, Edit, Trash2, FileText, Calendar, Fuel, Circle, User, TrendingUp } from 'lucide-react';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
@@ -12,7 +13,32 @@ import { format } from 'date-fns';
 const VehicleDetails = () => {
   const { id } = useParams();
   const navigate = useNavigate();
-  const [vehicle] = useState(mockVehicles.find(v => v.vehicle_id === id));
+  const { data } = useData();
+  const [overview, setOverview] = useState(null);
+  const [loading, setLoading] = useState(true);
+
+  useEffect(() => {
+    let cancelled = false;
+    setLoading(true);
+    vehiclesAPI.getOverview(id)
+      .then((response) => { if (!cancelled) setOverview(response.data); })
+      .catch(() => { if (!cancelled) setOverview(null); })
+      .finally(() => { if (!cancelled) setLoading(false); });
+    return () => { cancelled = true; };
+  }, [id]);
+
+  if (loading) {
+    return (
+      <div className="flex min-h-screen bg-gray-50">
+        <Sidebar />
+        <div className="flex-1 lg:ml-64 flex items-center justify-center">
+          <p className="text-gray-500">Loading vehicle...</p>
+        </div>
+      </div>
+    );
+  }
+
+  const vehicle = overview?.vehicle;
   
   if (!vehicle) {
     return (
@@ -30,12 +56,12 @@ const VehicleDetails = () => {
     );
   }
 
-  const maintenanceHistory = mockMaintenanceRecords.filter(m => m.vehicle_id === id);
-  const fuelHistory = mockFuelLogs.filter(f => f.vehicle_id === id);
-  const tireHistory = mockTires.filter(t => t.vehicle_id === id);
-  const assignments = mockDriverAssignments.filter(a => a.vehicle_id === id);
+  const maintenanceHistory = overview.maintenance_records;
+  const fuelHistory = overview.fuel_logs;
+  const tireHistory = overview.tires;
+  const assignments = overview.assignments;
   const currentDriver = assignments.find(a => !a.end_date);
-  const driverInfo = currentDriver ? mockDrivers.find(d => d.driver_id === currentDriver.driver_id) : null;
+  const driverInfo = currentDriver ? data.drivers.find(d => d.driver_id === currentDriver.driver_id) : null;
 
   const getStatusColor = (status) => {
     switch (status) {
@@ -205,7 +231,7 @@ const VehicleDetails = () => {
                 <CardContent>
                   <div className="space-y-4">
                     {fuelHistory.map((log) => {
-                      const driver = mockDrivers.find(d => d.driver_id === log.driver_id);
+                      const driver = data.drivers.find(d => d.driver_id === log.driver_id);
                       return (
                         <div key={log.log_id} className="p-4 border rounded-lg hover:bg-gray-50 transition-colors">
                           <div className="flex items-start justify-between">
@@ -30,6 +30,71 @@ api.interceptors.response.use(
   }
 );
 
+// List endpoints are paginated; follow the X-Next-Cursor header until exhausted
+const getAllPages = async (url) => {
+  const items = [];
+  let cursor = null;
+  let response;
+  do {
+    response = await api.get(url, { params: cursor ? { cursor } : {} });
+    items.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return { ...response, data: items };
+};
+
+// Server-Sent Events over fetch, so the bearer token can be sent; reconnects with Last-Event-ID
+const subscribeEvents = (url, onEvent) => {
+  const controller = new AbortController();
+  let lastEventId = null;
+  let retry = 3000;
+
+  const dispatch = (block) => {
+    let type = 'message';
+    const data = [];
+    block.split('\n').forEach((line) => {
+      const [field, ...rest] = line.split(':');
+      const value = rest.join(':').replace(/^ /, '');
+      if (field === 'id') lastEventId = value;
+      else if (field === 'event') type = value;
+      else if (field === 'data') data.push(value);
+      else if (field === 'retry') retry = Number(value) || retry;
+    });
+    if (data.length) onEvent(type, JSON.parse(data.join('\n')));
+  };
+
+  const connect = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const headers = { Accept: 'text/event-stream' };
+        const token = localStorage.getItem('auth_token');
+        if (token) headers.Authorization = `Bearer ${token}`;
+        if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+
+        const response = await fetch(`${API_BASE_URL}${url}`, { headers, signal: controller.signal });
+        if (!response.ok) throw new Error(`Event stream failed with ${response.status}`);
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          const blocks = buffer.split('\n\n');
+          buffer = blocks.pop();
+          blocks.forEach(dispatch);
+        }
+      } catch (err) {
+        if (controller.signal.aborted) return;
+      }
+      await new Promise((resolve) => setTimeout(resolve, retry));
+    }
+  };
+
+  connect();
+  return () => controller.abort();
+};
+
 // Auth API
 export const authAPI = {
   login: (credentials) => api.post('/auth/login', credentials),
@@ -39,44 +104,50 @@ export const authAPI = {
 
 // Drivers API
 export const driversAPI = {
-  getAll: () => api.get('/drivers'),
+  getAll: () => getAllPages('/drivers'),
   getById: (id) => api.get(`/drivers/${id}`),
   create: (data) => api.post('/drivers', data),
   update: (id, data) => api.put(`/drivers/${id}`, data),
+  patch: (id, data) => api.patch(`/drivers/${id}`, data),
   delete: (id) => api.delete(`/drivers/${id}`),
   getAssignments: (id) => api.get(`/drivers/${id}/assignments`),
 };
 
 // Vehicles API
 export const vehiclesAPI = {
-  getAll: () => api.get('/vehicles'),
+  getAll: () => getAllPages('/vehicles'),
   getById: (id) => api.get(`/vehicles/${id}`),
   create: (data) => api.post('/vehicles', data),
   update: (id, data) => api.put(`/vehicles/${id}`, data),
+  patch: (id, data) => api.patch(`/vehicles/${id}`, data),
   delete: (id) => api.delete(`/vehicles/${id}`),
+  // The vehicle with its recent history and totals, in one request
+  getOverview: (id, params) => api.get(`/vehicles/${id}/overview`, { params }),
 };
 
 // Parts API
 export const partsAPI = {
-  getAll: () => api.get('/parts'),
+  getAll: () => getAllPages('/parts'),
   getById: (id) => api.get(`/parts/${id}`),
   create: (data) => api.post('/parts', data),
   update: (id, data) => api.put(`/parts/${id}`, data),
+  patch: (id, data) => api.patch(`/parts/${id}`, data),
   delete: (id) => api.delete(`/parts/${id}`),
 };
 
 // Tires API
 export const tiresAPI = {
-  getAll: () => api.get('/tires'),
+  getAll: () => getAllPages('/tires'),
   getById: (id) => api.get(`/tires/${id}`),
   create: (data) => api.post('/tires', data),
   update: (id, data) => api.put(`/tires/${id}`, data),
+  patch: (id, data) => api.patch(`/tires/${id}`, data),
   delete: (id) => api.delete(`/tires/${id}`),
 };
 
 // Maintenance API
 export const maintenanceAPI = {
-  getAll: () => api.get('/maintenance'),
+  getAll: () => getAllPages('/maintenance'),
   getById: (id) => api.get(`/maintenance/${id}`),
   create: (data) => api.post('/maintenance', data),
   update: (id, data) => api.put(`/maintenance/${id}`, data),
@@ -85,28 +156,31 @@ export const maintenanceAPI = {
 
 // Work Orders API
 export const workOrdersAPI = {
-  getAll: () => api.get('/work-orders'),
+  getAll: () => getAllPages('/work-orders'),
   getById: (id) => api.get(`/work-orders/${id}`),
   create: (data) => api.post('/work-orders', data),
   update: (id, data) => api.put(`/work-orders/${id}`, data),
+  patch: (id, data) => api.patch(`/work-orders/${id}`, data),
   delete: (id) => api.delete(`/work-orders/${id}`),
 };
 
 // Fuel API
 export const fuelAPI = {
-  getAll: () => api.get('/fuel'),
+  getAll: () => getAllPages('/fuel'),
   getById: (id) => api.get(`/fuel/${id}`),
   create: (data) => api.post('/fuel', data),
   delete: (id) => api.delete(`/fuel/${id}`),
+  getEfficiency: (params) => api.get('/fuel/efficiency', { params }),
 };
 
 // Alerts API
 export const alertsAPI = {
-  getAll: () => api.get('/alerts'),
+  getAll: () => getAllPages('/alerts'),
   getById: (id) => api.get(`/alerts/${id}`),
   create: (data) => api.post('/alerts', data),
   markAsDone: (id) => api.put(`/alerts/${id}/mark-done`),
   delete: (id) => api.delete(`/alerts/${id}`),
+  subscribe: (onEvent) => subscribeEvents('/alerts/stream', onEvent),
 };
 
 // Dashboard API
@@ -114,13 +188,50 @@ export const dashboardAPI = {
   getStats: () => api.get('/dashboard/stats'),
 };
 
+// Trips API
+export const tripsAPI = {
+  getAll: (params) => api.get('/trips', { params }),
+  getById: (id) => api.get(`/trips/${id}`),
+  start: (data) => api.post('/trips', data),
+  end: (id, data) => api.post(`/trips/${id}/end`, data),
+  getDistance: (params) => api.get('/trips/distance', { params }),
+};
+
+// Reports API
+export const reportsAPI = {
+  getVehicles: (params) => api.get('/reports/vehicles', { params }),
+  getTCO: (params) => api.get('/reports/tco', { params }),
+  getFuelEfficiency: (params) => api.get('/reports/fuel-efficiency', { params }),
+  getReliability: (params) => api.get('/reports/reliability', { params }),
+  getDowntime: (params) => api.get('/reports/downtime', { params }),
+  getMonthly: (params) => api.get('/reports/monthly', { params }),
+};
+
 // Inspections API
 export const inspectionsAPI = {
-  getAll: () => api.get('/inspections'),
+  getAll: () => getAllPages('/inspections'),
   getById: (id) => api.get(`/inspections/${id}`),
   create: (data) => api.post('/inspections', data),
   update: (id, data) => api.put(`/inspections/${id}`, data),
+  patch: (id, data) => api.patch(`/inspections/${id}`, data),
   delete: (id) => api.delete(`/inspections/${id}`),
 };
 
+// Media API (photos, documents, receipts)
+export const mediaAPI = {
+  getForOwner: (ownerType, ownerId) => api.get('/media', { params: { owner_type: ownerType, owner_id: ownerId } }),
+  getById: (id) => api.get(`/media/${id}`),
+  upload: (ownerType, ownerId, kind, file, onUploadProgress) => {
+    const form = new FormData();
+    form.append('file', file);
+    return api.post('/media', form, { params: { owner_type: ownerType, owner_id: ownerId, kind }, onUploadProgress });
+  },
+  delete: (id) => api.delete(`/media/${id}`),
+};
+
+// Search API
+export const searchAPI = {
+  query: (q, params) => api.get('/search', { params: { q, ...params } }),
+};
+
 export default api;
@@ -0,0 +1,69 @@
+"""Shared fixtures: the real app on a fresh in-memory SQLite store per test.
+
+Requests go through httpx.ASGITransport straight into the FastAPI app, and logins go
+to the in-process stub provider (auth_stub.py), so the suite needs neither a mongod
+nor network access. Run from the project root with `python -m pytest tests`.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Configuration is read at import time, so it has to be in place before the app loads
+os.environ["STORAGE_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = ":memory:"
+os.environ["DB_NAME"] = "fleet_test"
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["AUTH_PROVIDER"] = "stub"
+os.environ["MEDIA_ROOT"] = tempfile.mkdtemp(prefix="fleet-media-")
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx
+import pytest
+
+import auth
+import command_monitor
+import dashboard
+import response_cache
+import schedule
+import search
+import server
+from sqlite_store import SQLiteClient
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    """A fresh database injected into every module, with indexes and counters set up"""
+    client = SQLiteClient(":memory:", listener=command_monitor.listener)
+    database = client[os.environ["DB_NAME"]]
+    server.use_database(database)
+
+    # Process-wide caches and indexes would otherwise leak between tests
+    response_cache.response_cache.clear()
+    auth.session_cache.clear()
+    dashboard._stats_cache.clear()
+    search.index = search.SearchIndex()
+    schedule.index = schedule.AssignmentIndex()
+
+    for handler in server.app.router.on_startup:
+        await handler()
+    yield database
+    client.close()
+
+
+@pytest.fixture
+async def client(db):
+    """An API client logged in through the stub auth provider"""
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test/api") as http_client:
+        response = await http_client.post("/auth/session", json={"session_id": "tester@example.com"})
+        assert response.status_code == 200, response.text
+        http_client.headers["Authorization"] = f"Bearer {response.cookies['session_token']}"
+        yield http_client
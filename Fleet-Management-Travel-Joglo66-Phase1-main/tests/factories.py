@@ -0,0 +1,41 @@
+"""Create documents through the API, with just enough fields to be valid"""
+import itertools
+
+_sequence = itertools.count(1)
+
+
+async def create_vehicle(client, **fields) -> dict:
+    n = next(_sequence)
+    body = {
+        "plate": f"AB {1000 + n} XY", "brand": "Toyota", "model": "Avanza", "type": "Car", "year": 2020,
+        "fuel_type": "Petrol", "ownership_status": "Owned", **fields
+    }
+    response = await client.post("/vehicles", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def create_driver(client, **fields) -> dict:
+    n = next(_sequence)
+    body = {"name": f"Driver {n}", "license_number": f"SIM-{n}", "license_expiry": "2030-01-31", "phone": "0812", **fields}
+    response = await client.post("/drivers", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def create_part(client, **fields) -> dict:
+    n = next(_sequence)
+    body = {"name": f"Part {n}", "part_number": f"PN-{n}", "quantity": 10, "min_stock": 1, "cost": 25.0, **fields}
+    response = await client.post("/parts", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def create_fuel_log(client, vehicle_id: str, driver_id: str, **fields) -> dict:
+    body = {
+        "vehicle_id": vehicle_id, "driver_id": driver_id, "date": "2026-01-01T08:00:00Z",
+        "quantity": 40, "cost": 400000, "odometer": 1000, "fuel_type": "Petrol", **fields
+    }
+    response = await client.post("/fuel", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()
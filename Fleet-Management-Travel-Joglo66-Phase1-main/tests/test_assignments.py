@@ -0,0 +1,124 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import schedule
+from tests.factories import create_driver, create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def _assign(client, driver_id: str, vehicle_id: str, start: str, end: str = None):
+    body = {"vehicle_id": vehicle_id, "driver_id": driver_id, "start_date": start, "end_date": end}
+    return await client.post(f"/drivers/{driver_id}/assignments", json=body)
+
+
+async def test_overlapping_assignment_is_rejected(client):
+    vehicle = await create_vehicle(client)
+    first, second = await create_driver(client), await create_driver(client)
+    response = await _assign(client, first["driver_id"], vehicle["vehicle_id"], "2026-01-01T00:00:00Z", "2026-01-10T00:00:00Z")
+    assert response.status_code == 200, response.text
+
+    # Same vehicle, window overlapping the first assignment
+    overlapping = await _assign(client, second["driver_id"], vehicle["vehicle_id"], "2026-01-05T00:00:00Z", "2026-01-20T00:00:00Z")
+    assert overlapping.status_code == 409
+    assert response.json()["assignment_id"] in overlapping.json()["detail"]
+
+    # Same driver, other vehicle, open-ended from before the first one ends
+    other = await create_vehicle(client)
+    open_ended = await _assign(client, first["driver_id"], other["vehicle_id"], "2026-01-09T00:00:00Z")
+    assert open_ended.status_code == 409
+
+
+async def test_back_to_back_assignments_are_allowed(client):
+    vehicle = await create_vehicle(client)
+    first, second = await create_driver(client), await create_driver(client)
+    await _assign(client, first["driver_id"], vehicle["vehicle_id"], "2026-01-01T00:00:00Z", "2026-01-10T00:00:00Z")
+
+    # Assignments cover [start, end), so the next one may start where the last one ends
+    response = await _assign(client, second["driver_id"], vehicle["vehicle_id"], "2026-01-10T00:00:00Z")
+    assert response.status_code == 200, response.text
+
+    current = await client.get(f"/vehicles/{vehicle['vehicle_id']}/driver", params={"at": "2026-01-15T00:00:00Z"})
+    assert current.json()["driver_id"] == second["driver_id"]
+    earlier = await client.get(f"/vehicles/{vehicle['vehicle_id']}/driver", params={"at": "2026-01-05T00:00:00Z"})
+    assert earlier.json()["driver_id"] == first["driver_id"]
+
+
+async def test_available_vehicles_exclude_busy_ones(client):
+    busy, free = await create_vehicle(client), await create_vehicle(client)
+    driver = await create_driver(client)
+    await _assign(client, driver["driver_id"], busy["vehicle_id"], "2026-02-01T00:00:00Z", "2026-02-05T00:00:00Z")
+
+    response = await client.get("/vehicles/available", params={"start": "2026-02-03T00:00:00Z", "end": "2026-02-04T00:00:00Z"})
+
+    assert [vehicle["vehicle_id"] for vehicle in response.json()] == [free["vehicle_id"]]
+
+
+async def test_mixed_offset_dates_are_compared_in_utc(client):
+    vehicle, driver = await create_vehicle(client), await create_driver(client)
+
+    # A naive end date is UTC, so it is checked against the offset-aware start instead of raising
+    backwards = await _assign(client, driver["driver_id"], vehicle["vehicle_id"], "2026-01-01T07:00:00+07:00", "2025-12-31T23:00:00")
+    assert backwards.status_code == 422
+
+    response = await _assign(client, driver["driver_id"], vehicle["vehicle_id"], "2026-01-01T00:00:00Z", "2026-02-01T00:00:00")
+    assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize("reload", [False, True])
+async def test_assignments_created_during_an_index_load_are_kept(client, monkeypatch, reload):
+    vehicle, driver = await create_vehicle(client), await create_driver(client)
+    if reload:
+        await client.get("/vehicles/available", params={"start": "2026-03-01T00:00:00Z"})
+        monkeypatch.setattr(schedule, "ASSIGNMENT_INDEX_TTL", 0)
+    database = schedule.db
+    collection = database[schedule.COLLECTION]
+
+    async def scan_then_assign(cursor):
+        async for doc in cursor:
+            yield doc
+        # The load has read every assignment; this one lands before it swaps its index in
+        response = await _assign(client, driver["driver_id"], vehicle["vehicle_id"], "2026-03-01T00:00:00Z")
+        assert response.status_code == 200, response.text
+        monkeypatch.setattr(schedule, "ASSIGNMENT_INDEX_TTL", 60)
+
+    class ScanningCollection:
+        def __getattr__(self, name):
+            return getattr(collection, name)
+
+        def find(self, query, *args, **kwargs):
+            cursor = collection.find(query, *args, **kwargs)
+            if query:
+                return cursor
+            return SimpleNamespace(sort=lambda *sort: scan_then_assign(cursor.sort(*sort)))
+
+    class ScanningDatabase:
+        def __getitem__(self, name):
+            return ScanningCollection() if name == schedule.COLLECTION else database[name]
+
+    monkeypatch.setattr(schedule, "db", ScanningDatabase())
+
+    available = await client.get("/vehicles/available", params={"start": "2026-03-02T00:00:00Z"})
+    assert vehicle["vehicle_id"] not in [item["vehicle_id"] for item in available.json()]
+    current = await client.get(f"/vehicles/{vehicle['vehicle_id']}/driver", params={"at": "2026-03-02T00:00:00Z"})
+    assert current.json()["driver_id"] == driver["driver_id"]
+
+
+async def test_overlaps_already_in_the_data_are_found(client, db):
+    vehicle, driver = await create_vehicle(client), await create_driver(client)
+    # Written before overlaps were rejected: an open-ended assignment and a closed one inside it
+    await db.driver_assignments.insert_many([
+        {"assignment_id": f"asn_old{n}", "vehicle_id": vehicle["vehicle_id"], "driver_id": f"drv_old{n}",
+         "start_date": start, "end_date": end, "created_at": start}
+        for n, (start, end) in enumerate([
+            (datetime(2025, 1, 1), None),
+            (datetime(2025, 6, 1), datetime(2025, 7, 1)),
+        ])
+    ])
+
+    response = await _assign(client, driver["driver_id"], vehicle["vehicle_id"], "2025-09-01T00:00:00Z", "2025-10-01T00:00:00Z")
+
+    assert response.status_code == 409
+    assert "asn_old0" in response.json()["detail"]
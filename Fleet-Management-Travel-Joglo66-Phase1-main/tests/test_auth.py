@@ -0,0 +1,93 @@
+import pytest
+
+import auth
+import command_monitor
+import outbound
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_sessions_are_served_from_the_cache(client):
+    auth.session_cache.clear()
+    before = auth.session_cache.stats()
+    for _ in range(3):
+        response = await client.get("/auth/me")
+        assert response.status_code == 200, response.text
+        assert response.json()["email"] == "tester@example.com"
+
+    stats = (await client.get("/auth/session-cache/stats")).json()
+    # The stats request itself is a hit too
+    assert (stats["misses"] - before["misses"], stats["hits"] - before["hits"]) == (1, 3)
+
+
+async def test_unknown_tokens_are_rejected(client):
+    response = await client.get("/auth/me", headers={"Authorization": "Bearer stub_unknown"})
+    assert response.status_code == 401
+
+
+async def test_logout_takes_effect_at_once(client, monkeypatch):
+    database = auth.db
+    sessions = database.user_sessions
+
+    class RacingSessions:
+        """Lets a request that misses the cache look the session up just as logout deletes it"""
+
+        def __getattr__(self, name):
+            return getattr(sessions, name)
+
+        async def delete_one(self, *args, **kwargs):
+            auth.session_cache.clear()
+            assert (await client.get("/auth/me")).status_code == 200
+            return await sessions.delete_one(*args, **kwargs)
+
+    class Database:
+        user_sessions = RacingSessions()
+
+        def __getattr__(self, name):
+            return database[name]
+
+    monkeypatch.setattr(auth, "db", Database())
+
+    assert (await client.post("/auth/logout")).status_code == 200
+    assert (await client.get("/auth/me")).status_code == 401
+
+
+def _user_commands() -> dict:
+    return {name: histogram.count for (collection, name), histogram in command_monitor.listener.histograms.items() if collection == "users"}
+
+
+async def test_login_upserts_the_user_in_one_write(client, db):
+    before = _user_commands()
+    http_client = outbound.client()
+
+    response = await client.post("/auth/session", json={"session_id": "new.driver@example.com"})
+
+    assert response.status_code == 200, response.text
+    user = response.json()["user"]
+    assert (user["email"], user["name"], user["role"]) == ("new.driver@example.com", "New Driver", "Admin")
+    after = _user_commands()
+    assert {name: after[name] - before.get(name, 0) for name in after if after[name] != before.get(name, 0)} == {"findAndModify": 1}
+    # Every login goes over the same pooled client
+    assert outbound.client() is http_client
+
+    # Logging in again keeps the user's id and anything changed since, like the role
+    await db.users.update_one({"email": "new.driver@example.com"}, {"$set": {"role": "Viewer"}})
+    again = (await client.post("/auth/session", json={"session_id": "new.driver@example.com"})).json()["user"]
+    assert (again["user_id"], again["role"]) == (user["user_id"], "Viewer")
+    assert await db.users.count_documents({"email": "new.driver@example.com"}) == 1
+
+
+async def test_sessions_the_provider_rejects_are_400(client):
+    response = await client.post("/auth/session", json={"session_id": "invalid-session"})
+    assert response.status_code == 400
+
+
+async def test_outbound_client_is_closed_and_recreated():
+    first = outbound.client()
+    with pytest.raises(RuntimeError):
+        outbound.mount("https://elsewhere.example", outbound.client()._transport)
+
+    await outbound.close()
+
+    assert first.is_closed
+    assert outbound.client() is not first
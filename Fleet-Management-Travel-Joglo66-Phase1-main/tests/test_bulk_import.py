@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from tests.factories import create_driver, create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+def _fuel_row(vehicle_id: str, driver_id: str, odometer: int, **fields) -> dict:
+    return {
+        "vehicle_id": vehicle_id, "driver_id": driver_id, "date": f"2026-01-{odometer // 100:02d}T08:00:00Z",
+        "quantity": 30, "cost": 300000, "odometer": odometer, "fuel_type": "Petrol", **fields
+    }
+
+
+async def test_ndjson_import_reports_bad_rows_and_keeps_good_ones(client):
+    vehicle, driver = await create_vehicle(client), await create_driver(client)
+    lines = [
+        json.dumps(_fuel_row(vehicle["vehicle_id"], driver["driver_id"], 100)),
+        "{not json",
+        json.dumps({"vehicle_id": vehicle["vehicle_id"]}),
+        "[1, 2]",
+        "",
+        json.dumps(_fuel_row(vehicle["vehicle_id"], driver["driver_id"], 400)),
+    ]
+
+    response = await client.post("/import/fuel", content="\n".join(lines), headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["received"], report["inserted"], report["failed"]) == (5, 2, 3)
+    assert [error["row"] for error in report["errors"]] == [2, 3, 4]
+    assert report["errors"][0]["errors"][0].startswith("Invalid JSON")
+    assert {error["loc"][0] for error in report["errors"][1]["errors"]} >= {"driver_id", "odometer"}
+
+    logs = (await client.get("/fuel", params={"vehicle_id": vehicle["vehicle_id"]})).json()
+    assert sorted(log["odometer"] for log in logs) == [100, 400]
+
+
+async def test_csv_import(client):
+    vehicle, driver = await create_vehicle(client), await create_driver(client)
+    rows = [
+        "vehicle_id,driver_id,date,quantity,cost,odometer,fuel_type",
+        f"{vehicle['vehicle_id']},{driver['driver_id']},2026-01-01T08:00:00Z,30,300000,1000,Petrol",
+        f"{vehicle['vehicle_id']},{driver['driver_id']},2026-01-05T08:00:00Z,20,200000,1300,Petrol",
+    ]
+
+    response = await client.post("/import/fuel", content="\n".join(rows), headers={"Content-Type": "text/csv"})
+
+    assert response.json()["inserted"] == 2
+    logs = {log["odometer"]: log for log in (await client.get("/fuel", params={"vehicle_id": vehicle["vehicle_id"]})).json()}
+    assert logs[1000]["distance"] is None
+    assert (logs[1300]["distance"], logs[1300]["km_per_l"]) == (300, 15)
+
+
+async def test_invalid_utf8_is_a_row_error(client):
+    vehicle, driver = await create_vehicle(client), await create_driver(client)
+    good = json.dumps(_fuel_row(vehicle["vehicle_id"], driver["driver_id"], 100)).encode()
+    body = b"\n".join([good, b'{"vehicle_id": "\xff\xfe"}', good.replace(b"100", b"200")])
+
+    response = await client.post("/import/fuel", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["received"], report["inserted"], report["failed"]) == (3, 2, 1)
+    assert report["errors"][0]["row"] == 2
+    assert report["errors"][0]["errors"][0].startswith("Invalid UTF-8")
+
+    header = b"vehicle_id,driver_id,date,quantity,cost,odometer,fuel_type"
+    row = f"{vehicle['vehicle_id']},{driver['driver_id']},2026-01-09T08:00:00Z,30,300000,900,Petrol".encode()
+    csv_body = b"\n".join([header, b"caf\xe9,\xe9", row])
+
+    response = await client.post("/import/fuel", content=csv_body, headers={"Content-Type": "text/csv"})
+
+    assert (response.json()["inserted"], response.json()["failed"]) == (1, 1)
@@ -0,0 +1,35 @@
+import pytest
+
+import counters
+from tests.factories import create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def _order(client, vehicle_id: str, status: str) -> dict:
+    body = {"vehicle_id": vehicle_id, "priority": "Low", "description": "Check", "scheduled_date": "2026-01-10T08:00:00Z", "status": status}
+    response = await client.post("/work-orders", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_maintained_counters_match_a_recount(client, db, monkeypatch):
+    monkeypatch.setattr(counters, "enabled", True)
+    await counters.rebuild()
+    vehicle = await create_vehicle(client)
+    # Free-form statuses that would otherwise nest a field or read as an operator
+    orders = [await _order(client, vehicle["vehicle_id"], status) for status in ("Pending", "On.Hold", "$weird", "100%")]
+    changed = await client.patch(f"/work-orders/{orders[0]['order_id']}", json={"status": "a.b$c"})
+    assert changed.status_code == 200, changed.text
+    # Documents without a status still count towards the total
+    await db.vehicles.insert_one({"vehicle_id": "veh_nostatus"})
+    await counters.record_insert("vehicles", None)
+
+    maintained = await counters.read_counts()
+    for name in ("vehicles", "work_orders"):
+        assert maintained[name] == await counters.status_counts(name)
+    assert maintained["work_orders"]["by_status"] == {"a.b$c": 1, "On.Hold": 1, "$weird": 1, "100%": 1}
+    assert maintained["vehicles"]["total"] == 2
+
+    await counters.rebuild()
+    assert await counters.read_counts() == maintained
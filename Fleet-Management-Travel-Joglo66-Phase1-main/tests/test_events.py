@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+import events
+
+pytestmark = pytest.mark.anyio
+
+
+class _Request:
+    async def is_disconnected(self) -> bool:
+        return True
+
+
+async def _take(stream, count: int) -> list:
+    return [await stream.__anext__() for _ in range(count)]
+
+
+async def test_alert_changes_reach_subscribers(client):
+    subscription = events.broker.subscribe({"alerts"})
+    stream = events.sse_stream(_Request(), subscription, heartbeat=0.01)
+    try:
+        response = await client.post("/alerts", json={
+            "type": "Manual", "vehicle_id": "veh_1", "message": "Check tyres", "priority": "Low", "status": "Active"
+        })
+        assert response.status_code == 200, response.text
+
+        retry, frame = await _take(stream, 2)
+        assert retry == "retry: 3000\n\n"
+        event_id, event_type, data = frame.strip().split("\n")
+        assert event_type == "event: alert.created"
+        assert json.loads(data[len("data: "):])["alert_id"] == response.json()["alert_id"]
+        assert event_id == f"id: {events.broker.stats()['last_event_id']}"
+    finally:
+        await stream.aclose()
+    assert subscription not in events.broker._subscribers
+
+
+async def test_a_slow_subscriber_is_told_to_resync():
+    broker = events.Broker(queue_size=2)
+    subscription = broker.subscribe({"alerts"})
+    for n in range(3):
+        broker.publish("alerts", "alert.created", {"n": n})
+    assert subscription.resync
+    assert broker.stats()["resyncs"] == 1
+
+    # The stream skips the lost backlog, then carries on from the latest event
+    original = events.broker
+    events.broker = broker
+    try:
+        stream = events.sse_stream(_Request(), subscription, heartbeat=0.01)
+        assert (await _take(stream, 2))[1] == "id: 3\nevent: resync\ndata: {}\n\n"
+        broker.publish("alerts", "alert.updated", {"n": 3})
+        assert (await _take(stream, 1))[0].startswith("id: 4\nevent: alert.updated\n")
+        await stream.aclose()
+    finally:
+        events.broker = original
+
+
+async def test_reconnecting_clients_replay_what_they_missed():
+    broker = events.Broker(queue_size=10, history_size=3)
+    for n in range(5):
+        broker.publish("alerts" if n != 3 else "other", "alert.created", {"n": n})
+
+    resumed = broker.subscribe({"alerts"}, last_event_id=3)
+    assert not resumed.resync
+    assert [resumed.queue.get_nowait().id for _ in range(resumed.queue.qsize())] == [5]
+
+    # Event 2 has left the history, so the client can't resume from 1
+    assert broker.subscribe({"alerts"}, last_event_id=1).resync
+    # Nor from an id this process never issued (a restart)
+    assert broker.subscribe({"alerts"}, last_event_id=99).resync
@@ -0,0 +1,58 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+import exports
+import indexes
+from tests.factories import create_driver, create_fuel_log, create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def _seed_fuel(client) -> dict:
+    vehicle, driver = await create_vehicle(client), await create_driver(client)
+    # Inserted out of date order; exports come back sorted by date
+    for day, odometer in ((3, 1300), (1, 1000), (2, 1150)):
+        await create_fuel_log(client, vehicle["vehicle_id"], driver["driver_id"], date=f"2026-01-0{day}T08:00:00Z", odometer=odometer)
+    return vehicle
+
+
+async def test_csv_export_is_sorted_by_date(client):
+    vehicle = await _seed_fuel(client)
+
+    response = await client.get("/export/fuel", params={"vehicle_id": vehicle["vehicle_id"]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["odometer"] for row in rows] == ["1000", "1150", "1300"]
+
+
+async def test_ndjson_export_gzip_and_date_range(client):
+    vehicle = await _seed_fuel(client)
+
+    response = await client.get("/export/fuel", params={
+        "format": "ndjson", "gzip": "true", "vehicle_id": vehicle["vehicle_id"],
+        "date_from": "2026-01-02T00:00:00Z", "date_to": "2026-01-04T00:00:00Z"
+    })
+
+    docs = [json.loads(line) for line in gzip.decompress(response.content).decode().splitlines()]
+    assert [doc["odometer"] for doc in docs] == [1150, 1300]
+
+
+async def test_unknown_export_and_bad_filter(client):
+    assert (await client.get("/export/nothing")).status_code == 404
+    assert (await client.get("/export/parts", params={"vehicle_id": "veh_x"})).status_code == 400
+
+
+def test_every_export_sort_has_an_index():
+    for collection_name, export_model, date_field, id_field in exports.EXPORTS.values():
+        keys = [list(model.document["key"]) for model in indexes.INDEX_SPECS[collection_name]]
+        assert [date_field, id_field] in keys, collection_name
+        # A filtered export seeks to the filter value and reads the rest in sort order
+        for field in ("vehicle_id", "driver_id"):
+            if field in export_model.model_fields and field != id_field:
+                assert [field, date_field, id_field] in keys, (collection_name, field)
@@ -0,0 +1,41 @@
+import pytest
+
+from tests.factories import create_driver, create_fuel_log, create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_efficiency_totals_skip_fills_without_a_quantity(client):
+    vehicle, driver = await create_vehicle(client), await create_driver(client)
+    for day, odometer, quantity in ((1, 900, 5), (2, 1000, 10), (3, 1000, 10), (4, 1500, 0)):
+        await create_fuel_log(
+            client, vehicle["vehicle_id"], driver["driver_id"],
+            date=f"2026-01-0{day}T08:00:00Z", odometer=odometer, quantity=quantity
+        )
+
+    response = await client.get("/fuel/efficiency", params={"vehicle_id": vehicle["vehicle_id"]})
+
+    [stats] = response.json()
+    assert (stats["distance"], stats["quantity"]) == (100, 10)
+    assert stats["km_per_l"] == stats["median_km_per_l"] == 10
+    assert stats["fills"] == 4
+
+
+async def test_outlier_fills_raise_and_resolve_alerts(client):
+    vehicle, driver = await create_vehicle(client), await create_driver(client)
+    logs = []
+    # 100 km on 10 L every day, except one fill that only went 20 km
+    for day, odometer in enumerate((1000, 1100, 1200, 1300, 1320, 1420, 1520), start=1):
+        logs.append(await create_fuel_log(
+            client, vehicle["vehicle_id"], driver["driver_id"],
+            date=f"2026-01-0{day}T08:00:00Z", odometer=odometer, quantity=10
+        ))
+
+    response = await client.get("/alerts", params={"type": "FuelEfficiency", "status": "Active"})
+    [alert] = response.json()
+    assert (alert["log_id"], alert["vehicle_id"], alert["priority"]) == (logs[4]["log_id"], vehicle["vehicle_id"], "Medium")
+    assert "2.0 km/L" in alert["message"]
+
+    assert (await client.delete(f"/fuel/{logs[4]['log_id']}")).status_code == 200
+    response = await client.get("/alerts", params={"type": "FuelEfficiency"})
+    assert [(item["alert_id"], item["status"]) for item in response.json()] == [(alert["alert_id"], "Resolved")]
@@ -0,0 +1,32 @@
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+import indexes
+
+pytestmark = pytest.mark.anyio
+
+
+class UnreachableDatabase:
+    def __init__(self):
+        self.attempts = 0
+
+    def __getitem__(self, name):
+        return self
+
+    async def create_indexes(self, models):
+        self.attempts += 1
+        raise ServerSelectionTimeoutError("localhost:27017: connection refused")
+
+
+async def test_unreachable_server_does_not_abort_startup():
+    database = UnreachableDatabase()
+
+    assert await indexes.ensure_indexes(database) == {}
+    assert database.attempts == 1
+
+
+async def test_declared_indexes_build_on_the_sqlite_store(db):
+    created = await indexes.ensure_indexes(db)
+
+    assert {name: len(models) for name, models in indexes.INDEX_SPECS.items()} == \
+        {name: len(names) for name, names in created.items()}
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+import dashboard
+import load_shedding
+import response_cache
+from cache import SingleFlight
+from tests.factories import create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_a_burst_of_stats_requests_shares_one_computation(client, monkeypatch):
+    monkeypatch.setattr(dashboard, "_stats_builds", SingleFlight())
+    await create_vehicle(client)
+
+    responses = await asyncio.gather(*(client.get("/dashboard/stats") for _ in range(5)))
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert {response.json()["totalVehicles"] for response in responses} == {1}
+    assert dashboard._stats_builds.stats() == {"in_flight": 0, "calls": 1, "shared": 4}
+    # Within DASHBOARD_STATS_TTL the result is reused without recomputing
+    await client.get("/dashboard/stats")
+    assert dashboard._stats_builds.calls == 1
+
+
+async def test_identical_list_requests_share_one_build(client, monkeypatch):
+    monkeypatch.setattr(response_cache, "builds", SingleFlight())
+    await create_vehicle(client)
+
+    responses = await asyncio.gather(*(client.get("/vehicles") for _ in range(3)))
+
+    assert len({response.content for response in responses}) == 1
+    # The rest either joined the build or found its cached result
+    assert response_cache.builds.calls == 1
+
+
+async def test_heavy_reads_over_the_limit_are_shed(client, monkeypatch):
+    limiter = load_shedding.Limiter("heavy_reads", 1)
+    monkeypatch.setattr(load_shedding, "heavy_reads", limiter)
+    monkeypatch.setattr(load_shedding, "LOAD_SHED_RETRY_AFTER", 3)
+    await create_vehicle(client)
+
+    # Another heavy read holds the only slot
+    with limiter.slot():
+        response = await client.get("/dashboard/stats")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "3"
+        assert limiter.stats()["shed"] == 1
+        # Cheap reads aren't limited
+        assert (await client.get("/auth/me")).status_code == 200
+
+    response = await client.get("/dashboard/stats")
+    assert response.status_code == 200
+    assert limiter.stats() == {"limit": 1, "in_flight": 0, "peak": 1, "admitted": 2, "shed": 1}
@@ -0,0 +1,50 @@
+import pytest
+
+import media
+from tests.factories import create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = b"%PDF-1.4 " + b"x" * 4096
+
+
+async def _upload(client, vehicle_id: str) -> dict:
+    response = await client.post(
+        "/media", params={"owner_type": "vehicle", "owner_id": vehicle_id, "kind": "document"},
+        files={"file": ("manual.pdf", CONTENT, "application/pdf")}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_shared_blob_lives_until_its_last_upload_is_deleted(client):
+    vehicle = await create_vehicle(client)
+    first, second = await _upload(client, vehicle["vehicle_id"]), await _upload(client, vehicle["vehicle_id"])
+    assert first["sha256"] == second["sha256"]
+    blob = media._blob_path(first["sha256"])
+
+    assert (await client.delete(f"/media/{first['media_id']}")).status_code == 200
+    assert (await client.get(f"/media/{second['media_id']}/content")).content == CONTENT
+
+    assert (await client.delete(f"/media/{second['media_id']}")).status_code == 200
+    assert not blob.exists()
+    assert not list(blob.parent.glob("*.deleting"))
+
+
+async def test_upload_landing_during_a_delete_keeps_the_blob(client, db, monkeypatch):
+    vehicle = await create_vehicle(client)
+    doomed = await _upload(client, vehicle["vehicle_id"])
+    count_documents = db.media.count_documents
+    uploaded = []
+
+    async def count_then_upload(*args, **kwargs):
+        count = await count_documents(*args, **kwargs)
+        if not uploaded:
+            # The same content is uploaded after the delete has counted no other references
+            uploaded.append(await _upload(client, vehicle["vehicle_id"]))
+        return count
+
+    monkeypatch.setattr(db.media, "count_documents", count_then_upload)
+    assert (await client.delete(f"/media/{doomed['media_id']}")).status_code == 200
+
+    assert (await client.get(f"/media/{uploaded[0]['media_id']}/content")).content == CONTENT
@@ -0,0 +1,60 @@
+import pytest
+
+import diagnostics
+import metrics
+from tests.factories import create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+ROUTE = ("GET", "/api/vehicles/{vehicle_id}")
+
+
+def _count(key) -> int:
+    route = metrics.routes.get(key)
+    return route.latency.count if route else 0
+
+
+async def test_requests_are_recorded_per_route_template(client):
+    before = _count(ROUTE)
+    vehicle = await create_vehicle(client)
+    await client.get(f"/vehicles/{vehicle['vehicle_id']}")
+    await client.get("/vehicles/veh_missing")
+
+    route = metrics.routes[ROUTE]
+    assert route.latency.count == before + 2
+    assert route.in_flight == 0
+    assert route.statuses[404] >= 1
+    # Raw paths never become labels
+    assert not [key for key in metrics.routes if "veh_" in key[1]]
+
+    response = await client.get("http://test/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    labels = 'method="GET",route="/api/vehicles/{vehicle_id}"'
+    assert f"http_request_duration_seconds_count{{{labels}}} {route.latency.count}" in response.text
+    assert f'http_requests_total{{{labels},status="404"}} {route.statuses[404]}' in response.text
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}' in response.text
+
+
+async def test_unknown_paths_share_one_label(client):
+    before = _count(("GET", metrics.UNMATCHED))
+    await client.get("/no-such-route/123")
+    await client.get("/no-such-route/456")
+    assert _count(("GET", metrics.UNMATCHED)) == before + 2
+
+
+async def test_metrics_token_is_enforced(client, monkeypatch):
+    monkeypatch.setattr(diagnostics, "METRICS_TOKEN", "scrape-secret")
+    assert (await client.get("http://test/metrics")).status_code == 401
+    response = await client.get("http://test/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    histogram = metrics.Histogram(bounds=(10, 20, 40))
+    for value in (5, 15, 15, 30, 100):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.quantile(0.5) == 17.5
+    assert histogram.quantile(1.0) == 40.0
+    assert histogram.summary()["buckets"] == {"10": 1, "20": 2, "40": 1, "+Inf": 1}
@@ -0,0 +1,41 @@
+import pytest
+
+from tests.factories import create_driver, create_fuel_log, create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_overview_has_recent_sections_and_totals(client):
+    vehicle, other, driver = await create_vehicle(client), await create_vehicle(client), await create_driver(client)
+    logs = []
+    for day, odometer in ((1, 1000), (2, 1100), (3, 1250)):
+        logs.append(await create_fuel_log(
+            client, vehicle["vehicle_id"], driver["driver_id"],
+            date=f"2026-01-0{day}T08:00:00Z", odometer=odometer, quantity=10, cost=100
+        ))
+    await create_fuel_log(client, other["vehicle_id"], driver["driver_id"], odometer=5000)
+    response = await client.post("/maintenance", json={
+        "vehicle_id": vehicle["vehicle_id"], "service_type": "Oil Change", "date": "2026-01-02T00:00:00Z", "mileage": 1100, "cost": 50
+    })
+    assert response.status_code == 200, response.text
+
+    response = await client.get(f"/vehicles/{vehicle['vehicle_id']}/overview", params={"recent": 2})
+
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["vehicle"]["vehicle_id"] == vehicle["vehicle_id"]
+    assert [log["log_id"] for log in data["fuel_logs"]] == [logs[2]["log_id"], logs[1]["log_id"]]
+    assert [record["mileage"] for record in data["maintenance_records"]] == [1100]
+    assert data["work_orders"] == data["inspections"] == data["tires"] == data["assignments"] == data["trips"] == []
+
+    totals = data["totals"]
+    assert (totals["fuel_logs"], totals["fuel_cost"], totals["fuel_quantity"]) == (3, 300, 30)
+    assert (totals["maintenance_count"], totals["maintenance_cost"]) == (1, 50)
+    assert totals["distance"] == 250
+    assert totals["km_per_l"] == 12.5
+    assert (totals["inspections"], totals["tires"]) == (0, 0)
+
+
+async def test_overview_of_a_missing_vehicle_is_404(client):
+    response = await client.get("/vehicles/veh_missing/overview")
+    assert response.status_code == 404
@@ -0,0 +1,58 @@
+import pytest
+
+from tests.factories import create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def _all_pages(client, path: str, **params) -> list:
+    pages = []
+    cursor = None
+    while True:
+        response = await client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        pages.append([doc["vehicle_id"] for doc in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+async def test_cursor_walks_every_document_once(client):
+    for _ in range(5):
+        await create_vehicle(client)
+    everything = await _all_pages(client, "/vehicles", limit=100)
+
+    pages = await _all_pages(client, "/vehicles", limit=2)
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [vehicle_id for page in pages for vehicle_id in page] == everything[0]
+
+
+async def test_cursor_ascending_order(client):
+    for _ in range(3):
+        await create_vehicle(client)
+    newest_first = (await _all_pages(client, "/vehicles", limit=100))[0]
+
+    pages = await _all_pages(client, "/vehicles", limit=2, order="asc")
+
+    assert [vehicle_id for page in pages for vehicle_id in page] == list(reversed(newest_first))
+
+
+async def test_cursor_is_stable_when_documents_are_added(client):
+    for _ in range(3):
+        await create_vehicle(client)
+    first = await client.get("/vehicles", params={"limit": 2})
+    seen = [doc["vehicle_id"] for doc in first.json()]
+
+    # Newer documents sort before the cursor, so they don't shift the next page
+    await create_vehicle(client)
+    second = await client.get("/vehicles", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+
+    assert len(second.json()) == 1
+    assert second.json()[0]["vehicle_id"] not in seen
+
+
+async def test_invalid_cursor_is_rejected(client):
+    response = await client.get("/vehicles", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
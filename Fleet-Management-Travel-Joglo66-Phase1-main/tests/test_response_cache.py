@@ -0,0 +1,45 @@
+import pytest
+
+import command_monitor
+from tests.factories import create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+def _finds(collection: str) -> int:
+    histogram = command_monitor.listener.histograms.get((collection, "find"))
+    return histogram.count if histogram else 0
+
+
+async def test_matching_if_none_match_is_answered_with_304(client):
+    vehicle = await create_vehicle(client)
+    first = await client.get("/vehicles")
+    etag = first.headers["etag"]
+    assert [item["vehicle_id"] for item in first.json()] == [vehicle["vehicle_id"]]
+
+    finds = _finds("vehicles")
+    revalidated = await client.get("/vehicles", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert revalidated.content == b""
+    # Neither the revalidation nor a plain repeat queries the collection again
+    assert (await client.get("/vehicles")).json() == first.json()
+    assert _finds("vehicles") == finds
+
+    # Other query strings are cached separately
+    assert (await client.get("/vehicles", params={"status": "Retired"}, headers={"If-None-Match": etag})).status_code == 200
+
+
+async def test_writes_move_the_etag_on(client):
+    vehicle = await create_vehicle(client)
+    path = f"/vehicles/{vehicle['vehicle_id']}"
+    etag = (await client.get(path)).headers["etag"]
+
+    response = await client.put(path, json={**vehicle, "status": "Maintenance"})
+    assert response.status_code == 200, response.text
+
+    fresh = await client.get(path, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.json()["status"] == "Maintenance"
+    assert fresh.headers["etag"] != etag
+    assert (await client.get(path, headers={"If-None-Match": fresh.headers["etag"]})).status_code == 304
@@ -0,0 +1,32 @@
+import pytest
+
+import rollups
+from tests.factories import create_driver, create_fuel_log, create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_rebuild_replaces_buckets_in_place(client, db, monkeypatch):
+    vehicle, driver = await create_vehicle(client), await create_driver(client)
+    for month, odometer in ((1, 1000), (2, 1400)):
+        await create_fuel_log(client, vehicle["vehicle_id"], driver["driver_id"], date=f"2026-0{month}-10T08:00:00Z", odometer=odometer)
+    collection = db[rollups.ROLLUP_COLLECTION]
+    expected = await collection.find({}).sort("_id", 1).to_list(None)
+    await collection.update_one({"_id": expected[0]["_id"]}, {"$set": {"fuel_cost": -1}})
+    await collection.insert_one({"_id": "veh_gone:2025-12", "vehicle_id": "veh_gone", "month": "2025-12", "fuel_cost": 5})
+
+    # Reports read while the rebuild writes must still see every current bucket
+    bulk_write = collection.bulk_write
+    seen = []
+
+    async def checked_bulk_write(operations, **kwargs):
+        seen.append(await collection.count_documents({}))
+        return await bulk_write(operations, **kwargs)
+
+    monkeypatch.setattr(collection, "bulk_write", checked_bulk_write)
+    response = await client.post("/reports/rollups/rebuild")
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"rollups": 2, "removed": 1}
+    assert seen == [3]
+    assert await collection.find({}).sort("_id", 1).to_list(None) == expected
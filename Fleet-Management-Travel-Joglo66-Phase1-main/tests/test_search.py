@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import search
+from tests.factories import create_part, create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def _search(client, q: str, **params) -> list:
+    response = await client.get("/search", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_type_filter_applies_before_the_scan_limit(client, monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_SCAN_LIMIT", 3)
+    for n in range(5):
+        await create_vehicle(client, plate=f"AB {n} CD")
+    part = await create_part(client, name="Abrasive pad")
+
+    results = await _search(client, "ab", type="part")
+
+    assert [result["id"] for result in results] == [part["part_id"]]
+
+
+async def test_writes_during_a_reload_are_kept(client, monkeypatch):
+    renamed = await create_vehicle(client, plate="AB 1 CD")
+    deleted = await create_vehicle(client, plate="AB 2 CD")
+    created = []
+    database = search.db
+
+    async def scan_then_write(query, projection):
+        async for doc in database.vehicles.find(query, projection):
+            yield doc
+        # The load has read every vehicle; these writes land before it swaps its index in
+        await client.patch(f"/vehicles/{renamed['vehicle_id']}", json={"plate": "ZZ 9 YY"})
+        await client.delete(f"/vehicles/{deleted['vehicle_id']}")
+        created.append(await create_vehicle(client, plate="AB 3 CD"))
+
+    class ScanningDatabase:
+        def __getitem__(self, name):
+            return SimpleNamespace(find=scan_then_write) if name == "vehicles" else database[name]
+
+    monkeypatch.setattr(search, "db", ScanningDatabase())
+
+    assert [result["label"] for result in await _search(client, "zz9")] == ["ZZ 9 YY"]
+    assert [result["id"] for result in await _search(client, "ab", type="vehicle")] == [created[0]["vehicle_id"]]
+
+
+async def test_concurrent_searches_share_one_load(client):
+    await create_vehicle(client, plate="AB 1 CD")
+    index = search.index
+
+    results = await asyncio.gather(*(_search(client, "ab1") for _ in range(3)))
+
+    assert all(len(result) == 1 for result in results)
+    assert index._loads.stats() == {"in_flight": 0, "calls": 1, "shared": 2}
@@ -0,0 +1,77 @@
+import pytest
+
+import service_alerts
+from tests.factories import create_driver, create_fuel_log, create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def _service(client, vehicle_id: str, service_type: str, mileage: int):
+    body = {"vehicle_id": vehicle_id, "service_type": service_type, "date": "2026-01-01T00:00:00Z", "mileage": mileage, "cost": 100}
+    response = await client.post("/maintenance", json=body)
+    assert response.status_code == 200, response.text
+
+
+async def _service_alerts(client, vehicle_id: str, status: str = "Active") -> dict:
+    params = {"type": "ServiceDue", "vehicle_id": vehicle_id, "status": status}
+    response = await client.get("/alerts", params={name: value for name, value in params.items() if value})
+    return {alert["service_type"]: alert for alert in response.json()}
+
+
+async def test_mileage_raises_and_services_resolve_alerts(client):
+    vehicle, driver = await create_vehicle(client, type="Car"), await create_driver(client)
+    for service_type in ("Oil Change", "Brake Check", "Air Filter / Tune Up", "Major Service"):
+        await _service(client, vehicle["vehicle_id"], service_type, 1000)
+    assert await _service_alerts(client, vehicle["vehicle_id"]) == {}
+
+    # 4700 km after the last oil change: due within SERVICE_DUE_SOON_KM
+    await create_fuel_log(client, vehicle["vehicle_id"], driver["driver_id"], odometer=5700)
+    alerts = await _service_alerts(client, vehicle["vehicle_id"])
+    assert list(alerts) == ["oil_change"]
+    assert alerts["oil_change"]["priority"] == "Medium"
+
+    await create_fuel_log(client, vehicle["vehicle_id"], driver["driver_id"], odometer=6200, date="2026-01-02T08:00:00Z")
+    assert (await _service_alerts(client, vehicle["vehicle_id"]))["oil_change"]["priority"] == "High"
+
+    await _service(client, vehicle["vehicle_id"], "Oil Change", 6200)
+    assert await _service_alerts(client, vehicle["vehicle_id"]) == {}
+
+
+async def test_evaluations_during_a_rebuild_see_the_state(client, monkeypatch):
+    vehicle = await create_vehicle(client, type="Car")
+    for service_type in ("Oil Change", "Brake Check", "Air Filter / Tune Up", "Major Service"):
+        await _service(client, vehicle["vehicle_id"], service_type, 40000)
+    # Each record evaluates before the next lands, so the setup itself raised (and resolved) alerts
+    before = await _service_alerts(client, vehicle["vehicle_id"], status=None)
+    database = service_alerts.db
+    state = database[service_alerts.STATE_COLLECTION]
+
+    class EvaluatingState:
+        """Runs an evaluation (as a fuel log POST would) before each rebuild write"""
+
+        def __getattr__(self, name):
+            return getattr(state, name)
+
+        async def bulk_write(self, *args, **kwargs):
+            await service_alerts.evaluate([vehicle["vehicle_id"]])
+            return await state.bulk_write(*args, **kwargs)
+
+        async def delete_many(self, *args, **kwargs):
+            await service_alerts.evaluate([vehicle["vehicle_id"]])
+            return await state.delete_many(*args, **kwargs)
+
+    class Database:
+        def __getitem__(self, name):
+            return EvaluatingState() if name == service_alerts.STATE_COLLECTION else database[name]
+
+        def __getattr__(self, name):
+            return database[name]
+
+    monkeypatch.setattr(service_alerts, "db", Database())
+
+    response = await client.post("/alerts/service-due/rebuild")
+
+    assert response.status_code == 200, response.text
+    assert response.json()["vehicle_states"] == 1
+    # rebuild() re-evaluates at the end, so look for alerts raised (and resolved) in between too
+    assert await _service_alerts(client, vehicle["vehicle_id"], status=None) == before
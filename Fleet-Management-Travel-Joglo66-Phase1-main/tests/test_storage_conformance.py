@@ -0,0 +1,246 @@
+"""The SQLite store against mongomock for the query shapes the app sends.
+
+Each test runs the same calls on both backends and compares the results, so a
+divergence in sqlite_store/query_engine shows up as a plain diff. Indexes come from
+indexes.py, which decides what the SQLite store translates to SQL.
+"""
+from datetime import datetime, timedelta
+import asyncio
+import math
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import ReturnDocument, UpdateOne
+
+import counters
+import indexes
+import rollups
+import sqlite_store
+from sqlite_store import SQLiteClient
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2026, 1, 1)
+
+
+def _fuel_logs() -> list:
+    return [
+        {
+            "log_id": f"log_{i:03d}",
+            "vehicle_id": f"veh_{i % 3}",
+            "driver_id": f"drv_{i % 2}",
+            "date": START + timedelta(days=i * 5, hours=i),
+            "quantity": 20 + i,
+            "cost": 200000 + i * 1000,
+            "odometer": 1000 + i * 150,
+            "created_at": START + timedelta(minutes=i // 2),
+        }
+        for i in range(24)
+    ]
+
+
+def _work_orders() -> list:
+    statuses = ["Pending", "In Progress", "Completed", None]
+    return [
+        {
+            "order_id": f"wo_{i:03d}",
+            "vehicle_id": f"veh_{i % 3}",
+            "status": statuses[i % 4],
+            "total_cost": 100.5 * i,
+            "scheduled_date": START + timedelta(days=i * 7),
+            "completed_date": START + timedelta(days=i * 7 + i % 3) if statuses[i % 4] == "Completed" else None,
+            "created_at": START + timedelta(hours=i),
+        }
+        for i in range(16)
+    ]
+
+
+@pytest.fixture
+async def backends():
+    """Both backends seeded alike, for tests that compare them side by side"""
+    clients = [SQLiteClient(":memory:"), AsyncMongoMockClient()]
+    databases = []
+    for client in clients:
+        database = client["conformance"]
+        for collection_name in ("fuel_logs", "work_orders", "parts_inventory", "maintenance_records"):
+            await database[collection_name].create_indexes(indexes.INDEX_SPECS[collection_name])
+        await database.fuel_logs.insert_many(_fuel_logs())
+        await database.work_orders.insert_many(_work_orders())
+        databases.append(database)
+    yield databases
+    for client in clients:
+        client.close()
+
+
+async def _both(backends, call):
+    sqlite_result, mongo_result = [await call(database) for database in backends]
+    assert sqlite_result == mongo_result
+    return sqlite_result
+
+
+FILTERS = [
+    {"vehicle_id": {"$in": ["veh_0", "veh_2"]}, "date": {"$gte": START + timedelta(days=20), "$lt": START + timedelta(days=80)}},
+    {"vehicle_id": "veh_1", "driver_id": {"$ne": "drv_0"}},
+    {"$or": [{"vehicle_id": "veh_0"}, {"quantity": {"$gt": 40}}]},
+    {"date": {"$ne": None}, "odometer": {"$lte": 2000}},
+    {"vehicle_id": {"$nin": ["veh_1"]}, "cost": {"$gte": 210000}},
+    # Keyset cursor on (created_at, log_id), as pagination.py builds it
+    {"$or": [
+        {"created_at": {"$lt": START + timedelta(minutes=6)}},
+        {"created_at": START + timedelta(minutes=6), "log_id": {"$lt": "log_013"}},
+    ]},
+]
+
+
+@pytest.mark.parametrize("query", FILTERS)
+async def test_filters(backends, query):
+    await _both(backends, lambda db: db.fuel_logs.find(query, {"_id": 0}).sort("log_id", 1).to_list(None))
+    await _both(backends, lambda db: db.fuel_logs.count_documents(query))
+
+
+@pytest.mark.parametrize("sort", [
+    [("created_at", -1), ("log_id", -1)],
+    [("created_at", 1), ("log_id", 1)],
+    [("date", -1)],
+    [("vehicle_id", 1), ("date", -1)],
+])
+async def test_sorted_pages(backends, sort):
+    for skip in (0, 5, 20):
+        await _both(backends, lambda db: db.fuel_logs.find({}, {"_id": 0}).sort(sort).skip(skip).limit(7).to_list(None))
+
+
+@pytest.mark.parametrize("direction", [1, -1])
+async def test_mixed_types_sort_in_bson_order(backends, direction):
+    mixed = [None, 3, 1.5, -math.inf, "b", "A", "$x", True, ObjectId("0123456789ab0123456789ab"), START]
+    for database in backends:
+        await database.work_orders.insert_many([
+            {"order_id": f"mix_{i}", "vehicle_id": "veh_mixed", "scheduled_date": value, "completed_date": value}
+            for i, value in enumerate(mixed)
+        ])
+        await database.work_orders.insert_one({"order_id": "mix_missing", "vehicle_id": "veh_mixed"})
+
+    # scheduled_date is indexed, completed_date isn't: cover both the SQL and the Python sort,
+    # with the mixed field first and after an equal leading field
+    for sort in (
+        [("scheduled_date", direction), ("order_id", 1)],
+        [("vehicle_id", 1), ("scheduled_date", direction), ("order_id", 1)],
+        [("completed_date", direction), ("order_id", 1)],
+    ):
+        ids = await _both(backends, lambda db: db.work_orders.find({"vehicle_id": "veh_mixed"}, {"_id": 0, "order_id": 1})
+                          .sort(sort).to_list(None))
+        assert len(ids) == len(mixed) + 1
+
+
+async def test_updates(backends):
+    async def run(db):
+        parts = db.parts_inventory
+        await parts.insert_many([{"part_id": f"prt_{i}", "quantity": 5, "min_stock": 2} for i in range(3)])
+        # Conditional decrement tagged with an attempt token, as inventory.py does
+        result = await parts.bulk_write([
+            UpdateOne(
+                {"part_id": part_id, "quantity": {"$gte": quantity}, "consuming": {"$ne": "tag"}},
+                {"$inc": {"quantity": -quantity}, "$set": {"updated_at": START}, "$addToSet": {"consuming": "tag"}}
+            )
+            for part_id, quantity in (("prt_0", 2), ("prt_1", 9))
+        ], ordered=False)
+        await parts.update_many({"consuming": "tag"}, {"$pull": {"consuming": "tag"}})
+        before = await parts.find_one_and_update(
+            {"part_id": "prt_2", "quantity": 5}, {"$set": {"quantity": 7}},
+            projection={"_id": 0}, return_document=ReturnDocument.BEFORE
+        )
+        # Login upsert, as auth.py does
+        upserted = [
+            await db.users.find_one_and_update(
+                {"email": "a@example.com"},
+                {"$set": {"name": name}, "$setOnInsert": {"user_id": "usr_1", "role": "Admin"}},
+                projection={"_id": 0}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+            for name in ("First", "Second")
+        ]
+        return (
+            (result.matched_count, result.modified_count),
+            before,
+            await parts.find({}, {"_id": 0}).sort("part_id", 1).to_list(None),
+            upserted,
+        )
+
+    await _both(backends, run)
+
+
+@pytest.mark.parametrize("collection_name", list(rollups.REBUILD_PIPELINES))
+async def test_rollup_groups(backends, collection_name):
+    if collection_name == "maintenance_records":
+        for database in backends:
+            await database.maintenance_records.insert_many([
+                {"record_id": f"mnt_{i}", "vehicle_id": f"veh_{i % 2}", "date": START + timedelta(days=i * 11), "cost": 50 * i}
+                for i in range(10)
+            ])
+    pipeline = rollups.REBUILD_PIPELINES[collection_name]
+    rows = await _both(backends, lambda db: _sorted_rows(db[collection_name].aggregate(pipeline)))
+    assert rows
+
+
+async def test_status_and_sum_groups(backends):
+    await _both(backends, lambda db: _sorted_rows(db.work_orders.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])))
+    await _both(backends, lambda db: db.fuel_logs.aggregate([
+        {"$match": {"date": {"$gte": START + timedelta(days=30)}}},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "cost": {"$sum": {"$ifNull": ["$cost", 0]}}, "odometer": {"$max": "$odometer"}}},
+    ]).to_list(None))
+    await _both(backends, lambda db: counters_status_counts(db, "work_orders"))
+
+
+async def counters_status_counts(db, collection_name: str) -> dict:
+    previous = counters.db
+    counters.db = db
+    try:
+        return await counters.status_counts(collection_name)
+    finally:
+        counters.db = previous
+
+
+async def _sorted_rows(cursor) -> list:
+    rows = await cursor.to_list(None)
+    return sorted(rows, key=lambda row: repr(row["_id"]))
+
+
+@pytest.mark.parametrize("field", ["date", "filled_at"])
+async def test_dates_compare_at_millisecond_precision(backends, field):
+    # date is indexed and filtered in SQL, filled_at isn't and goes through query_engine;
+    # both must see the stored (millisecond) value the way Mongo does
+    moment = START + timedelta(days=400, microseconds=123456)
+    for database in backends:
+        await database.fuel_logs.insert_one({"log_id": "log_sub_ms", "vehicle_id": "veh_ms", field: moment})
+    counts = [
+        await _both(backends, lambda db: db.fuel_logs.count_documents({"vehicle_id": "veh_ms", field: query}))
+        for query in ({"$lt": moment}, {"$lte": moment}, {"$gte": moment}, {"$eq": moment}, moment, {"$in": [moment]})
+    ]
+    assert counts == [0, 1, 1, 1, 1, 1]
+
+
+async def test_cursor_iteration_streams_in_batches(monkeypatch):
+    monkeypatch.setattr(sqlite_store, "CURSOR_BATCH_SIZE", 10)
+    client = SQLiteClient(":memory:")
+    collection = client["conformance"].fuel_logs
+    await collection.create_indexes(indexes.INDEX_SPECS["fuel_logs"])
+    await collection.insert_many(_fuel_logs())
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    ticker = asyncio.ensure_future(tick())
+    try:
+        for sort in ([("date", 1), ("log_id", 1)], [("odometer", -1)]):
+            cursor = collection.find({"vehicle_id": {"$ne": "veh_1"}}, {"_id": 0}).sort(sort)
+            streamed = [doc async for doc in cursor]
+            assert streamed == await collection.find({"vehicle_id": {"$ne": "veh_1"}}, {"_id": 0}).sort(sort).to_list(None)
+            assert len(streamed) == 16
+    finally:
+        ticker.cancel()
+        client.close()
+    # Other tasks ran between batches of each scan
+    assert ticks >= 2
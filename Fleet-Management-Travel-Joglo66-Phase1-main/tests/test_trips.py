@@ -0,0 +1,53 @@
+import pytest
+
+from tests.factories import create_driver, create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def _trip(client, vehicle_id: str, driver_id: str, start: int, end: int, day: int) -> dict:
+    started = await client.post("/trips", json={
+        "vehicle_id": vehicle_id, "driver_id": driver_id, "start_odometer": start, "start_time": f"2026-01-0{day}T08:00:00Z"
+    })
+    assert started.status_code == 200, started.text
+    ended = await client.post(f"/trips/{started.json()['trip_id']}/end", json={"end_odometer": end, "end_time": f"2026-01-0{day}T17:00:00Z"})
+    assert ended.status_code == 200, ended.text
+    return ended.json()
+
+
+async def test_ending_a_trip_advances_the_vehicle_mileage(client):
+    vehicle, driver = await create_vehicle(client), await create_driver(client)
+    started = await client.post("/trips", json={"vehicle_id": vehicle["vehicle_id"], "driver_id": driver["driver_id"], "start_odometer": 1000})
+    assert started.status_code == 200, started.text
+    trip_id = started.json()["trip_id"]
+
+    # One trip in progress per vehicle
+    second = await client.post("/trips", json={"vehicle_id": vehicle["vehicle_id"], "driver_id": driver["driver_id"], "start_odometer": 1000})
+    assert second.status_code == 409
+
+    assert (await client.post(f"/trips/{trip_id}/end", json={"end_odometer": 900})).status_code == 400
+    ended = await client.post(f"/trips/{trip_id}/end", json={"end_odometer": 1120})
+    assert ended.status_code == 200, ended.text
+    assert (ended.json()["status"], ended.json()["distance"]) == ("Completed", 120)
+    assert (await client.post(f"/trips/{trip_id}/end", json={"end_odometer": 1200})).status_code == 409
+
+    assert (await client.get(f"/vehicles/{vehicle['vehicle_id']}")).json()["mileage"] == 1120
+
+
+async def test_distance_by_vehicle_driver_and_day(client):
+    vehicle, other = await create_vehicle(client), await create_vehicle(client)
+    driver = await create_driver(client)
+    await _trip(client, vehicle["vehicle_id"], driver["driver_id"], 1000, 1100, 1)
+    await _trip(client, vehicle["vehicle_id"], driver["driver_id"], 1100, 1150, 2)
+    await _trip(client, other["vehicle_id"], driver["driver_id"], 500, 530, 2)
+
+    async def distance(**params) -> list:
+        response = await client.get("/trips/distance", params=params)
+        assert response.status_code == 200, response.text
+        return [(row["period"], row["trips"], row["distance"]) for row in response.json()]
+
+    assert await distance(vehicle_id=vehicle["vehicle_id"]) == [(None, 2, 150)]
+    assert await distance(driver_id=driver["driver_id"]) == [(None, 3, 180)]
+    assert await distance(driver_id=driver["driver_id"], group_by="day") == [("2026-01-01", 1, 100), ("2026-01-02", 2, 80)]
+    assert await distance(vehicle_id=vehicle["vehicle_id"], date_from="2026-01-02T00:00:00Z") == [(None, 1, 50)]
+    assert await distance(vehicle_id="veh_none") == [(None, 0, 0)]
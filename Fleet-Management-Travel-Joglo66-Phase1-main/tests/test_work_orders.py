@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import inventory
+from tests.factories import create_part, create_vehicle
+
+pytestmark = pytest.mark.anyio
+
+
+async def _create_order(client, vehicle_id: str, parts: list, **fields) -> dict:
+    body = {
+        "vehicle_id": vehicle_id, "priority": "High", "description": "Brake service",
+        "scheduled_date": "2026-01-10T08:00:00Z", "parts": parts, "labor_cost": 100, **fields
+    }
+    response = await client.post("/work-orders", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_completing_an_order_consumes_its_parts_once(client):
+    vehicle = await create_vehicle(client)
+    part = await create_part(client, quantity=5, cost=20)
+    order = await _create_order(client, vehicle["vehicle_id"], [{"part_id": part["part_id"], "quantity": 2}])
+    assert order["parts_cost"] == 40
+    assert order["total_cost"] == 140
+
+    completed = await client.patch(f"/work-orders/{order['order_id']}", json={"status": "Completed"})
+    assert completed.status_code == 200, completed.text
+    assert completed.json()["parts_consumed_at"] is not None
+    assert (await client.get(f"/parts/{part['part_id']}")).json()["quantity"] == 3
+
+    # Saving the completed order again takes nothing more
+    again = await client.patch(f"/work-orders/{order['order_id']}", json={"status": "Completed", "labor_cost": 150})
+    assert again.status_code == 200, again.text
+    assert again.json()["total_cost"] == 190
+    assert (await client.get(f"/parts/{part['part_id']}")).json()["quantity"] == 3
+
+
+async def test_reopening_a_completed_order_returns_its_parts(client, db):
+    vehicle = await create_vehicle(client)
+    part = await create_part(client, quantity=5)
+    order = await _create_order(client, vehicle["vehicle_id"], [{"part_id": part["part_id"], "quantity": 2}], status="Completed")
+    assert (await client.get(f"/parts/{part['part_id']}")).json()["quantity"] == 3
+
+    reopened = await client.patch(f"/work-orders/{order['order_id']}", json={"status": "Pending"})
+    assert reopened.status_code == 200, reopened.text
+    assert reopened.json()["parts_consumed_at"] is None
+    assert (await client.get(f"/parts/{part['part_id']}")).json()["quantity"] == 5
+
+    # Cancelling the reopened order has nothing left to return; completing it again consumes
+    await client.patch(f"/work-orders/{order['order_id']}", json={"status": "Completed"})
+    assert (await client.get(f"/parts/{part['part_id']}")).json()["quantity"] == 3
+    await client.patch(f"/work-orders/{order['order_id']}", json={"status": "Cancelled"})
+    await client.patch(f"/work-orders/{order['order_id']}", json={"status": "Cancelled"})
+    part_doc = await db.parts_inventory.find_one({"part_id": part["part_id"]})
+    assert part_doc["quantity"] == 5
+    assert not part_doc.get("consuming")
+
+
+async def test_completing_without_enough_stock_is_rejected(client):
+    vehicle = await create_vehicle(client)
+    part = await create_part(client, quantity=1)
+    order = await _create_order(client, vehicle["vehicle_id"], [{"part_id": part["part_id"], "quantity": 2}])
+
+    response = await client.patch(f"/work-orders/{order['order_id']}", json={"status": "Completed"})
+
+    assert response.status_code == 409
+    assert (await client.get(f"/parts/{part['part_id']}")).json()["quantity"] == 1
+    assert (await client.get(f"/work-orders/{order['order_id']}")).json()["status"] == "Pending"
+
+
+async def test_order_created_completed_consumes_parts(client):
+    vehicle = await create_vehicle(client)
+    part = await create_part(client, quantity=4, min_stock=2)
+
+    await _create_order(client, vehicle["vehicle_id"], [{"part_id": part["part_id"], "quantity": 3}], status="Completed")
+
+    assert (await client.get(f"/parts/{part['part_id']}")).json()["quantity"] == 1
+    alerts = (await client.get("/alerts", params={"type": "LowStock"})).json()
+    assert [alert["part_id"] for alert in alerts] == [part["part_id"]]
+
+
+async def test_concurrent_completions_consume_once(client):
+    vehicle = await create_vehicle(client)
+    part = await create_part(client, quantity=3)
+    order = await _create_order(client, vehicle["vehicle_id"], [{"part_id": part["part_id"], "quantity": 2}])
+
+    # The second save either sees the order already completed or loses the race (409);
+    # either way it must not put back the parts the winner took
+    responses = await asyncio.gather(*(
+        client.patch(f"/work-orders/{order['order_id']}", json={"status": "Completed"}) for _ in range(2)
+    ))
+
+    assert 200 in [response.status_code for response in responses]
+    assert {response.status_code for response in responses} <= {200, 409}
+    assert (await client.get(f"/parts/{part['part_id']}")).json()["quantity"] == 1
+    assert (await client.get(f"/work-orders/{order['order_id']}")).json()["parts_consumed_at"] is not None
+
+
+async def test_failed_attempt_restocks_only_what_it_took(client):
+    part = await create_part(client, quantity=3)
+    requested = {part["part_id"]: 2}
+
+    async def losing_write(session):
+        raise AssertionError("the losing attempt never gets to write")
+
+    async def winning_write(session):
+        # A second attempt for the same parts runs while this one holds its decrement
+        with pytest.raises(HTTPException) as lost:
+            await inventory.consume(requested, losing_write)
+        assert lost.value.status_code == 409
+        return {}
+
+    await inventory.consume(requested, winning_write)
+
+    assert (await client.get(f"/parts/{part['part_id']}")).json()["quantity"] == 1
+
+
+async def test_concurrent_low_stock_checks_raise_one_alert(client, db, monkeypatch):
+    part = await create_part(client, quantity=10, min_stock=2)
+    await db.parts_inventory.update_one({"part_id": part["part_id"]}, {"$set": {"quantity": 1}})
+    low = {**part, "quantity": 1}
+
+    alerts = db.alerts
+    both_checked = asyncio.Event()
+    writers = []
+
+    class RacingAlerts:
+        """Holds each bulk write until both checks have found no Active alert"""
+
+        def __getattr__(self, name):
+            return getattr(alerts, name)
+
+        async def bulk_write(self, *args, **kwargs):
+            writers.append(args)
+            if len(writers) == 2:
+                both_checked.set()
+            await both_checked.wait()
+            return await alerts.bulk_write(*args, **kwargs)
+
+    class Database:
+        alerts = RacingAlerts()
+
+        def __getattr__(self, name):
+            return db[name]
+
+        def __getitem__(self, name):
+            return db[name]
+
+    monkeypatch.setattr(inventory, "db", Database())
+
+    # Both insert an alert; the partial unique index lets one through
+    await asyncio.gather(inventory.sync_low_stock([low]), inventory.sync_low_stock([low]))
+
+    response = await client.get("/alerts", params={"type": "LowStock"})
+    assert [(alert["part_id"], alert["status"]) for alert in response.json()] == [(part["part_id"], "Active")]